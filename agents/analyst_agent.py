@@ -4,32 +4,70 @@ Analyst Agent
 """
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
+from pydantic import ValidationError
 from config import Config
-from typing import Dict, Any, List, Tuple
+from agents.backends import LiveBackend, cassette_key, model_backend
+from agents.clients import get_http_client
+from agents.schemas import AnalysisReport, NewsAnalysis, ReportOverview
+from utils.cache import PersistentTTLCache
+from utils.helpers import normalize_text
+from utils.news_items import canonical_item_url, extract_news_items, item_identity
+from utils.tagger import default_tagger, primary_countries
+from utils.urls import canonicalize_url
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Type, TypeVar, Union
 from datetime import datetime
+import hashlib
 import json
 import re
 
+T = TypeVar("T")
+
+# 模型回應外層可能包著 ```json 代碼塊
+_JSON_BLOCK = re.compile(r'```(?:json)?\s*(.*?)\s*```', re.DOTALL)
+
+# 後備：模型未回傳 JSON 時，從 Markdown 報告中提取新聞
+_MD_NEWS = re.compile(r'###\s+\d+\.\s+(.*?)\n(.*?)(?=###|\Z)', re.DOTALL)
+_MD_SOURCE = re.compile(r'\*\*來源\*\*[：:]\s*\[?(.*?)\]?\(?(https?://[^\s\)]+)')
+_MD_URL = re.compile(r'(https?://[^\s\)]+)')
+_MD_DATE_FIELD = re.compile(r'\*\*日期\*\*[：:]\s*([^\n*]+)')
+_MD_DATE = re.compile(r'(\d{4}[-/\.]\d{1,2}[-/\.]\d{1,2})')
+_MD_DATE_CN = re.compile(r'(\d{4}年\d{1,2}月\d{1,2}日)')
+_MD_SUMMARY = re.compile(r'\*\*摘要\*\*[：:]\s*([^\n]*(?:\n(?!\s*[-\*]\s*\*\*)[^\n]*)*)')
+_MD_ANALYSIS = re.compile(
+    r'\*\*重點分析\*\*[：:]\s*([^\n]*(?:\n(?!\s*###|\s*##|\s*[-\*]\s*\*\*(?!.*分析))[^\n]*)*)'
+)
+
 
 class AnalystAgent:
     """分析代理 - 將原始搜尋結果整理成結構化報告"""
     
-    def __init__(self):
-        """初始化 Analyst Agent"""
-        self.agent = Agent(
+    def __init__(self, backend: Optional[LiveBackend] = None, cache: Union[PersistentTTLCache, bool, None] = None):
+        """
+        初始化 Analyst Agent
+        
+        Args:
+            backend: 模型後端（live / record / replay），預設為全域的 model_backend
+            cache: 單則新聞分析快取；預設（None）依 Config.ARTICLE_CACHE_* 建立，False 表示此實例不使用快取
+        """
+        self.backend = backend or model_backend
+        
+        if cache is None and Config.ARTICLE_CACHE_ENABLED:
+            cache = PersistentTTLCache(
+                Config.CACHE_DB_PATH,
+                namespace="articles",
+                ttl_seconds=Config.ARTICLE_CACHE_TTL,
+                max_entries=Config.ARTICLE_CACHE_MAX_ENTRIES
+            )
+        self.cache = None if cache is False else cache
+        self.agent = self._create_agent(
             name="金融新聞分析師",
-            model=OpenAIChat(
-                id=Config.OPENAI_MODEL,
-                api_key=Config.OPENAI_API_KEY,
-                # max_tokens=4096,  # 增加輸出 token 限制，允許更詳細的報告
-            ),
             description="專業的金融新聞分析師，擅長整理和結構化資訊",
             instructions=[
                 "你是一位專業的金融分析師，負責整理新聞資訊",
-                "將搜尋結果整理成清晰、專業的繁體中文報告",
-                "報告結構應包含：標題、摘要、詳細內容、資料來源",
-                "使用 Markdown 格式輸出",
-                "每條新聞都要附上來源超連結",
+                "將搜尋結果整理成清晰、專業的繁體中文分析",
+                "依指定的 JSON 結構輸出：報告摘要、每則新聞的分析、市場洞察",
+                "每則新聞都要保留原始的來源名稱與網址",
                 "去除重複和冗餘資訊",
                 "按照重要性和時間順序排列",
                 "使用專業但易懂的語言",
@@ -37,15 +75,36 @@ class AnalystAgent:
                 "每條新聞的摘要應該詳細完整，至少 150-300 字",
                 "市場洞察部分應該提供 5-8 點深入的分析"
             ],
-            markdown=True,
+            output_schema=AnalysisReport,
         )
     
-    def analyze(self, search_results: Dict[str, Any]) -> Tuple[str, List[Dict[str, str]]]:
+    @staticmethod
+    def _create_agent(name: str, description: str, instructions: List[str], output_schema: Type[Any]) -> Agent:
+        """建立輸出指定 JSON 結構的 agno Agent"""
+        return Agent(
+            name=name,
+            model=OpenAIChat(
+                id=Config.OPENAI_MODEL,
+                api_key=Config.OPENAI_API_KEY,
+                http_client=get_http_client(),  # 共用連線池
+                # max_tokens=4096,  # 增加輸出 token 限制，允許更詳細的報告
+            ),
+            description=description,
+            instructions=instructions,
+            output_schema=output_schema,
+        )
+    
+    def analyze(self, search_results: Dict[str, Any], mode: Optional[str] = None) -> Tuple[str, List[Dict[str, str]]]:
         """
         分析並結構化搜尋結果
         
+        模型回傳符合 AnalysisReport 結構的 JSON，PDF 用的 Markdown 與 Excel 用的資料列
+        皆由同一份結果在本地產生。已有快取分析的新聞不再送交模型：
+        只要有任何一則命中快取，就改以 map-reduce 模式只分析其餘新聞
+        
         Args:
             search_results: 來自 Research Agent 的搜尋結果
+            mode: "single"、"map_reduce" 或 "auto"，預設為 Config.ANALYST_MODE
             
         Returns:
             Tuple[str, List[Dict]]: (Markdown 格式的報告, 結構化新聞列表)
@@ -56,77 +115,33 @@ class AnalystAgent:
         content = search_results.get("content", "")
         query = search_results.get("query", "")
         
-        # 構建分析提示
-        analysis_prompt = f"""
-        請將以下搜尋結果整理成一份專業的繁體中文金融報告。
-        
-        原始查詢：{query}
-        搜尋結果：
-        {content}
-        
-        **重要**：你必須嚴格遵循以下格式，每則新聞都必須包含「來源」、「日期」、「摘要」、「重點分析」四個欄位，且使用 **粗體標記**。
-        
-        報告格式要求：
-        
-        # 東南亞金融新聞報告
-        
-        ## 報告摘要
-        [用 2-3 句話總結本報告的核心內容]
-        
-        ## 搜尋主題
-        {query}
-        
-        ## 報告日期
-        {datetime.now().strftime("%Y年%m月%d日")}
-        
-        ## 新聞詳情
-        
-        ### 1. [新聞標題翻譯成繁體中文]
-        - **來源**：[來源名稱]([網址])
-        - **日期**：[YYYY-MM-DD 格式]
-        - **摘要**：[新聞的詳細摘要，100-300字，說明新聞的主要內容]
-        - **重點分析**：[關鍵資訊的條列式分析，用 1) 2) 3) 編號]
-        
-        ### 2. [新聞標題翻譯成繁體中文]
-        - **來源**：[來源名稱]([網址])
-        - **日期**：[YYYY-MM-DD 格式]
-        - **摘要**：[新聞的詳細摘要，100-300字，說明新聞的主要內容]
-        - **重點分析**：[關鍵資訊的條列式分析，用 1) 2) 3) 編號]
-        
-        （每則新聞都按照上述格式，不要省略任何欄位）
-        
-        ## 市場洞察
-        [基於以上新聞，提供 3-5 點關鍵洞察]
-        
-        ## 資料來源
-        - [來源1標題](網址)
-        - [來源2標題](網址)
-        ...
-        
-        ---
-        **報告生成時間**：{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-        **系統**：{Config.APP_NAME}
-        
-        注意事項：
-        1. 所有內容必須使用繁體中文
-        2. 超連結格式：[標題](網址)
-        3. 去除重複資訊
-        4. 保持專業且易讀
-        5. 如果沒有找到相關新聞，請明確說明
-        """
-        
         try:
-            # 使用 Agent 執行分析
-            response = self.agent.run(analysis_prompt)
+            items = search_results.get("items") or extract_news_items(content)
+            cached = self._cached_analyses(items)
             
-            # 提取 Markdown 內容
-            if hasattr(response, 'content'):
-                markdown_report = response.content
+            if cached or self._use_map_reduce(mode or Config.ANALYST_MODE, items):
+                report = self._map_reduce(query, items, cached)
             else:
-                markdown_report = str(response)
+                # 使用 Agent 執行分析
+                response = self.backend.run(
+                    self._cassette_key(search_results),
+                    lambda: self.agent.run(self._build_analysis_prompt(query, content))
+                )
+                report = self._parse_output(getattr(response, "content", response), AnalysisReport)
+                
+                if report is None:
+                    # 模型未依結構輸出時，當作 Markdown 報告處理
+                    print("⚠️ 分析結果不符合 JSON 結構，改從 Markdown 提取...")
+                    markdown_report = str(getattr(response, "content", response))
+                    structured_news = self._extract_structured_data(markdown_report, content, query, items=items)
+                    print("✅ Analyst Agent 分析完成")
+                    return markdown_report, structured_news
+                
+                self._remember_report(items, report)
             
-            # 提取結構化新聞數據
-            structured_news = self._extract_structured_data(markdown_report, content, query)
+            markdown_report = self._render_markdown(report, query)
+            structured_news = self._to_rows(report, query)
+            print(f"✅ 成功提取 {len(structured_news)} 則新聞（標題已為中文）")
             
             print("✅ Analyst Agent 分析完成")
             return markdown_report, structured_news
@@ -147,9 +162,305 @@ class AnalystAgent:
 """
             return error_report, []
     
-    def _extract_structured_data(self, markdown_report: str, raw_content: str, query: str) -> List[Dict[str, str]]:
+    @staticmethod
+    def _build_analysis_prompt(query: str, content: str) -> str:
+        """建立單次呼叫分析全部新聞的提示詞"""
+        return f"""
+        請將以下搜尋結果整理成一份專業的繁體中文金融分析。
+        
+        原始查詢：{query}
+        搜尋結果：
+        {content}
+        
+        輸出要求（JSON）：
+        - summary：用 2-3 句話總結本報告的核心內容
+        - items：每則新聞一筆
+          - title：新聞標題翻譯成繁體中文
+          - source、url：原始來源名稱與網址
+          - date：YYYY-MM-DD 格式
+          - country：新聞所屬國家（繁體中文，無法判斷時為「東南亞」）
+          - summary：新聞的詳細摘要，100-300字，說明新聞的主要內容
+          - key_points：關鍵資訊的條列式分析，每點一句
+        - insights：基於以上新聞，提供 3-5 點關鍵洞察
+        
+        注意事項：
+        1. 所有內容必須使用繁體中文（網址除外）
+        2. 去除重複資訊
+        3. 保持專業且易讀
+        4. 如果沒有找到相關新聞，items 為空陣列並在 summary 中明確說明
+        """
+    
+    def _cassette_key(self, search_results: Dict[str, Any]) -> str:
+        """錄製/重播用的鍵值：依查詢與新聞項目（提示詞中含日期，不適合作為鍵值）"""
+        items = search_results.get("items")
+        evidence = [item_identity(item) for item in items] if items else search_results.get("content", "")
+        return cassette_key("agent", self.agent.name, Config.OPENAI_MODEL, search_results.get("query", ""), evidence)
+    
+    @staticmethod
+    def _use_map_reduce(mode: str, items: List[Dict[str, Any]]) -> bool:
+        """是否以 map-reduce 模式分析（需要已解析的新聞項目）"""
+        if not items or mode == "single":
+            return False
+        return mode == "map_reduce" or len(items) >= Config.ANALYST_MAP_REDUCE_MIN_ITEMS
+    
+    def _map_reduce(
+        self,
+        query: str,
+        items: List[Dict[str, Any]],
+        cached: Optional[Dict[int, NewsAnalysis]] = None
+    ) -> AnalysisReport:
+        """
+        map-reduce 分析：逐則新聞並行摘要翻譯，再以一次短呼叫撰寫報告摘要與市場洞察
+        
+        每次呼叫的輸入只有單則新聞，延遲取決於最慢的一則，而非新聞總數
+        
+        Args:
+            query: 搜尋查詢
+            items: 搜尋結果中的新聞項目
+            cached: 已有快取分析的新聞（索引 → 分析），這些新聞不再送交模型
+            
+        Returns:
+            AnalysisReport: 完整分析結果
+        """
+        results = dict(cached or {})
+        pending = [index for index in range(len(items)) if index not in results]
+        
+        if pending:
+            workers = max(1, min(Config.ANALYST_MAP_CONCURRENCY, len(pending)))
+            print(f"🗂️ 以 map-reduce 模式分析 {len(pending)} 則新聞（並行 {workers}，快取命中 {len(results)} 則）...")
+            
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analyst-map") as pool:
+                for index, analysis in zip(pending, pool.map(lambda i: self._analyze_item(query, items[i]), pending)):
+                    results[index] = analysis
+        else:
+            print(f"⚡ {len(items)} 則新聞皆命中分析快取")
+        
+        analyses = [results[index] for index in range(len(items))]
+        overview = self._summarize_report(query, analyses)
+        return AnalysisReport(summary=overview.summary, items=analyses, insights=overview.insights)
+    
+    def _analyze_item(self, query: str, item: Dict[str, Any]) -> NewsAnalysis:
+        """map：摘要並翻譯單則新聞（失敗時保留原始內容）"""
+        # agno Agent 執行時會修改自身狀態，每個並行呼叫各用一個
+        agent = self._create_agent(
+            name="新聞摘要分析師",
+            description="專業的金融新聞分析師，負責摘要並翻譯單則新聞",
+            instructions=[
+                "你是一位專業的金融分析師",
+                "將單則新聞整理成繁體中文的摘要與重點分析",
+                "保留原始的來源名稱、網址與日期",
+            ],
+            output_schema=NewsAnalysis,
+        )
+        prompt = f"""
+        請將以下新聞整理成繁體中文分析（搜尋主題：{query}）。
+        
+        新聞：
+        {json.dumps(item, ensure_ascii=False)}
+        
+        輸出要求（JSON）：
+        - title：新聞標題翻譯成繁體中文
+        - source、url、date：沿用原始內容（日期為 YYYY-MM-DD 格式）
+        - country：新聞所屬國家（繁體中文，無法判斷時為「東南亞」）
+        - summary：新聞的詳細摘要，100-300字
+        - key_points：關鍵資訊的條列式分析，每點一句
+        """
+        
+        try:
+            response = self.backend.run(
+                cassette_key("agent", agent.name, Config.OPENAI_MODEL, query, item_identity(item)),
+                lambda: agent.run(prompt)
+            )
+            analysis = self._parse_output(getattr(response, "content", response), NewsAnalysis)
+        except Exception as e:
+            print(f"⚠️ 新聞摘要失敗（{item.get('url', '')}）: {str(e)}")
+            analysis = None
+        
+        if analysis is None:
+            return NewsAnalysis(
+                title=item.get("title", ""),
+                source=item.get("source", ""),
+                url=item.get("url", ""),
+                date=item.get("date", ""),
+                country=self._extract_country(
+                    item.get("title", ""), f"{item.get('source', '')} {item.get('region', '')}", item.get("summary", "")
+                ),
+                summary=item.get("summary", ""),
+                key_points=[],
+            )
+        
+        # 網址以搜尋結果為準，避免模型改寫
+        analysis = analysis.model_copy(update={"url": item.get("url") or analysis.url})
+        self._remember(item, analysis)
+        return analysis
+    
+    @staticmethod
+    def _article_key(item: Dict[str, Any]) -> Optional[str]:
+        """單則新聞的快取鍵值：正規化網址 + 內容雜湊（沒有網址時不快取）"""
+        url = canonical_item_url(item)
+        if not url:
+            return None
+        content = "\n".join(normalize_text(item.get(field, "")) for field in ("title", "summary", "date"))
+        return PersistentTTLCache.make_key("article", url, hashlib.sha256(content.encode("utf-8")).hexdigest())
+    
+    def _cached_analyses(self, items: List[Dict[str, Any]]) -> Dict[int, NewsAnalysis]:
+        """查詢已快取的單則新聞分析（索引 → 分析）"""
+        if self.cache is None:
+            return {}
+        
+        cached = {}
+        for index, item in enumerate(items):
+            key = self._article_key(item)
+            value = self.cache.get(key) if key else None
+            analysis = self._parse_output(value, NewsAnalysis) if value is not None else None
+            if analysis is not None:
+                cached[index] = analysis
+        return cached
+    
+    def _remember(self, item: Dict[str, Any], analysis: NewsAnalysis):
+        """快取單則新聞的分析結果"""
+        key = self._article_key(item) if self.cache is not None else None
+        if key:
+            self.cache.set(key, analysis.model_dump(mode="json"))
+    
+    def _remember_report(self, items: List[Dict[str, Any]], report: AnalysisReport):
+        """將單次呼叫分析的結果依網址對應回搜尋結果中的新聞並快取"""
+        if self.cache is None:
+            return
+        by_url = {canonical_item_url(item): item for item in items}
+        for analysis in report.items:
+            item = by_url.get(canonicalize_url(analysis.url))
+            if item is not None:
+                self._remember(item, analysis)
+    
+    def _summarize_report(self, query: str, analyses: List[NewsAnalysis]) -> ReportOverview:
+        """reduce：依各則新聞的摘要撰寫報告摘要與市場洞察"""
+        digest = "\n".join(
+            f"{index}. {analysis.title}（{analysis.country}，{analysis.date}）：{analysis.summary}"
+            for index, analysis in enumerate(analyses, 1)
+        )
+        prompt = f"""
+        以下是關於「{query}」的 {len(analyses)} 則新聞摘要：
+        {digest}
+        
+        輸出要求（JSON，繁體中文）：
+        - summary：用 2-3 句話總結本報告的核心內容
+        - insights：基於以上新聞，提供 3-5 點關鍵洞察
+        """
+        agent = self._create_agent(
+            name="市場洞察分析師",
+            description="專業的金融新聞分析師，負責彙總報告摘要與市場洞察",
+            instructions=["你是一位專業的金融分析師", "依據多則新聞摘要，撰寫繁體中文的報告摘要與市場洞察"],
+            output_schema=ReportOverview,
+        )
+        
+        try:
+            response = self.backend.run(
+                cassette_key("agent", agent.name, Config.OPENAI_MODEL, query,
+                             [analysis.url or analysis.title for analysis in analyses]),
+                lambda: agent.run(prompt)
+            )
+            overview = self._parse_output(getattr(response, "content", response), ReportOverview)
+        except Exception as e:
+            print(f"⚠️ 報告摘要生成失敗: {str(e)}")
+            overview = None
+        
+        return overview or ReportOverview(summary=f"本報告整理了 {len(analyses)} 則關於「{query}」的新聞。", insights=[])
+    
+    @staticmethod
+    def _parse_output(content: Any, schema: Type[T]) -> Optional[T]:
+        """
+        驗證模型回應符合指定的結構
+        
+        Args:
+            content: agno 回傳的結構化物件、重播時的字典，或 JSON 字串
+            schema: pydantic 模型類別
+            
+        Returns:
+            Optional: 不符合結構時返回 None
+        """
+        if isinstance(content, schema):
+            return content
+        
+        try:
+            if isinstance(content, str):
+                match = _JSON_BLOCK.search(content)
+                return schema.model_validate_json(match.group(1) if match else content.strip())
+            return schema.model_validate(content)
+        except (ValidationError, ValueError):
+            return None
+    
+    @staticmethod
+    def _render_markdown(report: AnalysisReport, query: str) -> str:
+        """將分析結果輸出成 PDF 使用的 Markdown 報告"""
+        now = datetime.now()
+        lines = [
+            "# 東南亞金融新聞報告",
+            "",
+            "## 報告摘要",
+            report.summary,
+            "",
+            "## 搜尋主題",
+            query,
+            "",
+            "## 報告日期",
+            now.strftime("%Y年%m月%d日"),
+            "",
+            "## 新聞詳情",
+            "",
+        ]
+        
+        if not report.items:
+            lines += ["未找到符合條件的相關新聞。", ""]
+        
+        for index, item in enumerate(report.items, 1):
+            source = f"[{item.source}]({item.url})" if item.url else item.source
+            lines += [
+                f"### {index}. {item.title}",
+                f"- **來源**：{source}",
+                f"- **日期**：{item.date}",
+                f"- **摘要**：{item.summary}",
+                f"- **重點分析**：{' '.join(f'{n}) {point}' for n, point in enumerate(item.key_points, 1))}",
+                "",
+            ]
+        
+        lines += ["## 市場洞察"]
+        lines += [f"{index}. {insight}" for index, insight in enumerate(report.insights, 1)]
+        lines += ["", "## 資料來源"]
+        lines += [f"- [{item.title}]({item.url})" for item in report.items if item.url]
+        lines += [
+            "",
+            "---",
+            f"**報告生成時間**：{now.strftime('%Y-%m-%d %H:%M:%S')}",
+            f"**系統**：{Config.APP_NAME}",
+        ]
+        return "\n".join(lines)
+    
+    def _to_rows(self, report: AnalysisReport, query: str) -> List[Dict[str, str]]:
+        """將分析結果轉為 Excel 使用的新聞資料列"""
+        return [
+            {
+                '新聞標題（中文）': item.title,
+                '來源國家': item.country or self._extract_country(item.title, item.source, item.summary),
+                '關鍵字': query,
+                '來源網站連結': item.url,
+                '發布日期': item.date,
+                '摘要': item.summary,
+                '重點分析': "\n".join(f"{n}) {point}" for n, point in enumerate(item.key_points, 1)),
+                '來源': item.source
+            }
+            for item in report.items
+        ]
+    
+    def _extract_structured_data(
+        self,
+        markdown_report: str,
+        raw_content: str,
+        query: str,
+        items: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, str]]:
         """
-        從 Markdown 報告和原始內容中提取結構化新聞數據
+        從 Markdown 報告和原始內容中提取結構化新聞數據（模型未回傳 JSON 時的後備）
         
         優先從 Markdown 報告中提取，因為其中的標題已經被翻譯成中文
         
@@ -157,139 +468,85 @@ class AnalystAgent:
             markdown_report: Markdown 格式的報告（包含已翻譯的中文標題）
             raw_content: 來自搜尋的原始內容
             query: 搜尋查詢（作為關鍵字）
+            items: Research Agent 串流中已解析的新聞項目（有則不需重新解析 JSON）
             
         Returns:
             List[Dict]: 結構化的新聞列表
         """
-        structured_news = []
+        print("📝 從 Markdown 報告中提取結構化數據（含中文標題）...")
+        structured_news = self._extract_from_markdown(markdown_report, query)
         
-        try:
-            # 優先從 Markdown 報告中提取（標題已翻譯成中文）
-            print("📝 從 Markdown 報告中提取結構化數據（含中文標題）...")
-            structured_news = self._extract_from_markdown(markdown_report, query)
-            
-            # 如果 Markdown 提取失敗，才嘗試從 JSON 解析
-            if not structured_news:
-                print("⚠️ Markdown 提取失敗，嘗試從 JSON 解析...")
-                json_match = re.search(r'```json\s*(\{.*?\})\s*```', raw_content, re.DOTALL)
-                if json_match:
-                    json_data = json.loads(json_match.group(1))
-                    results = json_data.get('results', [])
-                    
-                    for result in results:
-                        # 提取國家資訊（從來源或標題中）
-                        country = self._extract_country(
-                            result.get('title', ''),
-                            result.get('source', ''),
-                            result.get('summary', '')
-                        )
-                        
-                        structured_news.append({
-                            '新聞標題（中文）': result.get('title', ''),
-                            '來源國家': country,
-                            '關鍵字': query,
-                            '來源網站連結': result.get('url', ''),
-                            '發布日期': result.get('date', ''),
-                            '來源': result.get('source', '')
-                        })
-        
-        except Exception as e:
-            print(f"⚠️ 結構化數據提取失敗: {str(e)}")
-            # 作為後備，再次嘗試從 Markdown 中提取
-            structured_news = self._extract_from_markdown(markdown_report, query)
+        # 如果 Markdown 提取失敗，才使用搜尋結果中的新聞項目
+        if not structured_news:
+            print("⚠️ Markdown 提取失敗，改用搜尋結果...")
+            results = items or extract_news_items(raw_content)
+            # 提取國家資訊（從標題、來源、來源地區與摘要中）
+            countries = self._extract_countries([
+                (result.get('title', ''), result.get('source', ''), result.get('region', ''), result.get('summary', ''))
+                for result in results
+            ])
+            for result, country in zip(results, countries):
+                structured_news.append({
+                    '新聞標題（中文）': result.get('title', ''),
+                    '來源國家': country,
+                    '關鍵字': query,
+                    '來源網站連結': result.get('url', ''),
+                    '發布日期': result.get('date', ''),
+                    '來源': result.get('source', '')
+                })
         
         if structured_news:
-            print(f"✅ 成功提取 {len(structured_news)} 則新聞（標題已為中文）")
+            print(f"✅ 成功提取 {len(structured_news)} 則新聞")
         else:
             print("⚠️ 未能提取到任何新聞數據")
         
         return structured_news
     
+    @staticmethod
+    def _extract_countries(texts: Sequence[Tuple[str, ...]]) -> List[str]:
+        """
+        批次從文本中提取國家資訊（所有新聞串接後以詞典自動機掃描一次）
+        
+        Args:
+            texts: 各新聞的文字欄位（標題、來源、摘要等）
+            
+        Returns:
+            List[str]: 各新聞提及最多的國家（次數相近的多個國家以「、」連接）；沒有提及時為「東南亞」
+        """
+        counts = default_tagger().tag_batch([" ".join(parts) for parts in texts])
+        return [primary_countries(count) for count in counts]
+    
     def _extract_country(self, title: str, source: str, summary: str) -> str:
         """從文本中提取國家資訊"""
-        text = f"{title} {source} {summary}".lower()
-        
-        countries = {
-            'singapore': '新加坡',
-            'malaysia': '馬來西亞',
-            'thailand': '泰國',
-            'indonesia': '印尼',
-            'vietnam': '越南',
-            'philippines': '菲律賓',
-            '新加坡': '新加坡',
-            '馬來西亞': '馬來西亞',
-            '泰國': '泰國',
-            '印尼': '印尼',
-            '越南': '越南',
-            '菲律賓': '菲律賓'
-        }
-        
-        for key, value in countries.items():
-            if key in text:
-                return value
-        
-        return '東南亞'
+        return self._extract_countries([(title, source, summary)])[0]
     
     def _extract_from_markdown(self, markdown_report: str, query: str) -> List[Dict[str, str]]:
         """從 Markdown 報告中提取新聞資訊"""
         structured_news = []
         
-        # 使用正則表達式匹配新聞標題和相關資訊
-        news_pattern = r'###\s+\d+\.\s+(.*?)\n(.*?)(?=###|\Z)'
-        matches = re.findall(news_pattern, markdown_report, re.DOTALL)
-        
-        for title, content in matches:
+        sections = _MD_NEWS.findall(markdown_report)
+        countries = self._extract_countries(sections)
+        for (title, content), country in zip(sections, countries):
             title = title.strip()
             
             # 提取來源和網址
-            source_match = re.search(r'\*\*來源\*\*[：:]\s*\[?(.*?)\]?\(?(https?://[^\s\)]+)', content)
             source = ''
             url = ''
+            source_match = _MD_SOURCE.search(content)
             if source_match:
                 source = source_match.group(1).strip()
                 url = source_match.group(2).strip()
             else:
-                # 嘗試另一種格式
-                url_match = re.search(r'(https?://[^\s\)]+)', content)
+                url_match = _MD_URL.search(content)
                 if url_match:
                     url = url_match.group(1).strip()
             
-            # 提取日期 - 改進的日期提取邏輯
-            date = ''
-            # 首先嘗試匹配 "**日期**：YYYY-MM-DD" 格式
-            date_match = re.search(r'\*\*日期\*\*[：:]\s*([^\n*]+)', content)
-            if date_match:
-                date = date_match.group(1).strip()
-            else:
-                # 嘗試匹配其他常見日期格式
-                # 格式如：2025-10-13, 2025/10/13, 2025.10.13
-                date_pattern = r'(\d{4}[-/\.]\d{1,2}[-/\.]\d{1,2})'
-                date_match2 = re.search(date_pattern, content)
-                if date_match2:
-                    date = date_match2.group(1)
-                else:
-                    # 嘗試中文日期格式：2025年10月13日
-                    date_pattern_cn = r'(\d{4}年\d{1,2}月\d{1,2}日)'
-                    date_match3 = re.search(date_pattern_cn, content)
-                    if date_match3:
-                        date = date_match3.group(1)
-            
-            # 提取摘要 - 改進的正則表達式，支援多行內容
-            summary = ''
-            # 嘗試匹配摘要內容，直到遇到下一個粗體項目或結束
-            summary_match = re.search(r'\*\*摘要\*\*[：:]\s*([^\n]*(?:\n(?!\s*[-\*]\s*\*\*)[^\n]*)*)', content, re.DOTALL)
-            if summary_match:
-                summary = summary_match.group(1).strip()
-            
-            # 提取重點分析 - 改進的正則表達式，支援多行和條列式內容
-            analysis = ''
-            # 嘗試匹配重點分析內容，直到遇到下一個標題或結束
-            analysis_match = re.search(r'\*\*重點分析\*\*[：:]\s*([^\n]*(?:\n(?!\s*###|\s*##|\s*[-\*]\s*\*\*(?!.*分析))[^\n]*)*)', content, re.DOTALL)
-            if analysis_match:
-                analysis = analysis_match.group(1).strip()
+            # 提取日期：「**日期**：...」優先，其次為內文中的日期
+            date_match = _MD_DATE_FIELD.search(content) or _MD_DATE.search(content) or _MD_DATE_CN.search(content)
+            date = date_match.group(1).strip() if date_match else ''
             
-            # 提取國家
-            country = self._extract_country(title, source, content)
+            summary_match = _MD_SUMMARY.search(content)
+            analysis_match = _MD_ANALYSIS.search(content)
             
             structured_news.append({
                 '新聞標題（中文）': title,
@@ -297,8 +554,8 @@ class AnalystAgent:
                 '關鍵字': query,
                 '來源網站連結': url,
                 '發布日期': date,
-                '摘要': summary,
-                '重點分析': analysis,
+                '摘要': summary_match.group(1).strip() if summary_match else '',
+                '重點分析': analysis_match.group(1).strip() if analysis_match else '',
                 '來源': source
             })
         
@@ -0,0 +1,288 @@
+"""
+模型後端
+Research Agent 的 Responses API 串流與 agno Agent.run 都經由後端執行：
+
+- live：直接呼叫 OpenAI（預設）
+- record：呼叫 OpenAI，並將串流事件、回應內容與時間點寫入 cassette 檔
+- replay：不連網，從 cassette 檔重播（可依原始時間、加速或無延遲）
+
+cassette 為 JSONL 檔，每行一筆紀錄，以語意鍵值（查詢參數，而非含日期的完整提示詞）索引，
+讓同一份錄製在不同日期仍可重播，用於離線量測非 LLM 程式碼的吞吐量與延遲
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from config import Config
+
+
+class CassetteMissError(KeyError):
+    """重播模式下 cassette 中沒有對應的紀錄"""
+
+
+def cassette_key(*parts: Any) -> str:
+    """由語意參數產生 cassette 鍵值"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _to_namespace(value: Any) -> Any:
+    """將事件字典轉為可用屬性存取的物件（與 OpenAI SDK 事件相同的存取方式）"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_to_namespace(item) for item in value]
+    return value
+
+
+def _dump_event(event: Any) -> Dict[str, Any]:
+    """序列化串流事件（OpenAI SDK 事件為 pydantic 模型）"""
+    if hasattr(event, "model_dump"):
+        return event.model_dump(mode="json", exclude_none=True)
+    if isinstance(event, SimpleNamespace):
+        return {key: _dump_value(item) for key, item in vars(event).items()}
+    return dict(event)
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, SimpleNamespace) or hasattr(value, "model_dump"):
+        return _dump_event(value)
+    if isinstance(value, list):
+        return [_dump_value(item) for item in value]
+    return value
+
+
+class Cassette:
+    """JSONL 錄製檔（同一鍵值以最後一筆為準）"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    self._records[record["key"]] = record
+
+    def get(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            record = self._records.get(key)
+        if record is None:
+            raise CassetteMissError(f"cassette {self.path.name} 中沒有對應的紀錄: {key[:12]}")
+        return record
+
+    def append(self, record: Dict[str, Any]):
+        with self._lock:
+            self._records[record["key"]] = record
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+
+class LiveBackend:
+    """直接呼叫模型"""
+
+    name = "live"
+
+    def stream(self, key: str, create: Callable[[], Iterable[Any]]) -> Iterable[Any]:
+        """
+        開啟同步串流
+
+        Args:
+            key: cassette 鍵值（live 模式不使用）
+            create: 實際建立串流的函數
+        """
+        return create()
+
+    async def astream(self, key: str, create: Callable[[], Awaitable[Any]]) -> Any:
+        """開啟非同步串流"""
+        return await create()
+
+    def run(self, key: str, run: Callable[[], Any]) -> Any:
+        """執行 agno Agent.run 之類的單次呼叫，返回含 content 屬性的回應"""
+        return run()
+
+
+class RecordingBackend(LiveBackend):
+    """呼叫模型並錄製結果"""
+
+    name = "record"
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    def stream(self, key: str, create: Callable[[], Iterable[Any]]) -> Iterable[Any]:
+        started = time.perf_counter()
+        return _RecordingStream(self.cassette, key, started, create())
+
+    async def astream(self, key: str, create: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.perf_counter()
+        return _RecordingStream(self.cassette, key, started, await create())
+
+    def run(self, key: str, run: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        response = run()
+        content = getattr(response, "content", None)
+        if hasattr(content, "model_dump"):
+            # 結構化輸出（pydantic 模型）以 JSON 物件保存
+            content = content.model_dump(mode="json")
+        self.cassette.append({
+            "key": key,
+            "kind": "run",
+            "elapsed": round(time.perf_counter() - started, 4),
+            "content": content if content is not None else str(response),
+        })
+        return response
+
+
+class ReplayBackend(LiveBackend):
+    """從 cassette 重播，不連網"""
+
+    name = "replay"
+
+    def __init__(self, cassette: Cassette, speed: float = 1.0):
+        """
+        Args:
+            cassette: 錄製檔
+            speed: 重播速度倍率（1 為原始時間、10 為十倍速、0 為無延遲）
+        """
+        self.cassette = cassette
+        self.speed = speed
+
+    def stream(self, key: str, create: Callable[[], Iterable[Any]]) -> Iterable[Any]:
+        return _ReplayStream(self.cassette.get(key)["events"], self.speed)
+
+    async def astream(self, key: str, create: Callable[[], Awaitable[Any]]) -> Any:
+        return _ReplayStream(self.cassette.get(key)["events"], self.speed)
+
+    def run(self, key: str, run: Callable[[], Any]) -> Any:
+        record = self.cassette.get(key)
+        if self.speed > 0:
+            time.sleep(record["elapsed"] / self.speed)
+        return SimpleNamespace(content=record["content"])
+
+
+class _RecordingStream:
+    """包裝串流：逐一轉交事件並記錄時間點，結束或關閉時寫入 cassette"""
+
+    def __init__(self, cassette: Cassette, key: str, started: float, stream: Any):
+        self._cassette = cassette
+        self._key = key
+        self._started = started
+        self._stream = stream
+        self._events: List[Dict[str, Any]] = []
+        self._saved = False
+
+    def _record(self, event: Any):
+        self._events.append({"t": round(time.perf_counter() - self._started, 4), "event": _dump_event(event)})
+
+    def _save(self):
+        if not self._saved:
+            self._saved = True
+            self._cassette.append({"key": self._key, "kind": "stream", "events": self._events})
+
+    def __iter__(self) -> Iterator[Any]:
+        for event in self._stream:
+            self._record(event)
+            yield event
+        self._save()
+
+    async def _aiterate(self) -> AsyncIterator[Any]:
+        async for event in self._stream:
+            self._record(event)
+            yield event
+        self._save()
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._aiterate()
+
+    def close(self):
+        """關閉串流（包裝非同步串流時返回需 await 的 coroutine）"""
+        self._save()
+        return self._stream.close()
+
+
+class _ReplayStream:
+    """依錄製的時間點重播事件"""
+
+    def __init__(self, events: List[Dict[str, Any]], speed: float):
+        self._events = events
+        self._speed = speed
+        self._closed = False
+
+    def _delays(self) -> Iterator[tuple]:
+        previous = 0.0
+        for record in self._events:
+            delay = (record["t"] - previous) / self._speed if self._speed > 0 else 0.0
+            previous = record["t"]
+            yield delay, _to_namespace(record["event"])
+
+    def __iter__(self) -> Iterator[Any]:
+        for delay, event in self._delays():
+            if self._closed:
+                return
+            if delay > 0:
+                time.sleep(delay)
+            yield event
+
+    async def _aiterate(self) -> AsyncIterator[Any]:
+        for delay, event in self._delays():
+            if self._closed:
+                return
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield event
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self._aiterate()
+
+    def close(self):
+        self._closed = True
+
+
+def create_backend(
+    mode: Optional[str] = None,
+    cassette_path: Optional[Union[str, Path]] = None,
+    speed: Optional[float] = None
+) -> LiveBackend:
+    """
+    依設定建立模型後端
+
+    Args:
+        mode: "live"、"record" 或 "replay"，預設為 Config.MODEL_BACKEND
+        cassette_path: 錄製檔路徑，預設為 Config.CASSETTE_PATH
+        speed: 重播速度倍率，預設為 Config.REPLAY_SPEED
+
+    Returns:
+        LiveBackend: 模型後端
+    """
+    mode = (mode or Config.MODEL_BACKEND).lower()
+    if mode == "live":
+        return LiveBackend()
+
+    cassette = Cassette(cassette_path or Config.CASSETTE_PATH)
+    if mode == "record":
+        return RecordingBackend(cassette)
+    if mode == "replay":
+        return ReplayBackend(cassette, Config.REPLAY_SPEED if speed is None else speed)
+    raise ValueError(f"不支援的模型後端: {mode}")
+
+
+# 全域模型後端
+model_backend = create_backend()
@@ -0,0 +1,131 @@
+"""
+共用 OpenAI 客戶端
+整個程序共用同一組 httpx 連線池（keep-alive、HTTP/2），
+各 Agent 不再各自建立客戶端，避免每次呼叫都重新建立 TCP/TLS 連線
+
+非同步客戶端固定在一個背景 event loop 上執行（httpx 的非同步連線與 event loop 綁定），
+同步程式碼透過 run_async() 把協程交給該 loop
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from config import Config
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_openai_client: Optional[OpenAI] = None
+_async_openai_client: Optional[AsyncOpenAI] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_http2_fallback_logged = False
+
+
+def _http2_enabled() -> bool:
+    """HTTP/2 需要安裝 h2 套件（httpx[http2]），未安裝時退回 HTTP/1.1 並記錄一次警告"""
+    global _http2_fallback_logged
+    if not Config.OPENAI_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        if not _http2_fallback_logged:
+            _http2_fallback_logged = True
+            logger.warning("OPENAI_HTTP2 已啟用但未安裝 h2 套件（httpx[http2]），共用連線池改用 HTTP/1.1")
+        return False
+    return True
+
+
+def _client_options() -> dict:
+    return {
+        "http2": _http2_enabled(),
+        "limits": httpx.Limits(
+            max_connections=Config.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=Config.OPENAI_MAX_KEEPALIVE,
+            keepalive_expiry=Config.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(Config.OPENAI_TIMEOUT, connect=10.0),
+    }
+
+
+def get_http_client() -> httpx.Client:
+    """共用的同步 httpx 連線池（可直接交給 agno 的 OpenAIChat(http_client=...)）"""
+    global _http_client
+    with _lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.Client(**_client_options())
+        return _http_client
+
+
+def get_openai_client() -> OpenAI:
+    """共用的同步 OpenAI 客戶端"""
+    global _openai_client
+    http_client = get_http_client()
+    with _lock:
+        if _openai_client is None or _openai_client.is_closed():
+            _openai_client = OpenAI(api_key=Config.OPENAI_API_KEY, http_client=http_client)
+        return _openai_client
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """共用的非同步 OpenAI 客戶端（只能在 run_async() 的背景 loop 中使用）"""
+    global _async_http_client, _async_openai_client
+    with _lock:
+        if _async_openai_client is None or _async_openai_client.is_closed():
+            _async_http_client = httpx.AsyncClient(**_client_options())
+            _async_openai_client = AsyncOpenAI(api_key=Config.OPENAI_API_KEY, http_client=_async_http_client)
+        return _async_openai_client
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="openai-client-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def run_async(coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+    """
+    在共用的背景 event loop 上執行協程並等待結果（供同步程式碼或執行緒池呼叫）
+
+    Args:
+        coro: 要執行的協程
+        timeout: 最長等待秒數
+
+    Returns:
+        協程的返回值
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result(timeout)
+
+
+def close_clients():
+    """關閉所有共用連線與背景 loop（應用程式關閉時呼叫）"""
+    global _http_client, _async_http_client, _openai_client, _async_openai_client, _loop, _loop_thread
+    with _lock:
+        http_client, async_http_client = _http_client, _async_http_client
+        loop, loop_thread = _loop, _loop_thread
+        _http_client = _async_http_client = None
+        _openai_client = _async_openai_client = None
+        _loop = _loop_thread = None
+
+    if http_client is not None:
+        http_client.close()
+
+    if loop is not None:
+        if async_http_client is not None:
+            asyncio.run_coroutine_threadsafe(async_http_client.aclose(), loop).result(10)
+        loop.call_soon_threadsafe(loop.stop)
+        loop_thread.join(timeout=10)
+        loop.close()
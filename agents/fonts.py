@@ -0,0 +1,170 @@
+"""
+PDF 中文字體
+找出可用的中文字體並註冊到 ReportLab。每個程序只註冊一次，所有 ReportGeneratorAgent 與段落樣式共用；
+找到的字體路徑（與載入失敗的路徑）記錄在磁碟上，之後的程序（包含 PDF 渲染 worker）直接載入，
+不再逐一解析候選字體
+"""
+import json
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+from config import Config
+
+# 註冊到 ReportLab 的字體名稱
+FONT_NAME = "ChineseFont"
+
+# 找不到中文字體時使用的預設字體
+FALLBACK_FONT = "Helvetica"
+
+# 常見的中文字體路徑（支援 Windows、macOS 與 Linux）
+FONT_CANDIDATES = [
+    # Windows 系統
+    'C:\\Windows\\Fonts\\msjh.ttc',           # 微軟正黑體
+    'C:\\Windows\\Fonts\\msyh.ttc',           # 微軟雅黑
+    'C:\\Windows\\Fonts\\kaiu.ttf',           # 標楷體
+    'C:\\Windows\\Fonts\\mingliu.ttc',        # 細明體
+    # macOS 系統
+    '/System/Library/Fonts/PingFang.ttc',     # 蘋方（macOS 預設）
+    '/System/Library/Fonts/STHeiti Light.ttc', # 華文黑體
+    '/System/Library/Fonts/STHeiti Medium.ttc',
+    '/Library/Fonts/Songti.ttc',              # 宋體
+    '/System/Library/Fonts/Hiragino Sans GB.ttc', # 冬青黑體
+    # Linux 系統
+    '/usr/share/fonts/truetype/arphic/uming.ttc',
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+]
+
+# fontconfig 查詢的語言（依序）
+_FONTCONFIG_LANGS = ("zh-tw", "zh-cn")
+
+_lock = threading.Lock()
+_registered: Optional[str] = None
+
+
+def _fingerprint(path: str) -> Optional[List[float]]:
+    """字體檔案的大小與修改時間（檔案更換後快取即失效）；檔案不存在時返回 None"""
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime]
+
+
+def _load_cache(cache_path: Path) -> Dict:
+    try:
+        return json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache_path: Path, cache: Dict):
+    """寫入字體快取（失敗不影響字體註冊）"""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = cache_path.with_suffix(cache_path.suffix + ".tmp")
+        temp_path.write_text(json.dumps(cache, ensure_ascii=False), encoding="utf-8")
+        temp_path.replace(cache_path)
+    except OSError as e:
+        print(f"⚠️ 字體快取寫入失敗: {str(e)}")
+
+
+def _fontconfig_paths() -> List[str]:
+    """以 fontconfig（fc-match）查詢系統的中文字體"""
+    fc_match = shutil.which("fc-match")
+    if not fc_match:
+        return []
+
+    paths = []
+    for lang in _FONTCONFIG_LANGS:
+        try:
+            result = subprocess.run(
+                [fc_match, "-f", "%{file}", f":lang={lang}"], capture_output=True, text=True, timeout=5
+            )
+        except (OSError, subprocess.SubprocessError):
+            continue
+        path = result.stdout.strip()
+        if result.returncode == 0 and path.lower().endswith((".ttf", ".ttc")):
+            paths.append(path)
+    return paths
+
+
+def _candidate_paths(cache: Dict) -> Iterator[str]:
+    """
+    依序產生要嘗試的字體路徑：設定指定的字體、快取中的字體、常見路徑、fontconfig 查詢結果
+
+    快取記錄為無法載入（且檔案未變更）的路徑會略過
+    """
+    failed = cache.get("failed", {})
+    cached = cache.get("path")
+    preferred = [Config.PDF_FONT_PATH] if Config.PDF_FONT_PATH else []
+    if cached and _fingerprint(cached) == cache.get("fingerprint"):
+        preferred.append(cached)
+
+    seen = set()
+    for group in (preferred, FONT_CANDIDATES, None):
+        for path in (group if group is not None else _fontconfig_paths()):
+            if not path or path in seen:
+                continue
+            seen.add(path)
+            fingerprint = _fingerprint(path)
+            if fingerprint is None or failed.get(path) == fingerprint:
+                continue
+            yield path
+
+
+def _register(cache_path: Path) -> str:
+    cache = _load_cache(cache_path)
+    failed = dict(cache.get("failed", {}))
+
+    for path in _candidate_paths(cache):
+        try:
+            pdfmetrics.registerFont(TTFont(FONT_NAME, path))
+        except Exception:
+            # 某些字體文件可能無法載入（例如 CFF 格式），記錄後不再嘗試
+            failed[path] = _fingerprint(path)
+            continue
+
+        print(f"✅ 已註冊中文字體: {path}")
+        updated = {"path": path, "fingerprint": _fingerprint(path), "failed": failed}
+        if updated != cache:
+            _save_cache(cache_path, updated)
+        return FONT_NAME
+
+    print("⚠️  未找到中文字體，使用預設字體（可能無法正確顯示中文）")
+    if failed != cache.get("failed", {}):
+        _save_cache(cache_path, {"failed": failed})
+    return FALLBACK_FONT
+
+
+def register_cjk_font(cache_path: Optional[Path] = None) -> str:
+    """
+    註冊中文字體（每個程序只執行一次，之後直接返回結果）
+
+    Args:
+        cache_path: 字體快取檔案，預設為 Config.FONT_CACHE_PATH
+
+    Returns:
+        str: 可在段落樣式中使用的字體名稱；找不到中文字體時為 FALLBACK_FONT
+    """
+    global _registered
+    with _lock:
+        if _registered is None:
+            try:
+                _registered = _register(Path(cache_path or Config.FONT_CACHE_PATH))
+            except Exception as e:
+                print(f"⚠️  字體註冊失敗，使用預設字體: {str(e)}")
+                _registered = FALLBACK_FONT
+        return _registered
+
+
+def reset_font_registration():
+    """清除本程序的註冊結果（下次 register_cjk_font 會重新尋找字體，供測試使用）"""
+    global _registered
+    with _lock:
+        _registered = None
@@ -0,0 +1,238 @@
+"""
+Markdown 轉 ReportLab flowables
+以 markdown 套件的區塊解析器取得文件結構（標題、段落、清單、引言、程式碼區塊），單次走訪產生 story：
+同一段落的多行合併為一個 Paragraph，清單項目使用段落內建的項目符號與懸掛縮排，連結輸出為可點擊的連結註解；
+間距由段落樣式的 spaceAfter 提供，不再為每個空行建立 Spacer
+
+行內語法（粗體、斜體、程式碼、連結）以一個預先編譯的 regex 在每段文字上掃描一次轉為 ReportLab 段落標記
+"""
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+from xml.etree.ElementTree import Element
+
+import markdown
+from reportlab.lib.colors import HexColor
+from reportlab.lib.enums import TA_LEFT
+from reportlab.lib.styles import ParagraphStyle, StyleSheet1
+from reportlab.lib.units import inch
+from reportlab.platypus import Flowable, HRFlowable, Paragraph, Spacer
+
+# 行內語法：程式碼、反斜線跳脫、連結、自動連結、粗體、斜體（同一位置依序嘗試）
+# 中文字前後的 * 也視為強調；_ 只在字詞邊界生效（避免 snake_case 與網址被誤判）
+_INLINE = re.compile(
+    r"(?P<code>`+)(?P<code_text>.+?)(?P=code)"
+    r"|\\(?P<escaped>[\\`*_{}\[\]()#+\-.!])"
+    r"|\[(?P<link_text>[^\]]*)\]\(\s*<?(?P<href>[^)\s>]*)>?(?:\s+\"[^\"]*\")?\s*\)"
+    r"|<(?P<autolink>https?://[^>\s]+)>"
+    r"|(?P<strong>\*\*|__)(?=\S)(?P<strong_text>.+?)(?<=\S)(?P=strong)"
+    r"|\*(?=[^\s*])(?P<em_text>.+?)(?<=[^\s*])\*"
+    r"|(?<![A-Za-z0-9_])_(?=[^\s_])(?P<underscore_text>.+?)(?<=[^\s_])_(?![A-Za-z0-9_])",
+    re.DOTALL
+)
+
+# markdown 以 STX/ETX 包住的原始 HTML 暫存標記
+_STASH_MARKER = re.compile("\x02wzxhzdk:(\\d+)\x03")
+_HTML_TAG = re.compile(r"<[^>]+>")
+_LINE_BREAK = re.compile(r"[ \t]*\n[ \t]*")
+
+# 標題層級對應的樣式與其後增加的間距
+_HEADINGS = {
+    "h1": ("CustomTitle", 0.3 * inch),
+    "h2": ("CustomHeading2", 0.2 * inch),
+    "h3": ("CustomHeading3", 0.1 * inch),
+}
+
+_LINK_COLOR = "blue"
+
+# 段落、清單與分隔線之後的間距
+_BLOCK_SPACE = 0.1 * inch
+
+# 清單每一層的縮排與項目符號
+_LIST_INDENT = 12
+_MAX_LIST_DEPTH = 4
+_BULLETS = ("•", "–")
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+@lru_cache(maxsize=None)
+def _flow_styles(styles: StyleSheet1, font_name: str) -> Dict[str, ParagraphStyle]:
+    """
+    由報告樣式衍生轉換用的樣式（依樣式表快取）
+
+    標題與段落後的間距改由 spaceAfter 提供，不另外建立 Spacer；清單項目使用段落內建的項目符號與懸掛縮排
+    """
+    body = styles["CustomBody"]
+    derived = {
+        tag: ParagraphStyle(f"{tag}Flow", parent=styles[name], spaceAfter=styles[name].spaceAfter + space)
+        for tag, (name, space) in _HEADINGS.items()
+    }
+    derived["p"] = ParagraphStyle("BodyFlow", parent=body, spaceAfter=_BLOCK_SPACE)
+    for depth in range(_MAX_LIST_DEPTH):
+        derived[f"li{depth}"] = ParagraphStyle(
+            f"ListItem{depth}",
+            parent=body,
+            alignment=TA_LEFT,
+            leftIndent=_LIST_INDENT * (depth + 1),
+            bulletIndent=_LIST_INDENT * depth,
+            bulletFontName=font_name
+        )
+    return derived
+
+
+class MarkdownFlowables:
+    """將 Markdown 轉為 ReportLab flowables"""
+
+    def __init__(self, styles: StyleSheet1, font_name: str):
+        """
+        Args:
+            styles: 含 CustomTitle、CustomHeading2、CustomHeading3、CustomBody 的樣式表
+            font_name: 報告使用的字體（清單項目符號亦使用此字體）
+        """
+        self.styles = _flow_styles(styles, font_name)
+        self._raw_html: List[str] = []
+
+    def convert(self, markdown_content: str) -> List[Flowable]:
+        """
+        轉換 Markdown 為 story
+
+        Args:
+            markdown_content: Markdown 文字
+
+        Returns:
+            List[Flowable]: ReportLab flowables
+        """
+        story: List[Flowable] = []
+        for element in self._parse(markdown_content or ""):
+            self._block(element, story)
+        return story
+
+    def _parse(self, markdown_content: str) -> Element:
+        """
+        以 markdown 套件的前處理與區塊解析器取得文件結構（行內語法保留為原始文字，由 _markup 處理）
+
+        每次建立新的 Markdown 實例，可在多個執行緒中同時使用
+        """
+        md = markdown.Markdown(extensions=["sane_lists"])
+        lines = markdown_content.split("\n")
+        for preprocessor in md.preprocessors:
+            lines = preprocessor.run(lines)
+        root = md.parser.parseDocument(lines).getroot()
+        self._raw_html = md.htmlStash.rawHtmlBlocks
+        return root
+
+    def _block(self, element: Element, story: List[Flowable]):
+        """區塊元素"""
+        tag = element.tag
+        if tag in _HEADINGS or tag in ("h4", "h5", "h6"):
+            story.append(Paragraph(self._markup(element.text), self.styles.get(tag, self.styles["h3"])))
+
+        elif tag in ("ul", "ol"):
+            self._list(element, story, 0)
+            story.append(Spacer(1, _BLOCK_SPACE))
+
+        elif tag == "hr":
+            story.append(HRFlowable(width="100%", thickness=0.5, color=HexColor("#999999"),
+                                    spaceBefore=_BLOCK_SPACE, spaceAfter=_BLOCK_SPACE))
+
+        elif tag == "pre":
+            story.append(Paragraph(self._code(element), self.styles["p"]))
+
+        elif len(element):
+            # blockquote 等容器：展開子元素
+            self._paragraph(self._markup(element.text), story)
+            for child in element:
+                self._block(child, story)
+                self._paragraph(self._markup(child.tail), story)
+
+        else:
+            self._paragraph(self._markup(element.text), story)
+
+    def _paragraph(self, text: str, story: List[Flowable]):
+        if text:
+            story.append(Paragraph(text, self.styles["p"]))
+
+    def _list(self, element: Element, story: List[Flowable], depth: int):
+        """清單：每個項目一個段落（巢狀清單增加縮排，鬆散清單中的後續段落不加項目符號）"""
+        style = self.styles[f"li{min(depth, _MAX_LIST_DEPTH - 1)}"]
+        ordered = element.tag == "ol"
+        number = int(element.get("start", "1")) if ordered else 0
+
+        for li in element:
+            if li.tag != "li":
+                continue
+            bullet = f"{number}." if ordered else _BULLETS[depth % len(_BULLETS)]
+            number += 1
+
+            bullet = self._list_paragraph(self._markup(li.text), style, bullet, story)
+            for child in li:
+                if child.tag in ("ul", "ol"):
+                    self._list(child, story, depth + 1)
+                elif child.tag == "pre":
+                    bullet = self._list_paragraph(self._code(child), style, bullet, story)
+                else:
+                    bullet = self._list_paragraph(self._markup("".join(child.itertext())), style, bullet, story)
+                bullet = self._list_paragraph(self._markup(child.tail), style, bullet, story)
+
+    @staticmethod
+    def _list_paragraph(
+        text: str, style: ParagraphStyle, bullet: Optional[str], story: List[Flowable]
+    ) -> Optional[str]:
+        """輸出清單項目中的一個段落（項目符號只加在第一個段落），返回尚未使用的項目符號"""
+        if not text:
+            return bullet
+        story.append(Paragraph(text, style, bulletText=bullet))
+        return None
+
+    @staticmethod
+    def _code(element: Element) -> str:
+        """程式碼區塊（保留換行，使用等寬字體）"""
+        text = _escape("".join(element.itertext()).strip("\n")).replace("\n", "<br/>")
+        return f'<font face="Courier">{text}</font>'
+
+    def _markup(self, text: Optional[str]) -> str:
+        """文字中的行內語法轉為 ReportLab 段落標記（段落中的換行保留為 <br/>）"""
+        if not text or not text.strip():
+            return ""
+        if "\x02" in text:
+            text = _STASH_MARKER.sub(self._stashed_text, text)
+        return _LINE_BREAK.sub("<br/>", self._inline(text.strip()))
+
+    def _stashed_text(self, match: re.Match) -> str:
+        """原始 HTML 區塊只保留文字內容"""
+        index = int(match.group(1))
+        return _HTML_TAG.sub("", self._raw_html[index]) if index < len(self._raw_html) else ""
+
+    def _inline(self, text: str) -> str:
+        parts = []
+        position = 0
+        for match in _INLINE.finditer(text):
+            parts.append(_escape(text[position:match.start()]))
+            parts.append(self._inline_match(match))
+            position = match.end()
+        parts.append(_escape(text[position:]))
+        return "".join(parts)
+
+    def _inline_match(self, match: re.Match) -> str:
+        groups = match.groupdict()
+        if groups["code"]:
+            return f'<font face="Courier">{_escape(groups["code_text"].strip())}</font>'
+        if groups["escaped"]:
+            return _escape(groups["escaped"])
+        if groups["href"] is not None:
+            href = _escape(groups["href"])
+            content = self._inline(groups["link_text"])
+            if not href:
+                return content
+            # 網址列在連結文字之後（列印時仍看得到來源），只建立一個連結註解
+            url = f'<link href="{href}" color="{_LINK_COLOR}">{href}</link>'
+            return url if not content or content == href else f"{content} ({url})"
+        if groups["autolink"]:
+            href = _escape(groups["autolink"])
+            return f'<link href="{href}" color="{_LINK_COLOR}">{href}</link>'
+        if groups["strong"]:
+            return f"<b>{self._inline(groups['strong_text'])}</b>"
+        return f"<i>{self._inline(groups['em_text'] or groups['underscore_text'])}</i>"
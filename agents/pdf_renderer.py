@@ -0,0 +1,159 @@
+"""
+PDF 渲染服務
+ReportLab 的 doc.build 是純 Python 運算，在執行緒中執行時會持有 GIL，多份報告同時生成只能排隊使用一個 CPU。
+改由程序池渲染：每個 worker 程序啟動時註冊一次中文字體並建立段落樣式，之後只接收報告內容，
+返回 PDF 位元組或寫入的檔案路徑，吞吐量可隨 CPU 核心數增加
+
+worker 以 spawn 方式啟動（不繼承父程序的執行緒與連線池），整個程序共用一個服務
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from config import Config
+
+# 可渲染的報告：Markdown 文字、AnalysisReport 或其 dict 形式
+Report = Union[str, Any, Dict[str, Any]]
+
+# worker 程序內的報告生成器（已註冊字體與建立樣式）
+_worker_agent = None
+
+
+def _init_worker():
+    """worker 程序啟動時執行：註冊中文字體並建立段落樣式"""
+    global _worker_agent
+    from agents.report_agent import ReportGeneratorAgent
+
+    _worker_agent = ReportGeneratorAgent(renderer=False)
+
+
+def _ready() -> int:
+    """預熱用的空任務，返回 worker 的程序 ID"""
+    return os.getpid()
+
+
+def _to_markdown(report: Report, query: str) -> str:
+    """結構化報告轉為 Markdown（與 Analyst Agent 輸出的格式相同）"""
+    if isinstance(report, str):
+        return report
+
+    from agents.analyst_agent import AnalystAgent
+    from agents.schemas import AnalysisReport
+
+    if not isinstance(report, AnalysisReport):
+        report = AnalysisReport.model_validate(report)
+    return AnalystAgent._render_markdown(report, query)
+
+
+def _render(report: Report, path: Optional[str], query: str) -> Union[bytes, Path]:
+    """在 worker 程序中渲染 PDF（未指定路徑時返回位元組）"""
+    if _worker_agent is None:
+        _init_worker()
+
+    markdown_content = _to_markdown(report, query)
+    if path is None:
+        buffer = io.BytesIO()
+        _worker_agent.render_pdf(markdown_content, buffer)
+        return buffer.getvalue()
+
+    _worker_agent.render_pdf(markdown_content, path)
+    return Path(path)
+
+
+class PDFRenderService:
+    """以程序池渲染 PDF 的服務"""
+
+    def __init__(self, processes: Optional[int] = None, timeout: Optional[float] = None):
+        """
+        Args:
+            processes: worker 程序數，預設為 Config.PDF_RENDER_PROCESSES
+            timeout: 單份報告的渲染逾時秒數，預設為 Config.PDF_RENDER_TIMEOUT
+        """
+        self.processes = processes or Config.PDF_RENDER_PROCESSES
+        self.timeout = timeout or Config.PDF_RENDER_TIMEOUT
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker
+                )
+            return self._pool
+
+    def warm(self) -> List[Future]:
+        """預先啟動所有 worker（程序啟動與字體註冊不計入第一份報告的時間），不等待完成"""
+        pool = self._get_pool()
+        return [pool.submit(_ready) for _ in range(self.processes)]
+
+    def submit(self, report: Report, path: Optional[Union[str, Path]] = None, query: str = "") -> Future:
+        """
+        提交渲染工作
+
+        Args:
+            report: Markdown 報告，或結構化的 AnalysisReport（dict 亦可）
+            path: 輸出的 PDF 路徑；未指定時結果為 PDF 位元組
+            query: 結構化報告的搜尋主題（輸出在報告中）
+
+        Returns:
+            Future: 結果為 PDF 位元組或檔案路徑
+        """
+        return self._get_pool().submit(_render, report, str(path) if path is not None else None, query)
+
+    def render(
+        self,
+        report: Report,
+        path: Optional[Union[str, Path]] = None,
+        query: str = ""
+    ) -> Union[bytes, Path]:
+        """
+        渲染 PDF 並等待結果（參數同 submit）；程序池損壞時重建一次後重試
+
+        Returns:
+            Union[bytes, Path]: 未指定路徑時為 PDF 位元組，否則為檔案路徑
+        """
+        try:
+            return self.submit(report, path, query).result(self.timeout)
+        except BrokenProcessPool:
+            print("⚠️ PDF 渲染程序池已損壞，重新建立後重試")
+            self.shutdown()
+            return self.submit(report, path, query).result(self.timeout)
+
+    def shutdown(self, wait: bool = True):
+        """關閉程序池（之後的渲染會重新建立）"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_lock = threading.Lock()
+_service: Optional[PDFRenderService] = None
+
+
+def get_pdf_renderer() -> Optional[PDFRenderService]:
+    """整個程序共用的 PDF 渲染服務；Config.PDF_RENDER_PROCESSES 為 0 時返回 None（在呼叫端執行緒中渲染）"""
+    global _service
+    if Config.PDF_RENDER_PROCESSES <= 0:
+        return None
+    with _lock:
+        if _service is None:
+            _service = PDFRenderService()
+        return _service
+
+
+def close_pdf_renderer():
+    """關閉共用的 PDF 渲染服務（應用程式關閉時呼叫）"""
+    global _service
+    with _lock:
+        service, _service = _service, None
+    if service is not None:
+        service.shutdown()
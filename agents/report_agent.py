@@ -4,19 +4,22 @@ Report Generator Agent
 """
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, List, Dict
-import markdown
+from typing import Any, BinaryIO, Iterable, Optional, List, Dict, Union
 from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, StyleSheet1
+from reportlab.platypus import SimpleDocTemplate
 from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
+from openpyxl.utils import get_column_letter
 from config import Config
-import re
+from agents.fonts import register_cjk_font
+from agents.markdown_flowables import MarkdownFlowables
+from agents.pdf_renderer import PDFRenderService, get_pdf_renderer
+from functools import lru_cache
 from html.parser import HTMLParser
-import pandas as pd
 
 
 class HTMLToTextParser(HTMLParser):
@@ -32,101 +35,110 @@ class HTMLToTextParser(HTMLParser):
         return ''.join(self.text)
 
 
+@lru_cache(maxsize=None)
+def _build_styles(font_name: str) -> StyleSheet1:
+    """建立 PDF 段落樣式（依字體快取）"""
+    styles = getSampleStyleSheet()
+    
+    # 標題樣式
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor='#1a5490',
+        spaceAfter=20,
+        alignment=TA_CENTER,
+        fontName=font_name
+    ))
+    
+    # 副標題樣式
+    styles.add(ParagraphStyle(
+        name='CustomHeading2',
+        parent=styles['Heading2'],
+        fontSize=18,
+        textColor='#2c5aa0',
+        spaceAfter=12,
+        spaceBefore=12,
+        fontName=font_name
+    ))
+    
+    # 三級標題樣式
+    styles.add(ParagraphStyle(
+        name='CustomHeading3',
+        parent=styles['Heading3'],
+        fontSize=14,
+        textColor='#3d6bb3',
+        spaceAfter=8,
+        spaceBefore=8,
+        fontName=font_name
+    ))
+    
+    # 正文樣式
+    styles.add(ParagraphStyle(
+        name='CustomBody',
+        parent=styles['BodyText'],
+        fontSize=11,
+        leading=16,
+        alignment=TA_JUSTIFY,
+        fontName=font_name
+    ))
+    return styles
+
+
+# Excel 欄位（依輸出順序）與欄寬
+EXCEL_COLUMNS = [
+    ('新聞標題（中文）', 50),
+    ('來源國家', 15),
+    ('來源網站連結', 60),
+    ('發布日期', 15),
+    ('摘要', 80),
+    ('重點分析', 80),
+]
+
+
+def _excel_styles() -> List[NamedStyle]:
+    """Excel 具名樣式（每個活頁簿加入一次，之後每個儲存格只以名稱套用）"""
+    body_alignment = Alignment(horizontal='left', vertical='top', wrap_text=True)
+    return [
+        NamedStyle(
+            name='excel_header',
+            font=Font(bold=True, size=12),
+            fill=PatternFill(start_color='CCE5FF', end_color='CCE5FF', fill_type='solid'),
+            alignment=Alignment(horizontal='center', vertical='center', wrap_text=True)
+        ),
+        NamedStyle(name='excel_body', alignment=body_alignment),
+        NamedStyle(name='excel_link', font=Font(color='0000FF', underline='single'), alignment=body_alignment),
+    ]
+
+
+def _excel_cell(worksheet, value: Any, style: str) -> WriteOnlyCell:
+    """建立套用具名樣式的儲存格（移除 Excel 不允許的控制字元）"""
+    if isinstance(value, str):
+        value = ILLEGAL_CHARACTERS_RE.sub('', value)
+    cell = WriteOnlyCell(worksheet, value=value)
+    cell.style = style
+    return cell
+
+
 class ReportGeneratorAgent:
     """報告生成代理 - 將 Markdown 轉換為專業 PDF"""
     
-    def __init__(self):
-        """初始化 Report Generator Agent"""
+    def __init__(self, renderer: Union[PDFRenderService, bool, None] = None):
+        """
+        初始化 Report Generator Agent
+        
+        Args:
+            renderer: PDF 渲染服務；預設（None）使用程序共用的程序池（Config.PDF_RENDER_PROCESSES 為 0 時在目前執行緒渲染），
+                False 表示一律在目前執行緒渲染
+        """
         self.reports_dir = Config.REPORTS_DIR
+        self.renderer = renderer
         self.setup_styles()
         
     def setup_styles(self):
-        """設置 PDF 樣式"""
-        self.styles = getSampleStyleSheet()
-        
-        # 嘗試註冊中文字體（支援 Windows 和 macOS）
-        try:
-            # Windows 和 macOS 常見中文字體路徑
-            font_paths = [
-                # Windows 系統
-                'C:\\Windows\\Fonts\\msjh.ttc',           # 微軟正黑體
-                'C:\\Windows\\Fonts\\msyh.ttc',           # 微軟雅黑
-                'C:\\Windows\\Fonts\\kaiu.ttf',           # 標楷體
-                'C:\\Windows\\Fonts\\mingliu.ttc',        # 細明體
-                # macOS 系統
-                '/System/Library/Fonts/PingFang.ttc',     # 蘋方（macOS 預設）
-                '/System/Library/Fonts/STHeiti Light.ttc', # 華文黑體
-                '/System/Library/Fonts/STHeiti Medium.ttc',
-                '/Library/Fonts/Songti.ttc',              # 宋體
-                '/System/Library/Fonts/Hiragino Sans GB.ttc', # 冬青黑體
-                # Linux 系統（額外支援）
-                '/usr/share/fonts/truetype/arphic/uming.ttc',
-                '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
-            ]
-            
-            font_registered = False
-            for font_path in font_paths:
-                if Path(font_path).exists():
-                    try:
-                        # 註冊字體
-                        pdfmetrics.registerFont(TTFont('ChineseFont', font_path))
-                        self.chinese_font = 'ChineseFont'
-                        font_registered = True
-                        print(f"✅ 已註冊中文字體: {font_path}")
-                        break
-                    except Exception as font_error:
-                        # 某些字體文件可能無法載入，繼續嘗試下一個
-                        continue
-            
-            if not font_registered:
-                print("⚠️  未找到中文字體，使用預設字體（可能無法正確顯示中文）")
-                self.chinese_font = 'Helvetica'
-        except Exception as e:
-            print(f"⚠️  字體註冊失敗，使用預設字體: {str(e)}")
-            self.chinese_font = 'Helvetica'
-        
-        # 標題樣式
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            textColor='#1a5490',
-            spaceAfter=20,
-            alignment=TA_CENTER,
-            fontName=self.chinese_font if hasattr(self, 'chinese_font') else 'Helvetica-Bold'
-        ))
-        
-        # 副標題樣式
-        self.styles.add(ParagraphStyle(
-            name='CustomHeading2',
-            parent=self.styles['Heading2'],
-            fontSize=18,
-            textColor='#2c5aa0',
-            spaceAfter=12,
-            spaceBefore=12,
-            fontName=self.chinese_font if hasattr(self, 'chinese_font') else 'Helvetica-Bold'
-        ))
-        
-        # 三級標題樣式
-        self.styles.add(ParagraphStyle(
-            name='CustomHeading3',
-            parent=self.styles['Heading3'],
-            fontSize=14,
-            textColor='#3d6bb3',
-            spaceAfter=8,
-            spaceBefore=8,
-            fontName=self.chinese_font if hasattr(self, 'chinese_font') else 'Helvetica-Bold'
-        ))
-        
-        # 正文樣式
-        self.styles.add(ParagraphStyle(
-            name='CustomBody',
-            parent=self.styles['BodyText'],
-            fontSize=11,
-            leading=16,
-            alignment=TA_JUSTIFY,
-            fontName=self.chinese_font if hasattr(self, 'chinese_font') else 'Helvetica'
-        ))
+        """設置 PDF 樣式（中文字體與段落樣式每個程序只建立一次，所有實例共用）"""
+        self.chinese_font = register_cjk_font()
+        self.styles = _build_styles(self.chinese_font)
     
     def generate_pdf(
         self, 
@@ -157,21 +169,12 @@ class ReportGeneratorAgent:
         pdf_path = self.reports_dir / filename
         
         try:
-            # 創建 PDF 文檔
-            doc = SimpleDocTemplate(
-                str(pdf_path),
-                pagesize=A4,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=18
-            )
-            
-            # 解析 Markdown 並生成內容
-            story = self._parse_markdown_to_story(markdown_content)
-            
-            # 生成 PDF
-            doc.build(story)
+            renderer = get_pdf_renderer() if self.renderer is None else self.renderer
+            if renderer:
+                # 由程序池渲染，不佔用本程序的 GIL
+                renderer.render(markdown_content, pdf_path)
+            else:
+                self.render_pdf(markdown_content, pdf_path)
             
             print(f"✅ PDF 生成成功: {pdf_path}")
             return pdf_path
@@ -180,91 +183,47 @@ class ReportGeneratorAgent:
             print(f"❌ PDF 生成失敗: {str(e)}")
             raise
     
-    def _parse_markdown_to_story(self, markdown_content: str):
-        """將 Markdown 內容轉換為 ReportLab Story"""
-        story = []
-        lines = markdown_content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            
-            if not line:
-                story.append(Spacer(1, 0.2*inch))
-                continue
-            
-            # H1 標題
-            if line.startswith('# '):
-                text = line[2:].strip()
-                story.append(Paragraph(text, self.styles['CustomTitle']))
-                story.append(Spacer(1, 0.3*inch))
-            
-            # H2 標題
-            elif line.startswith('## '):
-                text = line[3:].strip()
-                story.append(Paragraph(text, self.styles['CustomHeading2']))
-                story.append(Spacer(1, 0.2*inch))
-            
-            # H3 標題
-            elif line.startswith('### '):
-                text = line[4:].strip()
-                story.append(Paragraph(text, self.styles['CustomHeading3']))
-                story.append(Spacer(1, 0.1*inch))
-            
-            # 列表項
-            elif line.startswith('- ') or line.startswith('* '):
-                text = '• ' + line[2:].strip()
-                # 清理 Markdown 格式（包含粗體、斜體和連結）
-                text = self._clean_markdown(text)
-                story.append(Paragraph(text, self.styles['CustomBody']))
-            
-            # 分隔線
-            elif line.startswith('---') or line.startswith('***'):
-                story.append(Spacer(1, 0.2*inch))
-                story.append(Paragraph('_' * 80, self.styles['CustomBody']))
-                story.append(Spacer(1, 0.2*inch))
-            
-            # 普通段落
-            else:
-                # 清理 Markdown 格式
-                text = self._clean_markdown(line)
-                if text:
-                    story.append(Paragraph(text, self.styles['CustomBody']))
-                    story.append(Spacer(1, 0.1*inch))
-        
-        return story
-    
-    def _clean_markdown(self, text: str) -> str:
-        """清理 Markdown 格式標記"""
-        # 先處理粗體標記（兩個星號或底線）
-        text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)
-        text = re.sub(r'__(.*?)__', r'<b>\1</b>', text)
+    def render_pdf(self, markdown_content: str, output: Union[str, Path, BinaryIO]):
+        """
+        在目前的程序中將 Markdown 渲染為 PDF
         
-        # 再處理斜體標記（單個星號或底線，但不能是已經處理過的粗體）
-        # 使用負向先行斷言避免匹配 <b> 標籤內的內容
-        text = re.sub(r'(?<!\*)\*(?!\*)([^*]+?)(?<!\*)\*(?!\*)', r'<i>\1</i>', text)
-        text = re.sub(r'(?<!_)_(?!_)([^_]+?)(?<!_)_(?!_)', r'<i>\1</i>', text)
+        Args:
+            markdown_content: Markdown 格式的報告內容
+            output: 輸出的檔案路徑或可寫入的二進位檔案物件
+        """
+        # 創建 PDF 文檔
+        doc = SimpleDocTemplate(
+            str(output) if isinstance(output, (str, Path)) else output,
+            pagesize=A4,
+            rightMargin=72,
+            leftMargin=72,
+            topMargin=72,
+            bottomMargin=18
+        )
         
-        # 清理連結
-        text = self._clean_markdown_links(text)
+        # 解析 Markdown 並生成內容
+        story = self._parse_markdown_to_story(markdown_content)
         
-        return text
+        # 生成 PDF
+        doc.build(story)
     
-    def _clean_markdown_links(self, text: str) -> str:
-        """清理 Markdown 連結格式"""
-        # [文字](URL) -> 文字 (URL)
-        text = re.sub(r'\[(.*?)\]\((.*?)\)', r'\1 (<font color="blue">\2</font>)', text)
-        return text
+    def _parse_markdown_to_story(self, markdown_content: str):
+        """將 Markdown 內容轉換為 ReportLab Story"""
+        return MarkdownFlowables(self.styles, self.chinese_font).convert(markdown_content)
     
     def generate_excel(
         self, 
-        news_data: List[Dict[str, str]], 
+        news_data: Iterable[Dict[str, Any]], 
         filename: Optional[str] = None
     ) -> Path:
         """
         生成 Excel 報告
         
+        以 openpyxl 的 write_only 模式逐列寫入並同時套用具名樣式，不建立 DataFrame、寫入後也不再走訪儲存格，
+        記憶體用量不隨列數增加（可直接傳入產生器匯出大量歷史新聞）
+        
         Args:
-            news_data: 結構化的新聞數據列表
+            news_data: 結構化的新聞數據（列表或產生器）
             filename: 可選的文件名，不提供則自動生成
             
         Returns:
@@ -284,63 +243,38 @@ class ReportGeneratorAgent:
         excel_path = self.reports_dir / filename
         
         try:
-            # 創建 DataFrame
-            df = pd.DataFrame(news_data)
+            workbook = Workbook(write_only=True)
+            for style in _excel_styles():
+                workbook.add_named_style(style)
+            worksheet = workbook.create_sheet('新聞報告')
+            
+            # write_only 模式的欄寬必須在寫入資料列之前設定
+            for index, (_, width) in enumerate(EXCEL_COLUMNS, 1):
+                worksheet.column_dimensions[get_column_letter(index)].width = width
+            
+            worksheet.append([_excel_cell(worksheet, name, 'excel_header') for name, _ in EXCEL_COLUMNS])
             
-            # 調整列順序，加入「摘要」和「重點分析」，移除「關鍵字」和「來源」
-            columns_order = ['新聞標題（中文）', '來源國家', '來源網站連結', '發布日期', '摘要', '重點分析']
-            existing_columns = [col for col in columns_order if col in df.columns]
-            df = df[existing_columns]
+            # 每個欄位的樣式名稱（連結欄為藍色底線）
+            cell_styles = [
+                'excel_link' if name == '來源網站連結' else 'excel_body' for name, _ in EXCEL_COLUMNS
+            ]
+            # 一律輸出所有欄位，資料中缺少的欄位寫入空白儲存格
+            count = 0
+            for row in news_data:
+                worksheet.append([
+                    _excel_cell(worksheet, row.get(name), style)
+                    for (name, _), style in zip(EXCEL_COLUMNS, cell_styles)
+                ])
+                count += 1
             
-            # 使用 openpyxl 引擎寫入 Excel
-            with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='新聞報告')
-                
-                # 獲取工作表並調整列寬
-                worksheet = writer.sheets['新聞報告']
-                
-                # 設置列寬（調整後的順序）
-                column_widths = {
-                    'A': 50,  # 新聞標題（中文）
-                    'B': 15,  # 來源國家
-                    'C': 60,  # 來源網站連結
-                    'D': 15,  # 發布日期
-                    'E': 80,  # 摘要
-                    'F': 80,  # 重點分析
-                }
-                
-                for col, width in column_widths.items():
-                    worksheet.column_dimensions[col].width = width
-                
-                # 設置標題列樣式（粗體、置中）
-                from openpyxl.styles import Font, Alignment, PatternFill
-                
-                header_font = Font(bold=True, size=12)
-                header_fill = PatternFill(start_color='CCE5FF', end_color='CCE5FF', fill_type='solid')
-                center_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                left_alignment = Alignment(horizontal='left', vertical='top', wrap_text=True)
-                
-                for cell in worksheet[1]:
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = center_alignment
-                
-                # 設置資料列樣式
-                for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row):
-                    for idx, cell in enumerate(row):
-                        cell.alignment = left_alignment
-                        # 如果是連結列（C列），設置為藍色字體
-                        if idx == 2:  # 來源網站連結
-                            cell.font = Font(color='0000FF', underline='single')
+            workbook.save(excel_path)
             
-            print(f"✅ Excel 生成成功: {excel_path}")
+            print(f"✅ Excel 生成成功: {excel_path}（{count} 則新聞）")
             return excel_path
             
         except Exception as e:
             print(f"❌ Excel 生成失敗: {str(e)}")
             raise
-    
-
 
 
 if __name__ == "__main__":
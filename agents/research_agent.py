@@ -2,11 +2,112 @@
 Research Agent
 負責使用 OpenAI Responses API 進行深度網路搜尋
 """
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from config import Config
+from agents.backends import LiveBackend, cassette_key, model_backend
+from agents.clients import get_async_openai_client, get_openai_client, run_async
+from utils.cache import PersistentTTLCache
+from utils.corpus import ArticleCorpus
+from utils.dedupe import dedupe_news_items
+from utils.helpers import normalize_text
+from utils.instructions import parse_count_range, parse_target_count, parse_time_window
+from utils.news_items import (
+    IncrementalNewsParser, extract_news_items, extract_object_field, merge_news_items, render_news_content
+)
+from utils.prompt_parser import PromptParser
+from utils.ranking import rank_news_items
+from utils.throttle import RateLimitedLog
+from utils.urls import DomainIndex, canonicalize_url
+import asyncio
+import inspect
 import json
-from typing import Dict, Any
-from datetime import datetime
+import math
+from typing import Dict, Any, Callable, Iterable, List, Optional, Set, Tuple, Union
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+# 搜尋事件回呼：(事件名稱, 事件內容)
+SearchEventCallback = Callable[[str, Dict[str, Any]], None]
+
+
+class _StreamState:
+    """單一 Responses API 串流的接收狀態"""
+    
+    def __init__(
+        self,
+        target: Optional[int] = None,
+        allowed_domains: Iterable[str] = (),
+        since: Optional[date] = None
+    ):
+        """
+        Args:
+            target: 目標新聞數量，達成後即可提前結束串流；None 表示不提前結束
+            allowed_domains: 有效新聞的來源網域
+            since: 有效新聞的最早發布日期
+        """
+        # 串流文字以片段清單累積（避免字串反覆串接的二次方成本），需要完整文字時才合併
+        self._chunks: List[str] = []
+        self.length = 0
+        # 目前內容片段（content part）已由 delta 收到的字元數，用於判斷 content_part.done 的文字是否已收過
+        self.part_length = 0
+        self.sources: List[Dict[str, Any]] = []
+        self._source_urls: Set[str] = set()
+        self.web_search_count = 0
+        self.text_chunks = 0
+        self.parser = IncrementalNewsParser()
+        self.target = target
+        self.domains = DomainIndex(allowed_domains)
+        self.since = since
+        self.valid_items: List[Dict[str, Any]] = []
+        self.stopped_early = False
+        # 合併搜尋：模型在 results 之前輸出的需求解析結果
+        self.expects_parsed = False
+        self.user_prompt = ""
+        self.explicit: Dict[str, str] = {}
+        self.parsed: Optional[Dict[str, str]] = None
+        # 逐事件的進度訊息限流輸出
+        self.log = RateLimitedLog(Config.SEARCH_LOG_INTERVAL)
+    
+    @property
+    def content(self) -> str:
+        """目前收到的完整文字"""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+    
+    def append(self, text: str):
+        """累積一段串流文字"""
+        self._chunks.append(text)
+        self.length += len(text)
+    
+    def add_source(self, title: str, url: str, index: Optional[int] = None) -> bool:
+        """記錄一個引用來源（同一網址只記錄一次），返回是否為新的來源"""
+        if not url or url in self._source_urls:
+            return False
+        self._source_urls.add(url)
+        self.sources.append({"title": title, "url": url, "index": index})
+        return True
+    
+    @property
+    def items(self) -> List[Dict[str, Any]]:
+        """串流中已解析完成的新聞項目"""
+        return self.parser.items
+    
+    @property
+    def target_reached(self) -> bool:
+        return self.target is not None and len(self.valid_items) >= self.target
+    
+    def accept(self, item: Dict[str, Any]) -> bool:
+        """新聞是否來自允許的網域且發布日期在時間範圍內"""
+        if len(self.domains) and item.get("url", "") not in self.domains:
+            return False
+        if self.since is None:
+            return True
+        try:
+            published = datetime.strptime(str(item.get("date", ""))[:10], "%Y-%m-%d").date()
+        except ValueError:
+            return False
+        return self.since <= published <= date.today() + timedelta(days=1)
 
 
 class ResearchAgent:
@@ -34,56 +135,711 @@ class ResearchAgent:
         {"name": "Heaptalk", "domain": "heaptalk.com", "region": "Southeast Asia"},
     ]
     
-    def __init__(self):
-        """初始化 Research Agent"""
-        # 初始化 OpenAI 客戶端
-        self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+    # 可信來源的反向網域索引（網域 → 來源資料），供搜尋後的來源驗證使用
+    TRUSTED_DOMAINS = DomainIndex({src["domain"]: src for src in TRUSTED_NEWS_SOURCES})
+    
+    # 語言與國家映射
+    LANGUAGE_CONFIG = {
+        "English": {"keywords": "in English", "countries": ["Singapore", "Malaysia", "Thailand", "Vietnam", "Philippines"]},
+        "Chinese": {"keywords": "中文 華語 Chinese", "countries": ["Singapore", "Malaysia"]},
+        "Vietnamese": {"keywords": "tiếng Việt Vietnamese", "countries": ["Vietnam"]},
+        "Thai": {"keywords": "ภาษาไทย Thai", "countries": ["Thailand"]},
+        "Malay": {"keywords": "Bahasa Melayu Malay", "countries": ["Malaysia"]},
+        "Indonesian": {"keywords": "Bahasa Indonesia Indonesian", "countries": ["Indonesia"]}
+    }
+    
+    def __init__(
+        self,
+        cache: Union[PersistentTTLCache, bool, None] = None,
+        backend: Optional[LiveBackend] = None,
+        corpus: Union[ArticleCorpus, bool, None] = None
+    ):
+        """
+        初始化 Research Agent
+        
+        Args:
+            cache: 搜尋結果快取；預設（None）依 Config.SEARCH_CACHE_* 建立，False 表示此實例不使用快取
+            backend: 模型後端（live / record / replay），預設為全域的 model_backend
+            corpus: 本地新聞語料庫；預設（None）依 Config.CORPUS_* 建立，False 表示此實例不使用語料庫
+        """
+        # 共用的 OpenAI 客戶端在第一次使用時才取得，重播模式下不需要 API Key
+        self._client: Optional[OpenAI] = None
         self.model = Config.OPENAI_MODEL
+        self.backend = backend or model_backend
+        
+        if cache is None and Config.SEARCH_CACHE_ENABLED:
+            cache = PersistentTTLCache(
+                Config.CACHE_DB_PATH,
+                namespace="search",
+                ttl_seconds=Config.SEARCH_CACHE_TTL,
+                max_entries=Config.SEARCH_CACHE_MAX_ENTRIES
+            )
+        self.cache = None if cache is False else cache
+        
+        if corpus is None and Config.CORPUS_ENABLED:
+            corpus = ArticleCorpus(Config.CORPUS_DB_PATH, freshness_seconds=Config.CORPUS_FRESHNESS)
+        self.corpus = None if corpus is False else corpus
+    
+    @property
+    def client(self) -> OpenAI:
+        """OpenAI 客戶端（預設為程序共用的連線池）"""
+        if self._client is None:
+            self._client = get_openai_client()
+        return self._client
+    
+    @client.setter
+    def client(self, client: OpenAI):
+        self._client = client
+    
+    def search(
+        self,
+        query: str,
+        time_instruction: str = "最近 7 天內",
+        num_instruction: str = "5-10篇",
+        language: str = "English",
+        on_event: Optional[SearchEventCallback] = None,
+        fan_out: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """
+        執行搜尋（先查詢快取與本地語料庫，都無法回答時才呼叫 Responses API）
+        
+        Args:
+            query: 用戶的搜尋查詢
+            time_instruction: 時間範圍指令 (例如: "最近一個月內")
+            num_instruction: 新聞數量指令 (例如: "約15篇")
+            language: 新聞來源語言 (例如: "English", "Chinese", "Vietnamese", "Thai", "Malay", "Indonesian")
+            on_event: 可選的事件回呼，接收搜尋事件
+            fan_out: 是否依來源群組拆分為多個並行搜尋，預設使用 Config.SEARCH_FANOUT
+            
+        Returns:
+            Dict: 包含搜尋結果、來源和已解析新聞項目（"items"）的字典；
+                命中快取時 "cached" 為 True，由語料庫回答時 "corpus" 為 True
+        """
+        cache_key = self._cache_key(query, time_instruction, num_instruction, language)
+        
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(f"⚡ 搜尋快取命中: {query} ({time_instruction}, {num_instruction}, 語言: {language})")
+                self._emit(on_event, "search_cache_hit", query=query)
+                cached["cached"] = True
+                return cached
+        
+        result = self._search_corpus(query, time_instruction, num_instruction, language, on_event)
+        if result is not None:
+            return result
+        
+        if fan_out is None:
+            fan_out = Config.SEARCH_FANOUT
+        
+        if fan_out:
+            result = self._search_fanout(query, time_instruction, num_instruction, language, on_event)
+        else:
+            result = self._search_uncached(query, time_instruction, num_instruction, language, on_event)
+        
+        if result.get("status") == "success":
+            if self.cache is not None:
+                self.cache.set(cache_key, result)
+            self._store_corpus(query, time_instruction, language, result.get("items") or [])
+        
+        return result
+    
+    def search_combined(
+        self,
+        user_prompt: str,
+        explicit: Optional[Dict[str, str]] = None,
+        on_event: Optional[SearchEventCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        需求解析與搜尋合併為一次 Responses API 呼叫
+        
+        模型直接收到使用者的原始需求，先輸出解析出的搜尋參數（"parsed"），再輸出搜尋結果，
+        省去獨立解析需求的一次模型往返
+        
+        Args:
+            user_prompt: 使用者輸入的搜尋需求
+            explicit: 請求中明確指定的欄位（time_instruction / num_instruction / language），模型需直接採用
+            on_event: 可選的事件回呼；解析結果出現時發送 request_parsed
+            
+        Returns:
+            Dict: 同 search()，另含 "parsed"（最終採用的 keywords / time_instruction / num_instruction / language）
+        """
+        explicit = {field: value for field, value in (explicit or {}).items() if value}
+        combined_key = PersistentTTLCache.make_key(
+            "combined", normalize_text(user_prompt),
+            sorted((field, normalize_text(value)) for field, value in explicit.items())
+        )
+        
+        if self.cache is not None:
+            cached = self.cache.get(combined_key)
+            if cached is not None:
+                print(f"⚡ 搜尋快取命中: {user_prompt}")
+                self._emit(on_event, "search_cache_hit", query=user_prompt)
+                self._emit(on_event, "request_parsed", **cached["parsed"])
+                cached["cached"] = True
+                return cached
+        
+        result = self._search_combined_uncached(user_prompt, explicit, on_event)
+        
+        if self.cache is not None and result.get("status") == "success":
+            # 同時以解析後的搜尋參數存一份，之後相同參數的一般搜尋也能命中
+            parsed = result["parsed"]
+            self.cache.set(combined_key, result)
+            self.cache.set(
+                self._cache_key(parsed["keywords"], parsed["time_instruction"], parsed["num_instruction"],
+                                parsed["language"]),
+                result
+            )
+        
+        if result.get("status") == "success":
+            parsed = result["parsed"]
+            self._store_corpus(parsed["keywords"], parsed["time_instruction"], parsed["language"],
+                               result.get("items") or [])
+        
+        return result
+    
+    def refine(
+        self,
+        search_results: Dict[str, Any],
+        parsed_prompt: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        搜尋與分析之間的後處理，在新聞進入分析階段（耗用模型 token）之前：
+        
+        1. 來源驗證：正規化網址（去除追蹤參數），依可信來源的網域索引附上來源名稱與地區，
+           不在可信來源內的新聞依 Config.DOMAIN_POLICY 移除或標記
+        2. 合併近似重複的新聞（同一則通訊社新聞由多個來源刊出時只保留一則，並在 "sources" 中保留所有來源）
+        3. 排序：依新近程度、關鍵字重疊、語言與來源多樣性評分，只保留數量上限與 token 預算內的新聞
+        
+        Args:
+            search_results: search() 或 search_combined() 的結果
+            parsed_prompt: 搜尋條件（keywords、time_instruction、num_instruction、language），
+                預設使用合併搜尋解析出的 "parsed"
+            
+        Returns:
+            Dict: 處理後的搜尋結果（不修改傳入的字典）；有移除非可信來源時 "untrusted_dropped" 為移除的數量，
+                有合併時 "duplicates_merged" 為合併的數量，排序後有捨棄時 "ranked_out" 為捨棄的數量
+        """
+        if search_results.get("status") != "success":
+            return search_results
+        
+        items = search_results.get("items") or extract_news_items(search_results.get("content", ""))
+        if not items:
+            return search_results
+        
+        refined = dict(search_results)
+        verified, dropped = self._verify_sources(items)
+        if dropped:
+            print(f"🚫 移除非可信來源的新聞: {dropped} 則")
+            refined["untrusted_dropped"] = dropped
+        
+        deduped = verified
+        if Config.DEDUPE_ENABLED and len(verified) >= 2:
+            deduped = dedupe_news_items(verified, threshold=Config.DEDUPE_THRESHOLD)
+            if len(deduped) < len(verified):
+                print(f"🧹 合併近似重複的新聞: {len(verified)} → {len(deduped)} 則")
+                refined["duplicates_merged"] = len(verified) - len(deduped)
+        
+        ranked = deduped
+        if Config.RANK_ENABLED and deduped:
+            ranked = self._rank(deduped, parsed_prompt or search_results.get("parsed") or {},
+                                search_results.get("query", ""))
+            if len(ranked) < len(deduped):
+                print(f"📊 依相關度與 token 預算保留新聞: {len(deduped)} → {len(ranked)} 則")
+                refined["ranked_out"] = len(deduped) - len(ranked)
+        
+        if ranked == items:
+            return search_results
+        
+        refined["content"] = render_news_content(search_results.get("query", ""), ranked)
+        refined["items"] = ranked
+        return refined
+    
+    @staticmethod
+    def _rank(items: List[Dict[str, Any]], criteria: Dict[str, str], query: str) -> List[Dict[str, Any]]:
+        """依搜尋條件排序新聞，保留數量上限（數量指令的上限與 RANK_MAX_ITEMS 取小）與 token 預算內的新聞"""
+        count_range = parse_count_range(criteria.get("num_instruction", ""))
+        limits = [count for count in (count_range[1] if count_range else None, Config.RANK_MAX_ITEMS) if count]
+        return rank_news_items(
+            items,
+            query=criteria.get("keywords") or query,
+            window_days=parse_time_window(criteria.get("time_instruction", "")),
+            language=criteria.get("language"),
+            max_items=min(limits) if limits else None,
+            token_budget=Config.RANK_TOKEN_BUDGET or None,
+        )
+    
+    def _verify_sources(self, items: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        比對可信來源，並附上正規化網址
+        
+        原始網址（"url"）保持搜尋結果返回的內容，報告、Excel 與郵件中的連結不受正規化影響；
+        正規化網址另存於 "canonical_url"，供網域比對、去重與語料庫識別使用
+        
+        Returns:
+            Tuple[List[Dict], int]: (處理後的新聞, 移除的數量)；
+                可信來源的新聞附上 "source"（來源名稱）與 "region"，
+                DOMAIN_POLICY 為 "flag" 時非可信來源的新聞保留並標記 "trusted": False
+        """
+        policy = Config.DOMAIN_POLICY
+        if policy == "off":
+            return items, 0
+        
+        verified = []
+        for item in items:
+            url = canonicalize_url(item.get("url", ""))
+            source = self.TRUSTED_DOMAINS.match_url(url)
+            if source is not None:
+                verified.append({**item, "canonical_url": url, "source": source["name"], "region": source["region"]})
+            elif policy == "flag":
+                verified.append({**item, "canonical_url": url, "trusted": False})
+        return verified, len(items) - len(verified)
+    
+    def _search_corpus(
+        self,
+        query: str,
+        time_instruction: str,
+        num_instruction: str,
+        language: str,
+        on_event: Optional[SearchEventCallback] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        由本地語料庫回答查詢
+        
+        同一主題在新鮮期內已搜尋過、涵蓋的時間範圍包含本次範圍，且範圍內的新聞達到數量下限時，
+        直接返回語料庫中的新聞，不進行網路搜尋
+        
+        Returns:
+            Optional[Dict]: 搜尋結果；無法由語料庫回答時返回 None
+        """
+        window_days = parse_time_window(time_instruction)
+        count_range = parse_count_range(num_instruction)
+        if self.corpus is None or not window_days or not count_range:
+            return None
+        
+        try:
+            items = self.corpus.lookup(query, language, window_days, limit=count_range[1])
+        except Exception as e:
+            print(f"⚠️ 語料庫查詢失敗: {str(e)}")
+            return None
+        
+        if items is None or len(items) < count_range[0]:
+            return None
+        
+        print(f"📚 由本地語料庫回答: {query}（{len(items)} 則，{window_days} 天內）")
+        self._emit(on_event, "search_corpus_hit", query=query, items=len(items))
+        return {
+            "status": "success",
+            "query": query,
+            "content": render_news_content(query, items),
+            "sources": [{"title": item.get("title", ""), "url": item.get("url", ""), "index": None} for item in items],
+            "web_search_count": 0,
+            "items": items,
+            "corpus": True,
+        }
+    
+    def _store_corpus(self, query: str, time_instruction: str, language: str, items: List[Dict[str, Any]]):
+        """將搜尋結果寫入本地語料庫（失敗不影響搜尋）"""
+        if self.corpus is None:
+            return
+        
+        try:
+            self.corpus.add(
+                query, language, parse_time_window(time_instruction),
+                [{**item, "country": item.get("country") or self._source_region(item)} for item in items]
+            )
+        except Exception as e:
+            print(f"⚠️ 語料庫寫入失敗: {str(e)}")
+    
+    @classmethod
+    def _source_region(cls, item: Dict[str, Any]) -> str:
+        """依新聞網址的網域判斷來源地區"""
+        source = cls.TRUSTED_DOMAINS.match_url(item.get("url", ""))
+        return source["region"] if source else ""
+    
+    def _search_combined_uncached(
+        self,
+        user_prompt: str,
+        explicit: Dict[str, str],
+        on_event: Optional[SearchEventCallback] = None
+    ) -> Dict[str, Any]:
+        """執行合併解析與搜尋的 Responses API 串流"""
+        print(f"🔍 Research Agent 開始合併解析與搜尋: {user_prompt}")
+        self._emit(on_event, "search_started", query=user_prompt, combined=True, **explicit)
+        
+        prompt = self._build_combined_prompt(user_prompt, explicit)
+        
+        try:
+            stream = self.backend.stream(
+                cassette_key("responses-combined", self.model, user_prompt, sorted(explicit.items())),
+                lambda: self.client.responses.create(
+                    model=self.model,
+                    input=prompt,
+                    tools=[{"type": "web_search"}],
+                    stream=True
+                )
+            )
+            
+            state = _StreamState()
+            state.expects_parsed = True
+            state.user_prompt = user_prompt
+            state.explicit = explicit
+            for event in stream:
+                self._handle_event(event, state, on_event)
+                if self._should_stop(state, on_event):
+                    stream.close()
+                    break
+            
+            # 模型沒有輸出 results 陣列時，解析結果在串流結束後才取得
+            if state.parsed is None:
+                self._capture_parsed(state, on_event)
+            
+            content, items = self._stream_output(state.parsed["keywords"], state)
+            return self._finish(state.parsed["keywords"], content, state.sources, state.web_search_count, on_event,
+                                items=items, stopped_early=state.stopped_early, parsed=state.parsed, combined=True)
+        
+        except Exception as e:
+            print(f"❌ Research Agent 合併搜尋失敗: {str(e)}")
+            return {
+                "status": "error",
+                "query": user_prompt,
+                "error": str(e)
+            }
+    
+    def _build_combined_prompt(self, user_prompt: str, explicit: Dict[str, str]) -> str:
+        """建立合併需求解析與搜尋的提示詞"""
+        fixed = {
+            "time_instruction": "時間範圍",
+            "num_instruction": "新聞數量",
+            "language": "新聞語言",
+        }
+        fixed_lines = "\n".join(
+            f"- {label}已指定為「{explicit[field]}」，直接採用"
+            for field, label in fixed.items() if field in explicit
+        )
+        
+        language_lines = "\n".join(
+            f"  - {language}：地區 {', '.join(info['countries'])}；關鍵字提示 {info['keywords']}"
+            for language, info in self.LANGUAGE_CONFIG.items()
+        )
+        sources_list = "\n".join(
+            f"  - {src['name']} (site:{src['domain']}) - {src['region']}"
+            for src in self.TRUSTED_NEWS_SOURCES
+        )
+        allowed_domains_str = ", ".join(src["domain"] for src in self.TRUSTED_NEWS_SOURCES)
+        
+        return f"""
+你是東南亞金融研究專家。使用者需求：「{user_prompt}」
+
+【步驟0：解析需求】
+先從使用者需求判斷以下參數，再依此搜尋：
+- keywords：核心的搜尋主題
+- time_instruction：時間範圍（未指定時為「最近7天內」）
+- num_instruction：新聞數量（未指定時為「5-10篇」）
+- language：新聞語言，只能是 English, Chinese, Vietnamese, Thai, Malay, Indonesian（未指定時為 English）
+{fixed_lines}
+
+【核心要求】
+- 地區與關鍵字提示依 language 決定：
+{language_lines}
+- 時間與數量依解析結果
+- 來源：{allowed_domains_str}
+
+【搜尋策略】
+1. 先用目標語言生成 5-8 組多樣化關鍵詞（含同義詞、在地用詞、縮寫），執行多輪搜尋
+2. 對不同域名進行搜尋，確保來源多樣性（至少 3 個不同網站）
+3. 優先回傳目標語言頁面；不足時補充英文來源並標註語言
+4. 每則新聞需包含：標題、摘要（100-300字）、來源、URL、日期（YYYY-MM-DD）
+
+【可信來源】
+{sources_list}
+
+【輸出格式】
+回傳 JSON（用 ```json 包裹），"parsed" 必須放在 "results" 之前：
+```json
+{{
+  "parsed": {{
+    "keywords": "主題",
+    "time_instruction": "時間",
+    "num_instruction": "數量",
+    "language": "English"
+  }},
+  "search_query": "主題",
+  "search_date": "{datetime.now().strftime('%Y-%m-%d')}",
+  "results": [
+    {{
+      "title": "新聞標題（原文）",
+      "summary": "100-300字摘要，包含主要資訊與數據",
+      "source": "來源名稱",
+      "url": "https://...",
+      "date": "YYYY-MM-DD",
+      "language": "English"
+    }}
+  ]
+}}
+```
+
+注意：確保 JSON 語法正確、所有欄位完整、日期在指定範圍內。
+        """
     
-    def search(self, query: str, time_instruction: str = "最近 7 天內", num_instruction: str = "5-10篇", language: str = "English") -> Dict[str, Any]:
+    @staticmethod
+    def _cache_key(query: str, time_instruction: str, num_instruction: str, language: str) -> str:
+        """由正規化後的搜尋參數產生快取鍵值"""
+        return PersistentTTLCache.make_key(
+            normalize_text(query),
+            normalize_text(time_instruction).replace(" ", ""),
+            normalize_text(num_instruction).replace(" ", ""),
+            normalize_text(language)
+        )
+    
+    def _search_uncached(
+        self,
+        query: str,
+        time_instruction: str,
+        num_instruction: str,
+        language: str,
+        on_event: Optional[SearchEventCallback] = None
+    ) -> Dict[str, Any]:
         """
-        執行搜尋
+        透過 Responses API 執行網路搜尋
         
         Args:
             query: 用戶的搜尋查詢
             time_instruction: 時間範圍指令 (例如: "最近一個月內")
             num_instruction: 新聞數量指令 (例如: "約15篇")
             language: 新聞來源語言 (例如: "English", "Chinese", "Vietnamese", "Thai", "Malay", "Indonesian")
+            on_event: 可選的事件回呼，接收串流過程中的搜尋事件
+                （search_started, web_search_started, web_search_completed,
+                citation_found, characters_received, item_parsed, search_target_reached, search_completed）
             
         Returns:
             Dict: 包含搜尋結果和來源的字典
         """
         print(f"🔍 Research Agent 開始搜尋: {query} ({time_instruction}, {num_instruction}, 語言: {language})")
+        self._emit(on_event, "search_started", query=query, time_instruction=time_instruction,
+                   num_instruction=num_instruction, language=language)
         
-        # 建立語言與國家映射
-        language_config = {
-            "English": {"keywords": "in English", "countries": ["Singapore", "Malaysia", "Thailand", "Vietnam", "Philippines"]},
-            "Chinese": {"keywords": "中文 華語 Chinese", "countries": ["Singapore", "Malaysia"]},
-            "Vietnamese": {"keywords": "tiếng Việt Vietnamese", "countries": ["Vietnam"]},
-            "Thai": {"keywords": "ภาษาไทย Thai", "countries": ["Thailand"]},
-            "Malay": {"keywords": "Bahasa Melayu Malay", "countries": ["Malaysia"]},
-            "Indonesian": {"keywords": "Bahasa Indonesia Indonesian", "countries": ["Indonesia"]}
-        }
+        enhanced_query = self._build_prompt(query, time_instruction, num_instruction, language)
+        
+        try:
+            # 使用 OpenAI Responses API 執行網路搜尋（串流模式）
+            print("🌐 正在啟動串流搜尋...")
+            
+            stream = self.backend.stream(
+                cassette_key("responses", self.model, query, time_instruction, num_instruction, language),
+                lambda: self.client.responses.create(
+                    model=self.model,
+                    input=enhanced_query,
+                    tools=[
+                        {
+                            "type": "web_search"
+                        }
+                    ],
+                    stream=True  # 啟用串流模式
+                )
+            )
+
+            # 串流接收事件
+            print("📡 開始接收串流事件...")
+            state = self._new_state(time_instruction, num_instruction, self.TRUSTED_NEWS_SOURCES)
+            for event in stream:
+                self._handle_event(event, state, on_event)
+                # 已取得足夠的有效新聞：關閉連線，不再消耗 token 與網路搜尋
+                if self._should_stop(state, on_event):
+                    stream.close()
+                    break
+
+            content, items = self._stream_output(query, state)
+            return self._finish(query, content, state.sources, state.web_search_count, on_event,
+                                items=items, stopped_early=state.stopped_early)
+
+        except Exception as e:
+            print(f"❌ Research Agent 搜尋失敗: {str(e)}")
+            return {
+                "status": "error",
+                "query": query,
+                "error": str(e)
+            }
+    
+    def _search_fanout(
+        self,
+        query: str,
+        time_instruction: str,
+        num_instruction: str,
+        language: str,
+        on_event: Optional[SearchEventCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        依來源群組拆分為多個並行的 Responses API 搜尋，再合併去重
+        
+        整體延遲約等於最慢的分片
+        """
+        print(f"🔍 Research Agent 開始分片搜尋: {query} ({time_instruction}, {num_instruction}, 語言: {language})")
+        self._emit(on_event, "search_started", query=query, time_instruction=time_instruction,
+                   num_instruction=num_instruction, language=language)
+        
+        shards = self._build_shards()
+        count_range = parse_count_range(num_instruction)
+        limit = count_range[1] if count_range else None
+        shard_num_instruction = (
+            f"最多 {math.ceil(limit / len(shards)) + 1} 篇" if limit else num_instruction
+        )
+        
+        try:
+            outcomes = run_async(self._fan_out(
+                [
+                    (
+                        name,
+                        self._build_prompt(query, time_instruction, shard_num_instruction, language, sources),
+                        self._new_state(time_instruction, shard_num_instruction, sources),
+                        cassette_key("responses", self.model, query, time_instruction, shard_num_instruction,
+                                     language, name)
+                    )
+                    for name, sources in shards
+                ],
+                on_event
+            ))
+            
+            states, groups = [], []
+            for (name, _), outcome in zip(shards, outcomes):
+                if isinstance(outcome, BaseException):
+                    print(f"⚠️ 分片「{name}」搜尋失敗: {str(outcome)}")
+                    continue
+                states.append(outcome[0])
+                groups.append(outcome[1])
+            
+            if not states:
+                raise Exception("所有分片搜尋皆失敗")
+            
+            items = merge_news_items(groups, limit=limit)
+            sources, seen_urls = [], set()
+            for state in states:
+                for source in state.sources:
+                    url = canonicalize_url(source.get("url", ""))
+                    if url not in seen_urls:
+                        seen_urls.add(url)
+                        sources.append(source)
+            
+            print(f"🧩 {len(states)}/{len(shards)} 個分片完成，合併後共 {len(items)} 則新聞")
+            return self._finish(
+                query,
+                render_news_content(query, items),
+                sources,
+                sum(state.web_search_count for state in states),
+                on_event,
+                items=items,
+                stopped_early=any(state.stopped_early for state in states),
+                shards=len(states)
+            )
+        
+        except Exception as e:
+            print(f"❌ Research Agent 分片搜尋失敗: {str(e)}")
+            return {
+                "status": "error",
+                "query": query,
+                "error": str(e)
+            }
+    
+    def _build_shards(self) -> List[Tuple[str, List[Dict[str, str]]]]:
+        """依地區將可信來源分組，每組最多 Config.SEARCH_FANOUT_SHARD_SIZE 個網站"""
+        regions: Dict[str, List[Dict[str, str]]] = {}
+        for source in self.TRUSTED_NEWS_SOURCES:
+            regions.setdefault(source["region"], []).append(source)
+        
+        size = max(1, Config.SEARCH_FANOUT_SHARD_SIZE)
+        shards = []
+        for region, sources in regions.items():
+            chunks = [sources[i:i + size] for i in range(0, len(sources), size)]
+            for index, chunk in enumerate(chunks, 1):
+                name = region if len(chunks) == 1 else f"{region} {index}/{len(chunks)}"
+                shards.append((name, chunk))
+        return shards
+    
+    async def _fan_out(
+        self,
+        shard_prompts: List[Tuple[str, str, _StreamState, str]],
+        on_event: Optional[SearchEventCallback]
+    ) -> List[Any]:
+        """以並行上限 Config.SEARCH_FANOUT_CONCURRENCY 執行所有分片"""
+        semaphore = asyncio.Semaphore(Config.SEARCH_FANOUT_CONCURRENCY)
+        # 重播模式不連網，不需要客戶端
+        client = None if self.backend.name == "replay" else get_async_openai_client()
+        return await asyncio.gather(
+            *[
+                self._search_shard(client, semaphore, name, prompt, state, key, on_event)
+                for name, prompt, state, key in shard_prompts
+            ],
+            return_exceptions=True
+        )
+    
+    async def _search_shard(
+        self,
+        client: Optional[AsyncOpenAI],
+        semaphore: asyncio.Semaphore,
+        name: str,
+        prompt: str,
+        state: _StreamState,
+        key: str,
+        on_event: Optional[SearchEventCallback]
+    ) -> Tuple[_StreamState, List[Dict[str, Any]]]:
+        """執行單一分片的串流搜尋"""
+        async with semaphore:
+            print(f"🧩 分片「{name}」開始搜尋...")
+            stream = await self.backend.astream(key, lambda: client.responses.create(
+                model=self.model,
+                input=prompt,
+                tools=[{"type": "web_search"}],
+                stream=True
+            ))
+            
+            async for event in stream:
+                self._handle_event(event, state, on_event)
+                if self._should_stop(state, on_event):
+                    closing = stream.close()
+                    if inspect.isawaitable(closing):
+                        await closing
+                    break
+            
+            _, items = self._stream_output(name, state)
+            print(f"🧩 分片「{name}」完成，取得 {len(items)} 則新聞")
+            self._emit(on_event, "shard_completed", shard=name, items=len(items))
+            return state, items
+    
+    def _build_prompt(
+        self,
+        query: str,
+        time_instruction: str,
+        num_instruction: str,
+        language: str,
+        sources: Optional[List[Dict[str, str]]] = None
+    ) -> str:
+        """
+        建立搜尋提示詞
+        
+        Args:
+            sources: 限定的新聞來源，預設為全部 TRUSTED_NEWS_SOURCES
+        """
+        sources = sources or self.TRUSTED_NEWS_SOURCES
         
-        lang_info = language_config.get(language, language_config["English"])
+        lang_info = self.LANGUAGE_CONFIG.get(language, self.LANGUAGE_CONFIG["English"])
         language_keywords = lang_info["keywords"]
         target_countries = ", ".join(lang_info["countries"])
         
         # 生成可信來源列表
         sources_list = "\n".join([
             f"  - {src['name']} (site:{src['domain']}) - {src['region']}" 
-            for src in self.TRUSTED_NEWS_SOURCES
+            for src in sources
         ])
         
         # 生成 site: 搜尋字串組合（用於建議搜尋範例）
         site_examples = [
             f"site:{src['domain']}" 
-            for src in self.TRUSTED_NEWS_SOURCES[:5]  # 只取前5個作為範例
+            for src in sources[:5]  # 只取前5個作為範例
         ]
         site_search_example = " OR ".join(site_examples)
         
         # 生成域名列表用於驗證
-        allowed_domains = [src['domain'] for src in self.TRUSTED_NEWS_SOURCES]
+        allowed_domains = [src['domain'] for src in sources]
         allowed_domains_str = ", ".join(allowed_domains)
         
         # 精簡優化的搜尋提示詞
@@ -129,111 +885,204 @@ class ResearchAgent:
 注意：確保 JSON 語法正確、所有欄位完整、日期在指定範圍內。
         """
         
-        try:
-            # 使用 OpenAI Responses API 執行網路搜尋（串流模式）
-            print("🌐 正在啟動串流搜尋...")
+        return enhanced_query
+    
+    def _handle_event(self, event: Any, state: _StreamState, on_event: Optional[SearchEventCallback]):
+        """處理單一串流事件（同步與非同步串流共用）"""
+        event_type = event.type
+        
+        # 回應創建事件
+        if event_type == "response.created":
+            state.log("created", f"📡 回應已創建 (ID: {event.response.id})")
+        
+        # 工具呼叫開始
+        elif event_type == "response.output_item.added":
+            output_item = event.item
+            if hasattr(output_item, 'type') and output_item.type == "web_search_call":
+                state.web_search_count += 1
+                state.log("web_search_started", f"🔍 開始第 {state.web_search_count} 次網路搜尋...")
+                self._emit(on_event, "web_search_started", count=state.web_search_count)
+        
+        # 工具呼叫完成
+        elif event_type == "response.output_item.done":
+            output_item = event.item
+            if hasattr(output_item, 'type') and output_item.type == "web_search_call":
+                status = getattr(output_item, 'status', 'unknown')
+                state.log("web_search_completed", f"✅ 網路搜尋完成 (狀態: {status})")
+                self._emit(on_event, "web_search_completed", count=state.web_search_count, status=status)
+        
+        # 文字內容片段（逐步接收）
+        elif event_type in ("response.output_text.delta", "response.content_part.delta"):
+            delta = event.delta
+            text = delta if isinstance(delta, str) else getattr(delta, 'text', None)
+            if text:
+                self._append_text(state, text, on_event)
+                state.part_length += len(text)
+                state.text_chunks += 1
+                # 每接收 10 個片段發送一次進度
+                if state.text_chunks % 10 == 0:
+                    state.log("characters", f"📝 已接收 {state.length} 字元... ({state.text_chunks} 個片段)")
+                    self._emit(on_event, "characters_received", characters=state.length, chunks=state.text_chunks)
+        
+        # 內容片段完成（包含 annotations）
+        elif event_type == "response.content_part.done":
+            # 正確的屬性名稱是 part，不是 content_part
+            content_part = event.part
+            # 片段的完整文字：已由 delta 收到的部分只需比對長度，補上尚未收到的部分
+            # （沒有 delta 的片段即為整段文字）
+            text = getattr(content_part, 'text', None)
+            if text and len(text) > state.part_length:
+                self._append_text(state, text[state.part_length:], on_event)
+            state.part_length = 0
             
-            stream = self.client.responses.create(
-                model=self.model,
-                input=enhanced_query,
-                tools=[
-                    {
-                        "type": "web_search"
-                    }
-                ],
-                stream=True  # 啟用串流模式
-            )
-
-            # 提取回應內容和來源
-            content = ""
-            sources = []
-            web_search_count = 0
-            text_chunks = 0
-
-            # 串流接收事件
-            print("📡 開始接收串流事件...")
-            for event in stream:
-                event_type = event.type
-                
-                # 回應創建事件
-                if event_type == "response.created":
-                    print(f"📡 回應已創建 (ID: {event.response.id})")
-                
-                # 工具呼叫開始
-                elif event_type == "response.output_item.added":
-                    output_item = event.item
-                    if hasattr(output_item, 'type') and output_item.type == "web_search_call":
-                        web_search_count += 1
-                        print(f"🔍 開始第 {web_search_count} 次網路搜尋...")
-                
-                # 工具呼叫完成
-                elif event_type == "response.output_item.done":
-                    output_item = event.item
-                    if hasattr(output_item, 'type') and output_item.type == "web_search_call":
-                        status = getattr(output_item, 'status', 'unknown')
-                        print(f"✅ 網路搜尋完成 (狀態: {status})")
-                
-                # 文字內容片段（逐步接收）
-                elif event_type == "response.content_part.delta":
-                    delta = event.delta
-                    if hasattr(delta, 'text') and delta.text:
-                        content += delta.text
-                        text_chunks += 1
-                        # 每接收 10 個片段顯示一次進度
-                        if text_chunks % 10 == 0:
-                            print(f"📝 已接收 {len(content)} 字元... ({text_chunks} 個片段)")
-                
-                # 內容片段完成（包含 annotations）
-                elif event_type == "response.content_part.done":
-                    # 正確的屬性名稱是 part，不是 content_part
-                    content_part = event.part
-                    if hasattr(content_part, 'text'):
-                        # 確保完整文字被加入
-                        if content_part.text and content_part.text not in content:
-                            content += content_part.text
-                    
-                    # 處理引用/來源資訊
-                    if hasattr(content_part, 'annotations') and content_part.annotations:
-                        for annotation in content_part.annotations:
-                            if annotation.type == "url_citation":
-                                source_info = {
-                                    "title": annotation.title,
-                                    "url": annotation.url,
-                                    "index": annotation.index if hasattr(annotation, 'index') else None
-                                }
-                                sources.append(source_info)
-                                print(f"📌 找到來源: {annotation.title[:50]}...")
-                
-                # 回應完成
-                elif event_type == "response.done":
-                    print("🎉 串流接收完成")
-                
-                # 錯誤事件
-                elif event_type == "error":
-                    error_data = event.error
-                    print(f"❌ 串流錯誤: {error_data}")
-                    raise Exception(f"串流錯誤: {error_data}")
-
-            print("✅ Research Agent 搜尋完成")
-            print(f"📰 找到 {len(sources)} 個來源")
-            print(f"📄 總文字長度: {len(content)} 字元")
-            print(f"🔍 執行了 {web_search_count} 次網路搜尋")
-
-            return {
-                "status": "success",
-                "query": query,
-                "content": content,
-                "sources": sources,
-                "web_search_count": web_search_count
-            }
-
+            # 處理引用/來源資訊（逐一收到的 annotation.added 已記錄過的來源不重複加入）
+            for annotation in getattr(content_part, 'annotations', None) or []:
+                self._add_citation(state, annotation, on_event)
+        
+        # 引用來源逐一加入（提前結束串流時不會收到 content_part.done，來源需在此累積）
+        elif event_type == "response.output_text.annotation.added":
+            self._add_citation(state, event.annotation, on_event)
+        
+        # 回應完成
+        elif event_type == "response.done":
+            print("🎉 串流接收完成")
+        
+        # 錯誤事件
+        elif event_type == "error":
+            error_data = event.error
+            print(f"❌ 串流錯誤: {error_data}")
+            raise Exception(f"串流錯誤: {error_data}")
+    
+    def _add_citation(self, state: _StreamState, annotation: Any, on_event: Optional[SearchEventCallback]):
+        """記錄 url_citation 引用來源（SDK 物件或字典皆可）"""
+        if isinstance(annotation, dict):
+            annotation = SimpleNamespace(**annotation)
+        if getattr(annotation, 'type', None) != "url_citation":
+            return
+        title = getattr(annotation, 'title', None) or ""
+        url = getattr(annotation, 'url', None) or ""
+        if state.add_source(title, url, getattr(annotation, 'index', None)):
+            state.log("citation", f"📌 找到來源: {title[:50]}...")
+            self._emit(on_event, "citation_found", title=title, url=url)
+    
+    def _new_state(
+        self,
+        time_instruction: str,
+        num_instruction: str,
+        sources: List[Dict[str, str]]
+    ) -> _StreamState:
+        """建立串流狀態；啟用 Config.SEARCH_EARLY_STOP 時帶入目標數量與網域、日期限制"""
+        state = _StreamState()
+        self._apply_constraints(state, time_instruction, num_instruction, sources)
+        return state
+    
+    @staticmethod
+    def _apply_constraints(
+        state: _StreamState,
+        time_instruction: str,
+        num_instruction: str,
+        sources: List[Dict[str, str]]
+    ):
+        """設定提前結束的條件（目標數量、來源網域、最早日期）"""
+        if not Config.SEARCH_EARLY_STOP:
+            return
+        
+        window = parse_time_window(time_instruction)
+        state.target = parse_target_count(num_instruction)
+        state.domains = DomainIndex(src["domain"] for src in sources)
+        state.since = date.today() - timedelta(days=window) if window else None
+    
+    def _should_stop(self, state: _StreamState, on_event: Optional[SearchEventCallback]) -> bool:
+        """是否已取得足夠的有效新聞，可提前結束串流"""
+        if state.stopped_early or not state.target_reached:
+            return False
+        
+        state.stopped_early = True
+        print(f"⏹️ 已取得 {len(state.valid_items)} 則符合條件的新聞（目標 {state.target} 則），提前結束串流")
+        self._emit(on_event, "search_target_reached", count=len(state.valid_items), target=state.target)
+        return True
+    
+    @staticmethod
+    def _stream_output(query: str, state: _StreamState) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        串流結束後的搜尋結果文字與新聞項目
+        
+        提前結束時原始文字的 JSON 並不完整，改以符合條件的新聞重新組成；
+        尚未收到引用的新聞以其網址補入來源
+        """
+        state.log.flush()
+        if state.stopped_early:
+            items = state.valid_items[:state.target]
+            for item in items:
+                state.add_source(item.get("title", ""), item.get("url", ""))
+            return render_news_content(query, items), items
+        return state.content, state.items or extract_news_items(state.content)
+    
+    def _append_text(self, state: _StreamState, text: str, on_event: Optional[SearchEventCallback]):
+        """累積串流文字，並在每則新聞的 JSON 物件完整時立即發送"""
+        state.append(text)
+        completed = state.parser.feed(text)
+        
+        # 進入 results 陣列時，之前輸出的需求解析結果已完整，先據此設定提前結束條件
+        if state.expects_parsed and state.parsed is None and state.parser.started:
+            self._capture_parsed(state, on_event)
+        
+        for item in completed:
+            if state.accept(item):
+                state.valid_items.append(item)
+            count = len(state.items)
+            state.log("item", f"🧾 已解析第 {count} 則新聞: {str(item.get('title', ''))[:50]}")
+            self._emit(on_event, "item_parsed", count=count, title=item.get("title", ""),
+                       url=item.get("url", ""), source=item.get("source", ""), date=item.get("date", ""))
+    
+    def _capture_parsed(self, state: _StreamState, on_event: Optional[SearchEventCallback]):
+        """取出合併搜尋中模型解析的需求，並套用請求欄位與預設值"""
+        raw = extract_object_field(state.content, "parsed") or {}
+        state.parsed = PromptParser.merge(state.user_prompt, raw, state.explicit)
+        self._apply_constraints(
+            state, state.parsed["time_instruction"], state.parsed["num_instruction"], self.TRUSTED_NEWS_SOURCES
+        )
+        print(
+            f"🧠 需求解析完成：主題='{state.parsed['keywords']}', 時間='{state.parsed['time_instruction']}', "
+            f"數量='{state.parsed['num_instruction']}', 語言='{state.parsed['language']}'"
+        )
+        self._emit(on_event, "request_parsed", **state.parsed)
+    
+    def _finish(
+        self,
+        query: str,
+        content: str,
+        sources: List[Dict[str, Any]],
+        web_search_count: int,
+        on_event: Optional[SearchEventCallback],
+        **extra
+    ) -> Dict[str, Any]:
+        """輸出搜尋摘要並組成成功結果"""
+        print("✅ Research Agent 搜尋完成")
+        print(f"📰 找到 {len(sources)} 個來源")
+        print(f"📄 總文字長度: {len(content)} 字元")
+        print(f"🔍 執行了 {web_search_count} 次網路搜尋")
+        self._emit(on_event, "search_completed", sources=len(sources), characters=len(content),
+                   web_search_count=web_search_count)
+        
+        return {
+            "status": "success",
+            "query": query,
+            "content": content,
+            "sources": sources,
+            "web_search_count": web_search_count,
+            **extra
+        }
+    
+    @staticmethod
+    def _emit(on_event: Optional[SearchEventCallback], event: str, **data):
+        """發送搜尋事件；回呼失敗不影響搜尋本身"""
+        if on_event is None:
+            return
+        try:
+            on_event(event, data)
         except Exception as e:
-            print(f"❌ Research Agent 搜尋失敗: {str(e)}")
-            return {
-                "status": "error",
-                "query": query,
-                "error": str(e)
-            }
+            print(f"⚠️ 搜尋事件回呼失敗 ({event}): {str(e)}")
     
     def test_connection(self) -> bool:
         """測試 OpenAI API 連接是否正常"""
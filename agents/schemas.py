@@ -0,0 +1,34 @@
+"""
+Agent 輸出結構
+Analyst Agent 以 JSON 回傳分析結果，經 pydantic 驗證後再於本地輸出 Markdown 與 Excel 資料列
+"""
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class NewsAnalysis(BaseModel):
+    """單則新聞的分析"""
+
+    title: str = Field(description="新聞標題（翻譯成繁體中文）")
+    source: str = Field(description="來源名稱")
+    url: str = Field(description="新聞網址")
+    date: str = Field(description="發布日期，YYYY-MM-DD 格式")
+    country: str = Field(description="新聞所屬國家（繁體中文，例如：新加坡、越南；無法判斷時為「東南亞」）")
+    summary: str = Field(description="新聞的詳細摘要，100-300字")
+    key_points: List[str] = Field(description="重點分析，每點一句")
+
+
+class AnalysisReport(BaseModel):
+    """Analyst Agent 的完整分析結果"""
+
+    summary: str = Field(description="用 2-3 句話總結報告的核心內容")
+    items: List[NewsAnalysis] = Field(description="新聞分析，依重要性與時間排序")
+    insights: List[str] = Field(description="基於新聞的市場洞察，每點一段")
+
+
+class ReportOverview(BaseModel):
+    """map-reduce 分析的 reduce 結果：報告摘要與市場洞察"""
+
+    summary: str = Field(description="用 2-3 句話總結報告的核心內容")
+    insights: List[str] = Field(description="基於新聞的市場洞察，每點一段")
@@ -6,6 +6,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
+from contextlib import asynccontextmanager
 from pathlib import Path
 import sys
 
@@ -15,10 +16,34 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 from config import Config
+from agents.clients import close_clients
+from agents.pdf_renderer import close_pdf_renderer, get_pdf_renderer
 from app.routers import tasks
+from app.services.executor import task_executor
+from app.services.progress import task_manager
+from app.services.workflow import workflow
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    應用程式生命週期：將上次未完成的任務標記為失敗，啟動與關閉任務執行器並預熱 PDF 渲染程序，
+    關閉時釋放共用的 OpenAI 連線池與渲染程序
+    """
+    task_manager.fail_interrupted()
+    await task_executor.start()
+    pdf_renderer = get_pdf_renderer()
+    if pdf_renderer is not None:
+        pdf_renderer.warm()
+    yield
+    await task_executor.shutdown()
+    close_clients()
+    close_pdf_renderer()
+
 
 # 創建 FastAPI 應用
 app = FastAPI(
+    lifespan=lifespan,
     title="東南亞金融新聞搜尋系統 API",
     description="提供新聞搜尋、分析、報告生成和郵件發送功能的 RESTful API",
     version="2.0.0",
@@ -112,6 +137,7 @@ async def root():
             <ul class="link-list">
                 <li><strong>POST</strong> /api/tasks/news-report - 創建新聞報告任務</li>
                 <li><strong>GET</strong> /api/tasks/{task_id} - 查詢任務狀態</li>
+                <li><strong>GET</strong> /api/tasks/{task_id}/events - 訂閱任務進度 (SSE)</li>
             </ul>
             
             <h2>ℹ️ 系統資訊</h2>
@@ -129,7 +155,9 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "SEA News Alert API",
-        "version": "2.0.0"
+        "version": "2.0.0",
+        "executor": task_executor.stats(),
+        "search_cache": workflow.research_agent.cache.stats() if workflow.research_agent.cache else None
     }
 
 
@@ -2,11 +2,16 @@
 任務路由
 處理新聞報告任務的 API 端點
 """
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional
+import asyncio
 from ..services.progress import task_manager
 from ..services.workflow import workflow
+from ..services.executor import task_executor
+from ..services.events import event_broker, format_sse
+from config import Config
 
 router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 
@@ -49,10 +54,7 @@ class TaskStatusResponse(BaseModel):
 
 
 @router.post("/news-report", response_model=TaskResponse, status_code=201)
-async def create_news_report_task(
-    request: NewsReportRequest,
-    background_tasks: BackgroundTasks
-):
+async def create_news_report_task(request: NewsReportRequest):
     """
     創建新聞報告任務
     
@@ -69,17 +71,21 @@ async def create_news_report_task(
             email=request.email,
             language=request.language,
             time_range=request.time_range,
-            count_hint=request.count_hint
+            count_hint=request.count_hint,
+            explicit_fields=sorted(request.model_fields_set & {"language", "time_range", "count_hint"})
         )
         
-        # 加入背景任務
-        background_tasks.add_task(workflow.execute_task, task_id)
+        # 放入任務執行器的佇列
+        await task_executor.submit(workflow.execute_task, task_id)
         
         return TaskResponse(
             task_id=task_id,
             message="Task started"
         )
         
+    except asyncio.QueueFull:
+        task_manager.set_failed(task_id, "任務佇列已滿，請稍後再試")
+        raise HTTPException(status_code=503, detail="Task queue is full, please retry later")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create task: {str(e)}")
 
@@ -97,3 +103,51 @@ async def get_task_status(task_id: str):
         raise HTTPException(status_code=404, detail="Task not found")
     
     return TaskStatusResponse(**task)
+
+
+@router.get("/{task_id}/events")
+async def stream_task_events(task_id: str, request: Request):
+    """
+    以 Server-Sent Events 推送任務進度
+    
+    - **task_id**: 任務 ID
+    
+    事件類型：
+    - `progress`: 任務狀態（格式同 GET /api/tasks/{task_id}），連線後立即推送一次
+    - `search_started` / `web_search_started` / `web_search_completed` /
+      `citation_found` / `characters_received` / `search_completed`: 搜尋串流事件
+    
+    任務成功或失敗後連線自動結束
+    """
+    # 先訂閱再讀取目前狀態，避免遺漏兩者之間的更新
+    subscription = event_broker.subscribe(task_id)
+    task = task_manager.get_task(task_id)
+    
+    if not task:
+        event_broker.unsubscribe(task_id, subscription)
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    async def event_stream():
+        try:
+            yield format_sse({"id": None, "event": "progress", "data": task})
+            if task["status"] in ("succeeded", "failed"):
+                return
+            
+            while not await request.is_disconnected():
+                try:
+                    message = await subscription.get(timeout=Config.SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                
+                yield format_sse(message)
+                if message["event"] == "progress" and message["data"]["status"] in ("succeeded", "failed"):
+                    break
+        finally:
+            event_broker.unsubscribe(task_id, subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
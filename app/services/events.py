@@ -0,0 +1,104 @@
+"""
+任務事件推播服務
+將任務進度與搜尋串流事件推送給 Server-Sent Events 訂閱者
+"""
+import asyncio
+import itertools
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+
+class Subscription:
+    """單一 SSE 連線的事件佇列"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def get(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """等待下一個事件，逾時拋出 asyncio.TimeoutError"""
+        return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+
+    def deliver(self, event: Dict[str, Any]):
+        """放入事件（在訂閱者的 event loop 上執行）；佇列滿時丟棄最舊的事件"""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class EventBroker:
+    """
+    任務事件中心
+
+    publish 可由任何執行緒呼叫（例如執行搜尋的 worker 執行緒），
+    事件會透過 call_soon_threadsafe 送回各訂閱者所在的 event loop
+    """
+
+    def __init__(self, queue_size: int = 256):
+        """
+        初始化事件中心
+
+        Args:
+            queue_size: 每個訂閱者可暫存的事件數量
+        """
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, task_id: str) -> Subscription:
+        """訂閱任務事件（須在 event loop 中呼叫）"""
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(task_id, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, task_id: str, subscription: Subscription):
+        """取消訂閱"""
+        with self._lock:
+            subscriptions = self._subscribers.get(task_id, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+            if not subscriptions:
+                self._subscribers.pop(task_id, None)
+
+    def has_subscribers(self, task_id: str) -> bool:
+        """任務是否有訂閱者"""
+        return task_id in self._subscribers
+
+    def publish(self, task_id: str, event: str, data: Dict[str, Any]):
+        """
+        發布任務事件
+
+        Args:
+            task_id: 任務 ID
+            event: 事件名稱（例如 "progress", "citation_found"）
+            data: 事件內容（需可序列化為 JSON）
+        """
+        with self._lock:
+            subscriptions = list(self._subscribers.get(task_id, ()))
+        if not subscriptions:
+            return
+
+        message = {"id": next(self._ids), "event": event, "data": data}
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:
+                # event loop 已關閉
+                self.unsubscribe(task_id, subscription)
+
+
+def format_sse(message: Dict[str, Any]) -> str:
+    """將事件格式化為 SSE 文字"""
+    lines = []
+    if message.get("id") is not None:
+        lines.append(f"id: {message['id']}")
+    lines.append(f"event: {message['event']}")
+    lines.append(f"data: {json.dumps(message['data'], ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+# 全域事件中心實例
+event_broker = EventBroker()
@@ -0,0 +1,135 @@
+"""
+任務執行引擎
+以有界佇列與固定數量的 worker 執行報告任務，
+阻塞式的階段（搜尋、分析、報告生成、郵件）分派到各自的執行緒池，
+讓 event loop 只負責 HTTP 請求
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from config import Config
+
+
+class TaskExecutor:
+    """任務執行器 - 佇列 + worker + 分階段執行緒池"""
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        stage_pool_sizes: Optional[Dict[str, int]] = None
+    ):
+        """
+        初始化任務執行器
+
+        Args:
+            num_workers: 同時執行的任務數量上限
+            queue_size: 等待中任務的佇列長度上限
+            stage_pool_sizes: 各階段執行緒池大小
+        """
+        self.num_workers = num_workers or Config.TASK_WORKERS
+        self.queue_size = queue_size or Config.TASK_QUEUE_SIZE
+        self.stage_pool_sizes = dict(stage_pool_sizes or Config.STAGE_POOL_SIZES)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        self._active = 0
+
+    @property
+    def started(self) -> bool:
+        """執行器是否已啟動"""
+        return bool(self._workers)
+
+    async def start(self):
+        """在目前的 event loop 上啟動 worker"""
+        if self.started:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [
+            asyncio.create_task(self._worker(index), name=f"task-worker-{index}")
+            for index in range(self.num_workers)
+        ]
+        print(f"✅ 任務執行器已啟動（{self.num_workers} 個 worker，佇列上限 {self.queue_size}）")
+
+    async def shutdown(self):
+        """停止所有 worker 並關閉執行緒池"""
+        for worker in self._workers:
+            worker.cancel()
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._pools = {}
+
+    async def submit(self, handler: Callable[..., Awaitable[Any]], *args):
+        """
+        將任務放入佇列
+
+        Args:
+            handler: 要執行的協程函數
+            *args: 傳給 handler 的參數
+
+        Raises:
+            asyncio.QueueFull: 佇列已滿
+        """
+        if not self.started:
+            await self.start()
+        self._queue.put_nowait((handler, args))
+
+    async def run_in_stage(self, stage: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在指定階段的執行緒池中執行阻塞函數
+
+        Args:
+            stage: 階段名稱（對應 Config.STAGE_POOL_SIZES）
+            func: 阻塞函數
+
+        Returns:
+            Any: 函數的回傳值
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_pool(stage), partial(func, *args, **kwargs))
+
+    def stats(self) -> Dict[str, int]:
+        """執行器狀態（用於健康檢查）"""
+        return {
+            "workers": self.num_workers,
+            "active": self._active,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "queue_size": self.queue_size,
+        }
+
+    def _get_pool(self, stage: str) -> ThreadPoolExecutor:
+        """取得（必要時建立）階段執行緒池"""
+        pool = self._pools.get(stage)
+        if pool is None:
+            pool = ThreadPoolExecutor(
+                max_workers=self.stage_pool_sizes.get(stage, self.num_workers),
+                thread_name_prefix=f"stage-{stage}"
+            )
+            self._pools[stage] = pool
+        return pool
+
+    async def _worker(self, index: int):
+        """從佇列取出任務並執行"""
+        while True:
+            handler, args = await self._queue.get()
+            self._active += 1
+            try:
+                await handler(*args)
+            except Exception as e:
+                print(f"❌ worker-{index} 執行任務時發生未預期錯誤: {str(e)}")
+            finally:
+                self._active -= 1
+                self._queue.task_done()
+
+
+# 全域任務執行器實例
+task_executor = TaskExecutor()
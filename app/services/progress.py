@@ -1,11 +1,16 @@
 """
 任務進度管理服務
-使用內存字典儲存任務狀態
+任務狀態儲存在可替換的 TaskStore（預設為 SQLite）
 """
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 from datetime import datetime
 from enum import Enum
+import threading
+import time
 import uuid
+from config import Config
+from .task_store import TaskStore, create_task_store
+from .events import EventBroker, event_broker
 
 
 class TaskStatus(str, Enum):
@@ -19,12 +24,29 @@ class TaskStatus(str, Enum):
 class TaskProgress:
     """任務進度管理"""
     
-    def __init__(self):
-        """初始化任務進度管理器"""
-        self._tasks: Dict[str, Dict[str, Any]] = {}
+    def __init__(
+        self,
+        store: Optional[TaskStore] = None,
+        ttl_seconds: Optional[int] = None,
+        broker: Optional[EventBroker] = None
+    ):
+        """
+        初始化任務進度管理器
+        
+        Args:
+            store: 任務儲存後端，預設依 Config.TASK_STORE 建立
+            ttl_seconds: 已結束任務的保留秒數
+            broker: 事件中心，任務更新時推送 "progress" 事件
+        """
+        self.store = store or create_task_store()
+        self.broker = broker
+        self.ttl_seconds = ttl_seconds or Config.TASK_TTL_SECONDS
+        self._last_eviction = time.monotonic()
+        self._eviction_lock = threading.Lock()
     
     def create_task(self, user_prompt: str, email: str, language: str = "English", 
-                   time_range: str = "最近 7 天內", count_hint: str = "5-10篇") -> str:
+                   time_range: str = "最近 7 天內", count_hint: str = "5-10篇",
+                   explicit_fields: Optional[List[str]] = None) -> str:
         """
         創建新任務
         
@@ -34,13 +56,14 @@ class TaskProgress:
             language: 新聞語言
             time_range: 時間範圍
             count_hint: 數量提示
+            explicit_fields: 請求中明確指定（而非使用預設值）的欄位，解析需求時優先採用
             
         Returns:
             str: 任務 ID
         """
         task_id = str(uuid.uuid4())
         
-        self._tasks[task_id] = {
+        self.store.create({
             "task_id": task_id,
             "status": TaskStatus.QUEUED,
             "progress": 0,
@@ -56,10 +79,12 @@ class TaskProgress:
             "language": language,
             "time_range": time_range,
             "count_hint": count_hint,
+            "explicit_fields": list(explicit_fields or []),
             "current_step": None,
             "step_message": None
-        }
+        })
         
+        self._maybe_evict()
         return task_id
     
     def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
@@ -72,18 +97,9 @@ class TaskProgress:
         Returns:
             Optional[Dict]: 任務狀態字典，若不存在則返回 None
         """
-        task = self._tasks.get(task_id)
+        task = self.store.get(task_id)
         if task:
-            # 返回用於 API 的簡化版本
-            return {
-                "task_id": task["task_id"],
-                "status": task["status"],
-                "progress": task["progress"],
-                "error": task["error"],
-                "artifacts": task["artifacts"],
-                "current_step": task.get("current_step"),
-                "step_message": task.get("step_message")
-            }
+            return self._public_view(task)
         return None
     
     def update_task(self, task_id: str, **kwargs):
@@ -94,9 +110,11 @@ class TaskProgress:
             task_id: 任務 ID
             **kwargs: 要更新的欄位
         """
-        if task_id in self._tasks:
-            self._tasks[task_id].update(kwargs)
-            self._tasks[task_id]["updated_at"] = datetime.now().isoformat()
+        kwargs["updated_at"] = datetime.now().isoformat()
+        task = self.store.update(task_id, kwargs)
+        
+        if task and self.broker and self.broker.has_subscribers(task_id):
+            self.broker.publish(task_id, "progress", self._public_view(task))
     
     def set_running(self, task_id: str, progress: int = 10):
         """設置任務為執行中"""
@@ -134,10 +152,55 @@ class TaskProgress:
             error=error
         )
     
+    def fail_interrupted(self) -> int:
+        """
+        將上次執行時未完成的任務標記為失敗（服務啟動時呼叫）
+
+        執行器關閉時會取消進行中的工作，重新啟動後這些任務不會再被執行，
+        標記為失敗可避免輪詢或訂閱 SSE 的客戶端一直看到「執行中」
+        """
+        interrupted = self.store.fail_unfinished("任務因服務重新啟動而中斷，請重新提交")
+        if interrupted:
+            print(f"⚠️ 已將 {interrupted} 個中斷的任務標記為失敗")
+        return interrupted
+    
     def get_task_details(self, task_id: str) -> Optional[Dict[str, Any]]:
         """獲取完整任務詳情（包含內部資訊）"""
-        return self._tasks.get(task_id)
+        return self.store.get(task_id)
+    
+    @staticmethod
+    def _public_view(task: Dict[str, Any]) -> Dict[str, Any]:
+        """返回用於 API 的簡化版本"""
+        return {
+            "task_id": task["task_id"],
+            "status": task["status"],
+            "progress": task["progress"],
+            "error": task["error"],
+            "artifacts": task["artifacts"],
+            "current_step": task.get("current_step"),
+            "step_message": task.get("step_message")
+        }
+    
+    def evict_expired(self) -> int:
+        """淘汰超過保留期限的已結束任務"""
+        evicted = self.store.evict_expired(self.ttl_seconds)
+        if evicted:
+            print(f"🧹 已淘汰 {evicted} 個過期任務")
+        return evicted
+    
+    def _maybe_evict(self):
+        """每隔 TASK_EVICT_INTERVAL 秒順帶執行一次淘汰"""
+        now = time.monotonic()
+        if now - self._last_eviction < Config.TASK_EVICT_INTERVAL:
+            return
+        if not self._eviction_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_eviction = now
+            self.evict_expired()
+        finally:
+            self._eviction_lock.release()
 
 
 # 全域任務管理器實例
-task_manager = TaskProgress()
+task_manager = TaskProgress(broker=event_broker)
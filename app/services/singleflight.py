@@ -0,0 +1,100 @@
+"""
+相同請求合併服務（single-flight）
+將正規化後相同的報告請求合併到同一條執行中的流程，
+搜尋、分析與報告生成只執行一次，郵件則寄給每位訂閱者
+"""
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+from utils.helpers import normalize_text
+
+
+def request_key(
+    user_prompt: str,
+    language: str,
+    time_range: str,
+    count_hint: str,
+    explicit_fields: Iterable[str] = ()
+) -> str:
+    """
+    由報告請求產生合併用的鍵值
+
+    Args:
+        user_prompt: 使用者輸入的搜尋需求
+        language: 新聞語言
+        time_range: 時間範圍
+        count_hint: 數量提示
+        explicit_fields: 請求中明確指定的欄位（明確指定的欄位優先於 prompt 中的描述，解析結果可能不同）
+
+    Returns:
+        str: 請求鍵值
+    """
+    parts = [normalize_text(part) for part in (user_prompt, language, time_range, count_hint)]
+    # 時間與數量提示中的空白不影響語意（"最近 7 天內" == "最近7天內"）
+    parts[2] = parts[2].replace(" ", "")
+    parts[3] = parts[3].replace(" ", "")
+    parts.append(",".join(sorted(set(explicit_fields))))
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class Flight:
+    """一條執行中的報告流程及其訂閱任務"""
+
+    def __init__(self, key: str, leader_id: str):
+        self.key = key
+        self.leader_id = leader_id
+        self._members: List[str] = [leader_id]
+        self._lock = threading.Lock()
+
+    def add(self, task_id: str):
+        with self._lock:
+            self._members.append(task_id)
+
+    def members(self) -> List[str]:
+        """目前所有訂閱任務（含發起者）的快照"""
+        with self._lock:
+            return list(self._members)
+
+
+class SingleFlight:
+    """執行中流程的登記表"""
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: str, task_id: str) -> Tuple[Flight, bool]:
+        """
+        加入鍵值對應的流程，沒有則建立新流程
+
+        Returns:
+            Tuple[Flight, bool]: (流程, 是否為發起者)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = Flight(key, task_id)
+                self._flights[key] = flight
+                return flight, True
+            flight.add(task_id)
+            return flight, False
+
+    def close(self, flight: Flight) -> List[str]:
+        """
+        停止接受新的訂閱者，返回最終的訂閱任務清單
+
+        之後相同鍵值的請求會建立新的流程
+        """
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            return flight.members()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+
+# 全域流程登記表
+report_flights = SingleFlight()
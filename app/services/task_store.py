@@ -0,0 +1,273 @@
+"""
+任務儲存服務
+提供可替換的任務儲存後端：
+- MemoryTaskStore: 內存字典（開發、測試用）
+- SQLiteTaskStore: SQLite (WAL) 持久化，前置 LRU 快取
+"""
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from config import Config
+
+# 已結束（可依 TTL 淘汰）的任務狀態
+FINISHED_STATUSES = ("succeeded", "failed")
+
+# 尚未結束（重新啟動後不會再被執行）的任務狀態
+UNFINISHED_STATUSES = ("queued", "running")
+
+
+class TaskStore(ABC):
+    """任務儲存介面"""
+
+    @abstractmethod
+    def create(self, task: Dict[str, Any]) -> None:
+        """新增任務"""
+
+    @abstractmethod
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """取得任務（回傳副本），不存在則返回 None"""
+
+    @abstractmethod
+    def update(self, task_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """更新任務欄位，返回更新後的任務副本"""
+
+    @abstractmethod
+    def evict_expired(self, ttl_seconds: int) -> int:
+        """淘汰超過 TTL 的已結束任務，返回淘汰數量"""
+
+    @abstractmethod
+    def fail_unfinished(self, error: str) -> int:
+        """將所有尚未結束的任務標記為失敗，返回標記數量"""
+
+    @staticmethod
+    def _expire_before(ttl_seconds: int) -> str:
+        return (datetime.now() - timedelta(seconds=ttl_seconds)).isoformat()
+
+
+class MemoryTaskStore(TaskStore):
+    """內存任務儲存"""
+
+    def __init__(self):
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, task: Dict[str, Any]) -> None:
+        with self._lock:
+            self._tasks[task["task_id"]] = _copy_task(task)
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return _copy_task(task) if task else None
+
+    def update(self, task_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return None
+            task.update(fields)
+            return _copy_task(task)
+
+    def evict_expired(self, ttl_seconds: int) -> int:
+        expire_before = self._expire_before(ttl_seconds)
+        with self._lock:
+            expired = [
+                task_id for task_id, task in self._tasks.items()
+                if _is_expired(task, expire_before)
+            ]
+            for task_id in expired:
+                del self._tasks[task_id]
+        return len(expired)
+
+    def fail_unfinished(self, error: str) -> int:
+        fields = _failed_fields(error)
+        with self._lock:
+            unfinished = [task for task in self._tasks.values() if task.get("status") in UNFINISHED_STATUSES]
+            for task in unfinished:
+                task.update(fields)
+        return len(unfinished)
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    SQLite 任務儲存
+
+    - WAL 模式，讀寫互不阻塞
+    - status / created_at / email 建立索引
+    - 前置 LRU 快取，熱任務的 get 為 O(1)
+    - 單一連線以鎖保護，可由多個 worker 執行緒同時呼叫
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            task_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            email TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, updated_at);
+        CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+        CREATE INDEX IF NOT EXISTS idx_tasks_email ON tasks(email);
+    """
+
+    def __init__(self, db_path: Union[str, Path], cache_size: int = 1024):
+        """
+        初始化 SQLite 任務儲存
+
+        Args:
+            db_path: 資料庫檔案路徑（":memory:" 表示不落地）
+            cache_size: LRU 快取的任務數量上限
+        """
+        self.db_path = str(db_path)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self._SCHEMA)
+
+    def create(self, task: Dict[str, Any]) -> None:
+        with self._lock:
+            self._write(task, insert=True)
+            self._remember(task["task_id"], _copy_task(task))
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            task = self._load(task_id)
+            return _copy_task(task) if task else None
+
+    def update(self, task_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            task = self._load(task_id)
+            if task is None:
+                return None
+            task.update(fields)
+            self._write(task)
+            return _copy_task(task)
+
+    def evict_expired(self, ttl_seconds: int) -> int:
+        expire_before = self._expire_before(ttl_seconds)
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM tasks WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*FINISHED_STATUSES, expire_before)
+            )
+            for task_id in [
+                task_id for task_id, task in self._cache.items()
+                if _is_expired(task, expire_before)
+            ]:
+                del self._cache[task_id]
+        return cursor.rowcount
+
+    def fail_unfinished(self, error: str) -> int:
+        fields = _failed_fields(error)
+        placeholders = ", ".join("?" for _ in UNFINISHED_STATUSES)
+        with self._lock:
+            task_ids = [
+                row[0] for row in self._conn.execute(
+                    f"SELECT task_id FROM tasks WHERE status IN ({placeholders})", UNFINISHED_STATUSES
+                )
+            ]
+            for task_id in task_ids:
+                task = self._load(task_id)
+                task.update(fields)
+                self._write(task)
+        return len(task_ids)
+
+    def close(self):
+        """關閉資料庫連線"""
+        with self._lock:
+            self._conn.close()
+
+    def _load(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """從快取或資料庫載入任務（呼叫端需持有鎖）"""
+        task = self._cache.get(task_id)
+        if task is not None:
+            self._cache.move_to_end(task_id)
+            return task
+
+        row = self._conn.execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+
+        task = json.loads(row[0])
+        self._remember(task_id, task)
+        return task
+
+    def _write(self, task: Dict[str, Any], insert: bool = False):
+        """寫入資料庫（呼叫端需持有鎖）"""
+        values = (
+            getattr(task["status"], "value", task["status"]),
+            task.get("email"),
+            task["created_at"],
+            task["updated_at"],
+            json.dumps(task, ensure_ascii=False),
+            task["task_id"],
+        )
+        if insert:
+            self._conn.execute(
+                "INSERT INTO tasks (status, email, created_at, updated_at, data, task_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                values
+            )
+        else:
+            self._conn.execute(
+                "UPDATE tasks SET status = ?, email = ?, created_at = ?, updated_at = ?, data = ? "
+                "WHERE task_id = ?",
+                values
+            )
+
+    def _remember(self, task_id: str, task: Dict[str, Any]):
+        """放入 LRU 快取（呼叫端需持有鎖）"""
+        self._cache[task_id] = task
+        self._cache.move_to_end(task_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+
+def create_task_store(backend: Optional[str] = None) -> TaskStore:
+    """
+    依設定建立任務儲存
+
+    Args:
+        backend: "sqlite" 或 "memory"，預設使用 Config.TASK_STORE
+
+    Returns:
+        TaskStore: 任務儲存實例
+    """
+    backend = (backend or Config.TASK_STORE).lower()
+    if backend == "memory":
+        return MemoryTaskStore()
+    if backend == "sqlite":
+        return SQLiteTaskStore(Config.TASK_DB_PATH, cache_size=Config.TASK_CACHE_SIZE)
+    raise ValueError(f"不支援的任務儲存後端: {backend}")
+
+
+def _copy_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    """複製任務字典（artifacts 為巢狀字典，需一併複製）"""
+    copied = dict(task)
+    if isinstance(copied.get("artifacts"), dict):
+        copied["artifacts"] = dict(copied["artifacts"])
+    return copied
+
+
+def _failed_fields(error: str) -> Dict[str, Any]:
+    return {"status": "failed", "error": error, "updated_at": datetime.now().isoformat()}
+
+
+def _is_expired(task: Dict[str, Any], expire_before: str) -> bool:
+    return task.get("status") in FINISHED_STATUSES and task.get("updated_at", "") < expire_before
@@ -11,19 +11,34 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 from agents import ResearchAgent, AnalystAgent, ReportGeneratorAgent, EmailAgent
-from typing import Dict, Any
+from agents.backends import cassette_key, model_backend
+from agents.clients import get_http_client
+from typing import Dict, Any, Optional
 from datetime import datetime
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from config import Config
+from utils.prompt_parser import PromptParser
 from .progress import task_manager, TaskStatus
+from .executor import task_executor
+from .events import event_broker
+from .singleflight import Flight, report_flights, request_key
+import asyncio
 import json
+import re
 import traceback
 
 
 class NewsReportWorkflow:
     """新聞報告工作流程"""
     
+    # 請求欄位 → 解析結果欄位
+    EXPLICIT_FIELDS = {
+        "time_range": "time_instruction",
+        "count_hint": "num_instruction",
+        "language": "language",
+    }
+    
     def __init__(self):
         """初始化工作流程和所有 Agents"""
         print("🚀 初始化東南亞金融新聞搜尋系統...")
@@ -32,101 +47,112 @@ class NewsReportWorkflow:
         self.analyst_agent = AnalystAgent()
         self.report_agent = ReportGeneratorAgent()
         self.email_agent = EmailAgent()
+        self.prompt_parser = PromptParser(self._parse_prompt_with_llm, cache_size=Config.PROMPT_CACHE_SIZE)
         
         print("✅ 所有 Agents 初始化完成")
     
-    def _parse_prompt(self, task_id: str, user_prompt: str) -> dict:
-        """使用 LLM 解析用戶 prompt，提取關鍵字、時間指令和數量指令。"""
-        try:
-            task_manager.set_progress(task_id, 15, "prompt_parsing", "🧠 正在解析您的需求...")
-            
-            # 使用 Agent 包裝的 OpenAIChat
-            parser_agent = Agent(
-                name="需求解析專家",
-                model=OpenAIChat(
-                    id=Config.OPENAI_MODEL,
-                    api_key=Config.OPENAI_API_KEY
-                ),
-                description="專門解析使用者需求的專家",
-                instructions=[
-                    "你是一個任務解析專家",
-                    "從使用者的需求中提取關鍵資訊",
-                    "你必須只回傳純 JSON 格式，不要有任何其他文字或解釋",
-                    "不要使用 markdown 代碼塊，直接回傳 JSON 物件"
-                ],
-                markdown=False
+    def _explicit_fields(self, task_details: Dict[str, Any]) -> Dict[str, str]:
+        """請求中明確指定的欄位（以解析結果的欄位名稱表示）"""
+        explicit_fields = set(task_details.get("explicit_fields") or [])
+        return {
+            parsed_field: task_details.get(request_field)
+            for request_field, parsed_field in self.EXPLICIT_FIELDS.items()
+            if request_field in explicit_fields
+        }
+    
+    def _parse_prompt(self, flight: Flight, task_details: Dict[str, Any]) -> Optional[dict]:
+        """
+        解析用戶 prompt，提取關鍵字、時間指令、數量指令和語言
+        
+        請求中明確指定的 language / time_range / count_hint 優先；
+        常見寫法以規則解析，含糊的需求在啟用合併搜尋時返回 None（交由搜尋時一併解析），
+        否則呼叫 LLM
+        """
+        user_prompt = task_details["user_prompt"]
+        explicit = self._explicit_fields(task_details)
+        
+        fast = self.prompt_parser.parse_fast(user_prompt, explicit)
+        if fast is None and Config.SEARCH_COMBINED:
+            self._set_progress(flight, 20, "parsing", "🧠 將在搜尋時一併解析您的需求...")
+            return None
+        
+        parsed, source = fast or self.prompt_parser.parse(user_prompt, explicit)
+        
+        if source == "fallback":
+            message = "⚠️ 需求解析失敗，將使用原始輸入進行搜尋"
+        else:
+            label = {"cache": "（快取）", "rules": "（規則解析）", "llm": ""}[source]
+            message = (
+                f"✅ 需求解析完成{label}：主題='{parsed['keywords']}', 時間='{parsed['time_instruction']}', "
+                f"數量='{parsed['num_instruction']}', 語言='{parsed['language']}'"
             )
-            
-            prompt = f"""
-            請從以下使用者需求中，提取出四個關鍵資訊：
-            1. 'keywords': 核心的搜尋主題
-            2. 'time_instruction': 時間範圍指令（如果沒有指定，預設為'最近7天內'）
-            3. 'num_instruction': 需要的新聞數量（如果沒有指定，預設為'5-10篇'）
-            4. 'language': 新聞來源的語言（如果沒有指定，預設為'English'。支援：'English', 'Chinese', 'Vietnamese', 'Thai', 'Malay', 'Indonesian'）
-
-            使用者需求：{user_prompt}
-            
-            只回傳 JSON 格式，範例：
-            {{"keywords": "主題", "time_instruction": "時間", "num_instruction": "數量", "language": "English"}}
-            """
-            
-            response = parser_agent.run(prompt)
-            
-            if response and response.content:
-                content = response.content.strip()
-                
-                # 嘗試提取 JSON（處理可能的 markdown 代碼塊）
-                if '```json' in content:
-                    import re
-                    json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
-                    if json_match:
-                        content = json_match.group(1)
-                elif '```' in content:
-                    import re
-                    json_match = re.search(r'```\s*(.*?)\s*```', content, re.DOTALL)
-                    if json_match:
-                        content = json_match.group(1)
-                
-                # 解析 JSON
-                parsed_data = json.loads(content)
-                keywords = parsed_data.get("keywords", user_prompt)
-                time_instruction = parsed_data.get("time_instruction", "最近7天內")
-                num_instruction = parsed_data.get("num_instruction", "5-10篇")
-                language = parsed_data.get("language", "English")
-                
-                task_manager.set_progress(
-                    task_id, 20, "prompt_parsing",
-                    f"✅ 需求解析完成：主題='{keywords}', 時間='{time_instruction}', 數量='{num_instruction}', 語言='{language}'"
-                )
-                
-                return {
-                    "keywords": keywords,
-                    "time_instruction": time_instruction,
-                    "num_instruction": num_instruction,
-                    "language": language
-                }
+        self._set_progress(flight, 20, "parsing", message)
+        
+        return parsed
+    
+    def _parse_prompt_with_llm(self, user_prompt: str) -> dict:
+        """使用 LLM 解析用戶 prompt（規則無法判斷時才呼叫，失敗時拋出例外）"""
+        # 使用 Agent 包裝的 OpenAIChat
+        parser_agent = Agent(
+            name="需求解析專家",
+            model=OpenAIChat(
+                id=Config.OPENAI_MODEL,
+                api_key=Config.OPENAI_API_KEY,
+                http_client=get_http_client()  # 共用連線池
+            ),
+            description="專門解析使用者需求的專家",
+            instructions=[
+                "你是一個任務解析專家",
+                "從使用者的需求中提取關鍵資訊",
+                "你必須只回傳純 JSON 格式，不要有任何其他文字或解釋",
+                "不要使用 markdown 代碼塊，直接回傳 JSON 物件"
+            ],
+            markdown=False
+        )
+        
+        prompt = f"""
+        請從以下使用者需求中，提取出四個關鍵資訊：
+        1. 'keywords': 核心的搜尋主題
+        2. 'time_instruction': 時間範圍指令（如果沒有指定，預設為'最近7天內'）
+        3. 'num_instruction': 需要的新聞數量（如果沒有指定，預設為'5-10篇'）
+        4. 'language': 新聞來源的語言（如果沒有指定，預設為'English'。支援：'English', 'Chinese', 'Vietnamese', 'Thai', 'Malay', 'Indonesian'）
 
-        except Exception as e:
-            task_manager.set_progress(
-                task_id, 20, "prompt_parsing",
-                f"⚠️ 需求解析失敗，將使用原始輸入進行搜尋。錯誤: {str(e)}"
-            )
+        使用者需求：{user_prompt}
         
-        # 如果解析失敗，回退到原始輸入
-        return {
-            "keywords": user_prompt,
-            "time_instruction": "最近7天內",
-            "num_instruction": "5-10篇",
-            "language": "English"
-        }
+        只回傳 JSON 格式，範例：
+        {{"keywords": "主題", "time_instruction": "時間", "num_instruction": "數量", "language": "English"}}
+        """
+        
+        response = model_backend.run(
+            cassette_key("agent", parser_agent.name, Config.OPENAI_MODEL, user_prompt),
+            lambda: parser_agent.run(prompt)
+        )
+        
+        if not response or not response.content:
+            raise Exception("LLM 未返回內容")
+        
+        content = response.content.strip()
+        
+        # 嘗試提取 JSON（處理可能的 markdown 代碼塊）
+        json_match = re.search(r'```(?:json)?\s*(.*?)\s*```', content, re.DOTALL)
+        if json_match:
+            content = json_match.group(1)
+        
+        return json.loads(content)
     
     async def execute_task(self, task_id: str):
         """
-        執行完整的新聞報告生成流程（背景任務）
+        執行完整的新聞報告生成流程（由任務執行器的 worker 呼叫）
+        
+        阻塞式的步驟皆透過 task_executor 分派到各階段的執行緒池，
+        避免佔用 event loop。正規化後相同的請求會合併到同一條流程：
+        搜尋、分析和報告生成只執行一次，郵件則分別寄給每個任務的收件者
         
         Args:
             task_id: 任務 ID
         """
+        flight = None
+        
         try:
             # 獲取任務詳情
             task_details = task_manager.get_task_details(task_id)
@@ -134,66 +160,143 @@ class NewsReportWorkflow:
                 raise Exception(f"任務不存在: {task_id}")
             
             user_prompt = task_details["user_prompt"]
-            email = task_details["email"]
             language = task_details.get("language", "English")
             time_range = task_details.get("time_range", "最近 7 天內")
             count_hint = task_details.get("count_hint", "5-10篇")
             
+            # 相同請求已在執行中：加入該流程，由發起者完成後一併寄送
+            key = request_key(
+                user_prompt, language, time_range, count_hint, task_details.get("explicit_fields") or ()
+            )
+            flight, is_leader = report_flights.join(key, task_id)
+            if not is_leader:
+                leader = task_manager.get_task(flight.leader_id) or {}
+                task_manager.set_running(task_id, leader.get("progress") or 10)
+                task_manager.set_progress(
+                    task_id, leader.get("progress") or 10, leader.get("current_step") or "coalesced",
+                    "🔗 已有相同需求的報告正在生成，完成後將一併寄送給您"
+                )
+                print(f"🔗 任務 {task_id} 已合併至執行中的任務 {flight.leader_id}")
+                return
+            
             # 設置為執行中
             task_manager.set_running(task_id, 10)
             
             # ============ 步驟 1: 解析 Prompt & Web Search ============
-            task_manager.set_progress(task_id, 15, "parsing", "🧠 正在解析您的研究需求...")
+            self._set_progress(flight, 15, "parsing", "🧠 正在解析您的研究需求...")
             
             # 解析用戶 Prompt
-            parsed_prompt = self._parse_prompt(task_id, user_prompt)
-            
-            task_manager.set_progress(
-                task_id, 25, "searching",
-                f"🔍 正在搜尋關於「{parsed_prompt['keywords']}」的新聞({parsed_prompt['time_instruction']}, {parsed_prompt['num_instruction']}, {parsed_prompt['language']})..."
+            parsed_prompt = await task_executor.run_in_stage(
+                "parsing", self._parse_prompt, flight, task_details
             )
             
-            search_results = self.research_agent.search(
-                query=parsed_prompt['keywords'],
-                time_instruction=parsed_prompt['time_instruction'],
-                num_instruction=parsed_prompt['num_instruction'],
-                language=parsed_prompt['language']
-            )
+            on_event = lambda event, data: self._on_search_event(flight, event, data)
+            
+            if parsed_prompt is None:
+                # 需求解析與搜尋合併為一次模型呼叫
+                self._set_progress(flight, 25, "searching", f"🔍 正在解析需求並搜尋新聞：「{user_prompt}」...")
+                
+                explicit = self._explicit_fields(task_details)
+                search_results = await task_executor.run_in_stage(
+                    "searching",
+                    self.research_agent.search_combined,
+                    user_prompt=user_prompt,
+                    explicit=explicit,
+                    on_event=on_event
+                )
+                
+                if search_results.get("status") == "success":
+                    # 只記住模型解析的欄位，請求指定的欄位不影響之後相同需求的解析
+                    parsed_prompt = search_results["parsed"]
+                    self.prompt_parser.remember(user_prompt, {
+                        field: value for field, value in parsed_prompt.items() if field not in explicit
+                    })
+            else:
+                self._set_progress(
+                    flight, 25, "searching",
+                    f"🔍 正在搜尋關於「{parsed_prompt['keywords']}」的新聞({parsed_prompt['time_instruction']}, {parsed_prompt['num_instruction']}, {parsed_prompt['language']})..."
+                )
+                
+                search_results = await task_executor.run_in_stage(
+                    "searching",
+                    self.research_agent.search,
+                    query=parsed_prompt['keywords'],
+                    time_instruction=parsed_prompt['time_instruction'],
+                    num_instruction=parsed_prompt['num_instruction'],
+                    language=parsed_prompt['language'],
+                    on_event=on_event
+                )
             
             if search_results.get("status") == "error":
                 raise Exception(f"搜尋失敗: {search_results.get('error')}")
             
-            task_manager.set_progress(task_id, 40, "searching", "✅ 新聞搜尋完成")
+            search_results = await task_executor.run_in_stage(
+                "analyzing", self.research_agent.refine, search_results, parsed_prompt
+            )
+            
+            self._set_progress(flight, 40, "searching", "✅ 新聞搜尋完成")
             
             # ============ 步驟 2: 資訊結構化 ============
-            task_manager.set_progress(task_id, 45, "analyzing", "📊 正在分析並結構化資訊...")
+            self._set_progress(flight, 45, "analyzing", "📊 正在分析並結構化資訊...")
             
-            markdown_report, structured_news = self.analyst_agent.analyze(search_results)
+            markdown_report, structured_news = await task_executor.run_in_stage(
+                "analyzing", self.analyst_agent.analyze, search_results
+            )
             
-            task_manager.set_progress(
-                task_id, 60, "analyzing",
+            self._set_progress(
+                flight, 60, "analyzing",
                 f"✅ 資訊分析完成（共 {len(structured_news)} 則新聞）"
             )
             
             # ============ 步驟 3: 生成 PDF 和 Excel 報告 ============
-            task_manager.set_progress(task_id, 65, "generating_report", "📄 正在生成 PDF 和 Excel 報告...")
+            self._set_progress(flight, 65, "generating_report", "📄 正在生成 PDF 和 Excel 報告...")
             
             # 生成 PDF
-            pdf_path = self.report_agent.generate_pdf(markdown_report)
+            pdf_path = await task_executor.run_in_stage(
+                "generating_report", self.report_agent.generate_pdf, markdown_report
+            )
             
             # 生成 Excel（使用相同的基礎文件名）
             excel_filename = pdf_path.stem + '.xlsx'
-            excel_path = self.report_agent.generate_excel(structured_news, excel_filename)
+            excel_path = await task_executor.run_in_stage(
+                "generating_report", self.report_agent.generate_excel, structured_news, excel_filename
+            )
             
-            task_manager.set_progress(
-                task_id, 80, "generating_report",
+            self._set_progress(
+                flight, 80, "generating_report",
                 f"✅ 報告生成完成: {pdf_path.name} 和 {excel_path.name}"
             )
             
             # ============ 步驟 4: 發送郵件 ============
+            # 報告已完成，之後的相同請求將重新執行流程
+            members = report_flights.close(flight)
+            if len(members) > 1:
+                print(f"🔗 任務 {task_id} 的報告將寄送給 {len(members)} 個合併任務")
+            
+            await asyncio.gather(*[
+                self._deliver_report(member_id, pdf_path, excel_path)
+                for member_id in members
+            ])
+            
+        except Exception as e:
+            error_msg = f"工作流程執行失敗: {str(e)}"
+            print(f"❌ {error_msg}")
+            print(traceback.format_exc())
+            
+            members = report_flights.close(flight) if flight else [task_id]
+            for member_id in members:
+                task_manager.set_failed(member_id, error_msg)
+    
+    async def _deliver_report(self, task_id: str, pdf_path: Path, excel_path: Path):
+        """寄送報告給單一任務的收件者並標記完成"""
+        try:
+            email = task_manager.get_task_details(task_id)["email"]
+            
             task_manager.set_progress(task_id, 85, "sending_email", "📧 正在發送郵件（含 PDF 和 Excel 附件）...")
             
-            email_success = self.email_agent.send_report(
+            email_success = await task_executor.run_in_stage(
+                "sending_email",
+                self.email_agent.send_report,
                 recipients=email,
                 pdf_path=pdf_path,
                 excel_path=excel_path
@@ -205,25 +308,49 @@ class NewsReportWorkflow:
             task_manager.set_progress(task_id, 95, "sending_email", "✅ 郵件發送完成（含 PDF 和 Excel）")
             
             # ============ 完成 ============
+            # 先更新完成訊息再標記成功，SSE 訂閱者收到成功狀態時即可看到最終訊息
+            task_manager.set_progress(
+                task_id, 100, "complete",
+                f"🎉 所有步驟完成！報告已發送至: {email}（PDF + Excel）"
+            )
+            
             task_manager.set_succeeded(
                 task_id,
                 pdf_path=str(pdf_path),
                 xlsx_path=str(excel_path)
             )
             
-            task_manager.set_progress(
-                task_id, 100, "complete",
-                f"🎉 所有步驟完成！報告已發送至: {email}（PDF + Excel）"
-            )
-            
             print(f"✅ 任務 {task_id} 執行成功")
             
         except Exception as e:
             error_msg = f"工作流程執行失敗: {str(e)}"
-            print(f"❌ {error_msg}")
-            print(traceback.format_exc())
-            
+            print(f"❌ 任務 {task_id} {error_msg}")
             task_manager.set_failed(task_id, error_msg)
+    
+    def _set_progress(self, flight: Flight, progress: int, step: str, message: str):
+        """更新流程中所有任務的進度"""
+        for task_id in flight.members():
+            task_manager.set_progress(task_id, progress, step, message)
+    
+    def _on_search_event(self, flight: Flight, event: str, data: Dict[str, Any]):
+        """轉發搜尋事件；需求解析完成及每解析出一則新聞時更新進度訊息"""
+        self._publish(flight, event, data)
+        if event == "request_parsed":
+            self._set_progress(
+                flight, 25, "searching",
+                f"✅ 需求解析完成（合併搜尋）：主題='{data['keywords']}', 時間='{data['time_instruction']}', "
+                f"數量='{data['num_instruction']}', 語言='{data['language']}'"
+            )
+        elif event == "item_parsed":
+            self._set_progress(
+                flight, min(39, 25 + data["count"]), "searching",
+                f"🔍 已找到 {data['count']} 則新聞，持續搜尋中..."
+            )
+    
+    def _publish(self, flight: Flight, event: str, data: Dict[str, Any]):
+        """推送搜尋事件給流程中所有任務的訂閱者"""
+        for task_id in flight.members():
+            event_broker.publish(task_id, event, data)
 
 
 # 全域工作流程實例
@@ -17,6 +17,13 @@ class Config:
     OPENAI_MODEL = "gpt-5-2025-08-07"
     OPENAI_API_BASE = "https://api.openai.com/v1"  # 確保端點一致
     
+    # OpenAI Connection Pool Configuration（所有 Agent 共用）
+    OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "true").lower() == "true"
+    OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+    OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+    OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "600"))
+    
     # Email Configuration
     SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
     SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
@@ -30,15 +37,98 @@ class Config:
     
     # Agno Configuration
     AGNO_TELEMETRY = os.getenv("AGNO_TELEMETRY", "false").lower() == "true"
-    
+
+    # PDF Rendering Configuration（ReportLab 渲染移到程序池，0 表示在呼叫端執行緒中渲染）
+    PDF_RENDER_PROCESSES = int(os.getenv("PDF_RENDER_PROCESSES", str(min(4, os.cpu_count() or 1))))
+    PDF_RENDER_TIMEOUT = float(os.getenv("PDF_RENDER_TIMEOUT", "120"))
+
+    # Task Execution Configuration
+    TASK_WORKERS = int(os.getenv("TASK_WORKERS", "4"))
+    TASK_QUEUE_SIZE = int(os.getenv("TASK_QUEUE_SIZE", "100"))
+    STAGE_POOL_SIZES = {
+        "parsing": int(os.getenv("PARSING_POOL_SIZE", "4")),
+        "searching": int(os.getenv("SEARCH_POOL_SIZE", "8")),
+        "analyzing": int(os.getenv("ANALYZE_POOL_SIZE", "8")),
+        # PDF 由程序池渲染，等待渲染結果的執行緒數至少與渲染程序數相同
+        "generating_report": int(os.getenv("REPORT_POOL_SIZE", str(max(2, PDF_RENDER_PROCESSES)))),
+        "sending_email": int(os.getenv("EMAIL_POOL_SIZE", "4")),
+    }
+    SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
     # Paths
     BASE_DIR = Path(__file__).parent
     REPORTS_DIR = BASE_DIR / "reports"
     TEMPLATES_DIR = BASE_DIR / "templates"
+    DATA_DIR = Path(os.getenv("DATA_DIR", str(BASE_DIR / "data")))
     
     # 確保目錄存在
     REPORTS_DIR.mkdir(exist_ok=True)
     TEMPLATES_DIR.mkdir(exist_ok=True)
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    
+    # PDF Font Configuration（PDF_FONT_PATH 指定中文字體；未指定時自動尋找，找到的路徑記錄在 FONT_CACHE_PATH）
+    PDF_FONT_PATH = os.getenv("PDF_FONT_PATH", "")
+    FONT_CACHE_PATH = Path(os.getenv("FONT_CACHE_PATH", str(DATA_DIR / "font_cache.json")))
+    
+    # Task Store Configuration
+    TASK_STORE = os.getenv("TASK_STORE", "sqlite")  # sqlite | memory
+    TASK_DB_PATH = Path(os.getenv("TASK_DB_PATH", str(DATA_DIR / "tasks.db")))
+    TASK_TTL_SECONDS = int(os.getenv("TASK_TTL_SECONDS", str(7 * 24 * 3600)))
+    TASK_CACHE_SIZE = int(os.getenv("TASK_CACHE_SIZE", "1024"))
+    TASK_EVICT_INTERVAL = int(os.getenv("TASK_EVICT_INTERVAL", "300"))
+    
+    # Cache Configuration
+    CACHE_DB_PATH = Path(os.getenv("CACHE_DB_PATH", str(DATA_DIR / "cache.db")))
+    SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+    SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "3600"))
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "500"))
+    ARTICLE_CACHE_ENABLED = os.getenv("ARTICLE_CACHE_ENABLED", "true").lower() == "true"
+    ARTICLE_CACHE_TTL = int(os.getenv("ARTICLE_CACHE_TTL", str(30 * 24 * 3600)))
+    ARTICLE_CACHE_MAX_ENTRIES = int(os.getenv("ARTICLE_CACHE_MAX_ENTRIES", "5000"))
+    
+    # Corpus Configuration（本地新聞語料庫；同一主題在新鮮期內再次查詢時直接由語料庫回答）
+    CORPUS_ENABLED = os.getenv("CORPUS_ENABLED", "true").lower() == "true"
+    CORPUS_DB_PATH = Path(os.getenv("CORPUS_DB_PATH", str(DATA_DIR / "corpus.db")))
+    CORPUS_FRESHNESS = int(os.getenv("CORPUS_FRESHNESS", str(6 * 3600)))
+    
+    # Prompt Parsing Configuration（規則解析與 LLM 解析結果的 LRU 快取大小）
+    PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "256"))
+    
+    # Search Fan-out Configuration
+    SEARCH_FANOUT = os.getenv("SEARCH_FANOUT", "false").lower() == "true"
+    SEARCH_FANOUT_CONCURRENCY = int(os.getenv("SEARCH_FANOUT_CONCURRENCY", "4"))
+    SEARCH_FANOUT_SHARD_SIZE = int(os.getenv("SEARCH_FANOUT_SHARD_SIZE", "4"))
+    
+    # Search Early Stop Configuration
+    SEARCH_EARLY_STOP = os.getenv("SEARCH_EARLY_STOP", "true").lower() == "true"
+    
+    # Search Log Configuration（串流中逐事件進度訊息的最短輸出間隔，秒；0 表示每則都輸出）
+    SEARCH_LOG_INTERVAL = float(os.getenv("SEARCH_LOG_INTERVAL", "1.0"))
+    
+    # Combined Search Configuration（需求解析與搜尋合併為一次模型呼叫）
+    SEARCH_COMBINED = os.getenv("SEARCH_COMBINED", "true").lower() == "true"
+    
+    # Source Verification Configuration（搜尋後比對可信來源網域；drop：移除非可信來源，flag：保留並標記，off：不檢查）
+    DOMAIN_POLICY = os.getenv("DOMAIN_POLICY", "drop").lower()
+    
+    # Dedupe Configuration（搜尋後以 MinHash/LSH 合併近似重複的新聞）
+    DEDUPE_ENABLED = os.getenv("DEDUPE_ENABLED", "true").lower() == "true"
+    DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.6"))
+    
+    # Ranking Configuration（分析前依新近程度、關鍵字、語言與來源多樣性排序，只保留數量上限與 token 預算內的新聞）
+    RANK_ENABLED = os.getenv("RANK_ENABLED", "true").lower() == "true"
+    RANK_TOKEN_BUDGET = int(os.getenv("RANK_TOKEN_BUDGET", "12000"))  # 0 表示不限制
+    RANK_MAX_ITEMS = int(os.getenv("RANK_MAX_ITEMS", "0"))  # 0 表示只依數量指令的上限
+    
+    # Analyst Configuration（single：單次呼叫分析全部新聞；map_reduce：逐則並行摘要後再彙總；auto：新聞數達門檻時用 map_reduce）
+    ANALYST_MODE = os.getenv("ANALYST_MODE", "auto").lower()
+    ANALYST_MAP_REDUCE_MIN_ITEMS = int(os.getenv("ANALYST_MAP_REDUCE_MIN_ITEMS", "8"))
+    ANALYST_MAP_CONCURRENCY = int(os.getenv("ANALYST_MAP_CONCURRENCY", "6"))
+    
+    # Model Backend Configuration（live / record / replay）
+    MODEL_BACKEND = os.getenv("MODEL_BACKEND", "live").lower()
+    CASSETTE_PATH = Path(os.getenv("CASSETTE_PATH", str(DATA_DIR / "cassettes" / "default.jsonl")))
+    REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", "1.0"))
     
     @classmethod
     def validate(cls):
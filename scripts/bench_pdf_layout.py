@@ -0,0 +1,141 @@
+"""
+PDF 版面配置基準測試
+以合成的分析結果（不呼叫 OpenAI）產生與 Analyst Agent 相同格式的 Markdown 報告，
+分別量測 Markdown 轉換為 flowables 與 ReportLab 版面配置（doc.build）的時間
+
+用法：
+    python scripts/bench_pdf_layout.py --items 200 --runs 5
+    # 同時量測舊做法（逐行 startswith 判斷 + 每個空行一個 Spacer）作為對照
+    python scripts/bench_pdf_layout.py --items 200 --baseline
+"""
+import argparse
+import io
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="PDF 版面配置基準測試")
+    parser.add_argument("--items", type=int, default=200, help="報告中的新聞數量")
+    parser.add_argument("--runs", type=int, default=5, help="量測次數")
+    parser.add_argument("--baseline", action="store_true", help="同時量測舊的逐行轉換做法")
+    return parser.parse_args()
+
+
+def build_markdown(items: int) -> str:
+    from agents.analyst_agent import AnalystAgent
+    from agents.schemas import AnalysisReport, NewsAnalysis
+
+    report = AnalysisReport(
+        summary="本週東南亞金融科技投資回溫，新加坡與越南的支付業者獲得多輪融資。\n各國監理機關同步推動開放銀行規範。",
+        items=[
+            NewsAnalysis(
+                title=f"新加坡金融科技融資第三季回升（第 {index} 則）",
+                source="Fintech Singapore",
+                url=f"https://fintechnews.sg/{index}/singapore-fintech-funding",
+                date="2025-10-20",
+                country="新加坡",
+                summary="新加坡金融科技公司第三季融資金額較上季成長，投資人重新關注支付與借貸領域，"
+                        "其中 **跨境支付** 與 *嵌入式金融* 業者最受青睞。" * 2,
+                key_points=["支付業者融資占比過半", "早期投資回溫", "監理沙盒持續擴大"]
+            )
+            for index in range(1, items + 1)
+        ],
+        insights=["區域支付互通將帶動跨境交易成長", "開放銀行規範提高資料共享效率", "早期投資回溫有利新創募資"]
+    )
+    return AnalystAgent._render_markdown(report, "金融科技")
+
+
+class BaselineConverter:
+    """舊做法：逐行 startswith 判斷，每行執行 regex 替換，每個空行建立一個 Spacer"""
+
+    def __init__(self, styles):
+        self.styles = styles
+
+    def convert(self, markdown_content: str) -> list:
+        from reportlab.lib.units import inch
+        from reportlab.platypus import Paragraph, Spacer
+
+        story = []
+        for line in markdown_content.split("\n"):
+            line = line.strip()
+            if not line:
+                story.append(Spacer(1, 0.2 * inch))
+            elif line.startswith("# "):
+                story += [Paragraph(line[2:], self.styles["CustomTitle"]), Spacer(1, 0.3 * inch)]
+            elif line.startswith("## "):
+                story += [Paragraph(line[3:], self.styles["CustomHeading2"]), Spacer(1, 0.2 * inch)]
+            elif line.startswith("### "):
+                story += [Paragraph(line[4:], self.styles["CustomHeading3"]), Spacer(1, 0.1 * inch)]
+            elif line.startswith(("- ", "* ")):
+                story.append(Paragraph(self.clean("• " + line[2:]), self.styles["CustomBody"]))
+            elif line.startswith(("---", "***")):
+                story += [Spacer(1, 0.2 * inch), Paragraph("_" * 80, self.styles["CustomBody"]), Spacer(1, 0.2 * inch)]
+            else:
+                story += [Paragraph(self.clean(line), self.styles["CustomBody"]), Spacer(1, 0.1 * inch)]
+        return story
+
+    @staticmethod
+    def clean(text: str) -> str:
+        text = re.sub(r"\*\*(.*?)\*\*", r"<b>\1</b>", text)
+        text = re.sub(r"__(.*?)__", r"<b>\1</b>", text)
+        text = re.sub(r"(?<!\*)\*(?!\*)([^*]+?)(?<!\*)\*(?!\*)", r"<i>\1</i>", text)
+        text = re.sub(r"(?<!_)_(?!_)([^_]+?)(?<!_)_(?!_)", r"<i>\1</i>", text)
+        return re.sub(r"\[(.*?)\]\((.*?)\)", r'\1 (<font color="blue">\2</font>)', text)
+
+
+def measure_once(converter, markdown_content: str) -> tuple:
+    """
+    Returns:
+        tuple: (轉換秒數, 版面配置秒數, flowable 數量, 頁數)
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+
+    began = time.perf_counter()
+    story = converter.convert(markdown_content)
+    converted = time.perf_counter()
+    flowables = len(story)
+    doc = SimpleDocTemplate(io.BytesIO(), pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+    doc.build(story)
+    return converted - began, time.perf_counter() - converted, flowables, doc.page
+
+
+def report(name: str, results: list):
+    convert_samples, build_samples, flowables, pages = zip(*results)
+    print(
+        f"{name:<10} 轉換 {min(convert_samples) * 1000:8.1f} ms  "
+        f"版面配置 {min(build_samples) * 1000:8.1f} ms  "
+        f"{flowables[0]} 個 flowables，{pages[0]} 頁"
+    )
+
+
+def main():
+    args = parse_args()
+
+    from agents.markdown_flowables import MarkdownFlowables
+    from agents.report_agent import ReportGeneratorAgent
+
+    agent = ReportGeneratorAgent(renderer=False)
+    markdown_content = build_markdown(args.items)
+    print(f"📦 {args.items} 則新聞，Markdown {len(markdown_content)} 字元，量測 {args.runs} 次取最小值")
+
+    converters = {"agent": MarkdownFlowables(agent.styles, agent.chinese_font)}
+    if args.baseline:
+        converters["baseline"] = BaselineConverter(agent.styles)
+
+    # 各做法交錯執行，避免機器負載的變化集中影響其中一種
+    results = {name: [] for name in converters}
+    for _ in range(args.runs):
+        for name, converter in converters.items():
+            results[name].append(measure_once(converter, markdown_content))
+    for name, samples in results.items():
+        report(name, samples)
+
+
+if __name__ == "__main__":
+    main()
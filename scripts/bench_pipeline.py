@@ -0,0 +1,110 @@
+"""
+報告流程基準測試
+以 cassette 重播 OpenAI 回應，離線量測搜尋後處理、分析後處理與報告生成等非 LLM 程式碼的延遲與吞吐量
+
+用法：
+    # 1. 連網錄製一次（需要 OPENAI_API_KEY）
+    python scripts/bench_pipeline.py --mode record --cassette data/cassettes/bench.jsonl
+
+    # 2. 離線重播（--speed 0 表示無延遲，1 為原始時間）
+    python scripts/bench_pipeline.py --mode replay --cassette data/cassettes/bench.jsonl --speed 0 --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="報告流程基準測試（record / replay）")
+    parser.add_argument("--mode", choices=["record", "replay"], default="replay", help="錄製或重播")
+    parser.add_argument("--cassette", default="data/cassettes/bench.jsonl", help="cassette 檔案路徑")
+    parser.add_argument("--speed", type=float, default=0.0, help="重播速度倍率（0 為無延遲）")
+    parser.add_argument("--runs", type=int, default=10, help="重播次數（錄製模式固定為 1）")
+    parser.add_argument("--query", default="金融科技", help="搜尋主題")
+    parser.add_argument("--time", default="最近 7 天內", help="時間範圍指令")
+    parser.add_argument("--num", default="5-10篇", help="數量指令")
+    parser.add_argument("--language", default="English", help="新聞語言")
+    parser.add_argument("--fan-out", action="store_true", help="使用分片並行搜尋")
+    return parser.parse_args()
+
+
+def summarize(name: str, samples: list) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return (
+        f"{name:<10} mean {statistics.mean(samples) * 1000:8.1f} ms  "
+        f"p50 {statistics.median(samples) * 1000:8.1f} ms  p95 {p95 * 1000:8.1f} ms"
+    )
+
+
+def main():
+    args = parse_args()
+
+    # 必須在載入 config 之前設定
+    os.environ["MODEL_BACKEND"] = args.mode
+    os.environ["CASSETTE_PATH"] = args.cassette
+    os.environ["REPLAY_SPEED"] = str(args.speed)
+    os.environ["SEARCH_CACHE_ENABLED"] = "false"
+    os.environ["ARTICLE_CACHE_ENABLED"] = "false"
+    os.environ["CORPUS_ENABLED"] = "false"
+
+    from agents import ResearchAgent, AnalystAgent, ReportGeneratorAgent
+
+    research_agent = ResearchAgent()
+    analyst_agent = AnalystAgent()
+    report_agent = ReportGeneratorAgent()
+    report_agent.reports_dir = Path(tempfile.mkdtemp(prefix="bench_reports_"))
+
+    runs = 1 if args.mode == "record" else args.runs
+    timings = {"search": [], "analyze": [], "pdf": [], "excel": [], "total": []}
+
+    for run in range(1, runs + 1):
+        started = time.perf_counter()
+
+        search_results = research_agent.search(
+            query=args.query,
+            time_instruction=args.time,
+            num_instruction=args.num,
+            language=args.language,
+            fan_out=args.fan_out
+        )
+        if search_results.get("status") != "success":
+            raise SystemExit(f"❌ 搜尋失敗: {search_results.get('error')}")
+        search_results = research_agent.refine(search_results, {
+            "keywords": args.query, "time_instruction": args.time,
+            "num_instruction": args.num, "language": args.language,
+        })
+        searched = time.perf_counter()
+
+        markdown_report, structured_news = analyst_agent.analyze(search_results)
+        analyzed = time.perf_counter()
+
+        pdf_path = report_agent.generate_pdf(markdown_report, filename=f"bench_{run}.pdf")
+        rendered = time.perf_counter()
+
+        report_agent.generate_excel(structured_news, filename=pdf_path.stem + ".xlsx")
+        finished = time.perf_counter()
+
+        timings["search"].append(searched - started)
+        timings["analyze"].append(analyzed - searched)
+        timings["pdf"].append(rendered - analyzed)
+        timings["excel"].append(finished - rendered)
+        timings["total"].append(finished - started)
+
+    total_time = sum(timings["total"])
+    print("\n" + "=" * 72)
+    print(f"📊 {args.mode} x {runs}（speed={args.speed}, cassette={args.cassette}）")
+    for name, samples in timings.items():
+        print(summarize(name, samples))
+    print(f"吞吐量     {runs / total_time:8.2f} 份報告/秒")
+    print("=" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Research Agent 串流處理基準測試
+以合成的 Responses API 串流事件（不呼叫 OpenAI）量測每個事件的處理成本，
+確認文字累積與 content_part.done 的完整性檢查不會隨已收到的文字長度增加而變慢
+
+用法：
+    python scripts/bench_research_stream.py --deltas 200000 --chunk 4
+    # 同時量測舊做法（字串串接 + 子字串搜尋）作為對照
+    python scripts/bench_research_stream.py --deltas 200000 --baseline
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Research Agent 串流處理基準測試")
+    parser.add_argument("--deltas", type=int, default=200000, help="文字片段（delta 事件）數量")
+    parser.add_argument("--chunk", type=int, default=4, help="每個片段的字元數")
+    parser.add_argument("--buckets", type=int, default=10, help="分段統計的段數")
+    parser.add_argument("--baseline", action="store_true", help="同時量測舊的字串串接做法")
+    return parser.parse_args()
+
+
+def build_events(deltas: int, chunk: int) -> list:
+    """產生足夠長的搜尋結果 JSON，切成指定數量的 delta 事件，最後附上 content_part.done"""
+    item = {"title": "Singapore fintech funding rebounds in the third quarter", "source": "Fintech Singapore",
+            "url": "https://fintechnews.sg/{index}", "date": "2025-10-20",
+            "summary": "Funding for Singapore fintech firms rose as investors returned to payments and lending."}
+    template = json.dumps(item, ensure_ascii=False)
+    items, length, index = [], 0, 0
+    while length < deltas * chunk:
+        text = template.replace("{index}", str(index))
+        items.append(text)
+        length += len(text) + 2
+        index += 1
+    text = '```json\n{"search_query": "bench", "results": [' + ", ".join(items) + "]}\n```"
+    text = text[:deltas * chunk]
+
+    events = [SimpleNamespace(type="response.output_text.delta", delta=text[start:start + chunk])
+              for start in range(0, len(text), chunk)]
+    events.append(SimpleNamespace(type="response.content_part.done", part=SimpleNamespace(text=text, annotations=[])))
+    return events
+
+
+def run_agent(events: list, buckets: int) -> tuple:
+    from agents.research_agent import ResearchAgent, _StreamState
+
+    agent = ResearchAgent(cache=False, corpus=False)
+    state = _StreamState()
+    return timed(events, buckets, lambda event: agent._handle_event(event, state, None))
+
+
+def run_baseline(events: list, buckets: int) -> tuple:
+    """舊做法：content += delta，content_part.done 時以子字串搜尋檢查是否已收過"""
+    state = SimpleNamespace(content="")
+
+    def handle(event):
+        if event.type == "response.output_text.delta":
+            state.content += event.delta
+        elif event.part.text not in state.content:
+            state.content += event.part.text
+
+    return timed(events, buckets, handle)
+
+
+def timed(events: list, buckets: int, handle) -> tuple:
+    """
+    依事件順序分段量測
+
+    Returns:
+        tuple: (各段 delta 事件的平均微秒數, 最後 content_part.done 事件的微秒數)
+    """
+    deltas = events[:-1]
+    size = max(1, len(deltas) // buckets)
+    samples = []
+    for start in range(0, len(deltas), size):
+        chunk = deltas[start:start + size]
+        began = time.perf_counter()
+        for event in chunk:
+            handle(event)
+        samples.append((time.perf_counter() - began) / len(chunk) * 1e6)
+
+    began = time.perf_counter()
+    handle(events[-1])
+    return samples, (time.perf_counter() - began) * 1e6
+
+
+def report(name: str, result: tuple):
+    samples, done = result
+    print(f"{name:<10} " + " ".join(f"{sample:7.2f}" for sample in samples) + " µs/event")
+    print(f"{'':<10} 最後一段 / 第一段 = {samples[-1] / samples[0]:.2f}x，content_part.done {done:.1f} µs")
+
+
+def main():
+    args = parse_args()
+
+    # 必須在載入 config 之前設定
+    os.environ["SEARCH_CACHE_ENABLED"] = "false"
+    os.environ["CORPUS_ENABLED"] = "false"
+    os.environ["SEARCH_LOG_INTERVAL"] = "1.0"
+
+    events = build_events(args.deltas, args.chunk)
+    print(f"📦 {len(events) - 1} 個 delta 事件，共 {args.deltas * args.chunk} 字元，分 {args.buckets} 段統計")
+
+    report("agent", run_agent(events, args.buckets))
+    if args.baseline:
+        report("baseline", run_baseline(events, args.buckets))
+
+
+if __name__ == "__main__":
+    main()
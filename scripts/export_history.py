@@ -0,0 +1,57 @@
+"""
+匯出歷史新聞
+將本地新聞語料庫中的新聞逐批讀出並串流寫入 Excel（不一次載入全部新聞，十萬筆以上也只使用固定的記憶體）
+
+用法：
+    python scripts/export_history.py --since 2025-01-01
+    python scripts/export_history.py --country 越南 --output 越南新聞.xlsx
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="匯出語料庫中的歷史新聞為 Excel")
+    parser.add_argument("--db", default=None, help="語料庫路徑（預設為 CORPUS_DB_PATH）")
+    parser.add_argument("--since", default=None, help="只匯出此日期（YYYY-MM-DD）之後的新聞")
+    parser.add_argument("--country", default=None, help="限定國家")
+    parser.add_argument("--output", default=None, help="輸出檔名（寫入 REPORTS_DIR）")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批讀取的新聞數")
+    return parser.parse_args()
+
+
+def to_rows(items: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, str]]:
+    """語料庫中的新聞項目轉為 Excel 資料列（與 Analyst Agent 輸出的欄位相同）"""
+    for item in items:
+        yield {
+            '新聞標題（中文）': item.get("title", ""),
+            '來源國家': item.get("country", ""),
+            '來源網站連結': item.get("url", ""),
+            '發布日期': item.get("date", ""),
+            '摘要': item.get("summary", ""),
+            '重點分析': "\n".join(f"{n}) {point}" for n, point in enumerate(item.get("key_points") or [], 1)),
+        }
+
+
+def main():
+    args = parse_args()
+
+    from agents.report_agent import ReportGeneratorAgent
+    from config import Config
+    from utils.corpus import ArticleCorpus
+
+    corpus = ArticleCorpus(args.db or Config.CORPUS_DB_PATH)
+    try:
+        print(f"📚 語料庫共 {len(corpus)} 則新聞")
+        items = corpus.iter_articles(since=args.since, country=args.country, batch_size=args.batch_size)
+        ReportGeneratorAgent(renderer=False).generate_excel(to_rows(items), args.output)
+    finally:
+        corpus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,23 @@
 """
 測試 Agents 功能
 """
+import asyncio
+import json
+import os
 import pytest
 import sys
 from pathlib import Path
+from datetime import datetime
+from types import SimpleNamespace
 
 # 添加專案根目錄到路徑
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from agents import ResearchAgent, AnalystAgent, ReportGeneratorAgent, EmailAgent
+from agents import clients
+from agents.backends import Cassette, CassetteMissError, RecordingBackend, ReplayBackend, cassette_key
 from config import Config
+from utils.news_items import extract_news_items
 
 
 class TestResearchAgent:
@@ -31,6 +39,373 @@ class TestResearchAgent:
         assert "status" in result
         assert "query" in result
 
+    def test_fan_out_search_merges_shards(self, monkeypatch):
+        """測試分片搜尋並行執行並合併去重"""
+        import agents.research_agent as research_module
+
+        monkeypatch.setattr(Config, "OPENAI_API_KEY", "sk-test")
+        monkeypatch.setattr(Config, "SEARCH_FANOUT_CONCURRENCY", 3)
+        state = {"running": 0, "peak": 0}
+
+        def shard_events(prompt):
+            domain = prompt.split("來源：")[1].split(",")[0].strip()
+            results = [
+                {"title": f"{domain} news", "url": f"https://{domain}/news"},
+                {"title": "Shared wire story", "url": "https://dealstreetasia.com/shared?utm_source=x"},
+            ]
+            text = "```json\n" + json.dumps({"results": results}) + "\n```"
+            part = SimpleNamespace(text=text, annotations=[])
+            return [SimpleNamespace(type="response.content_part.done", part=part)]
+
+        class FakeStream:
+            def __init__(self, events):
+                self.events = events
+
+            def __aiter__(self):
+                return self._iterate()
+
+            async def _iterate(self):
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+                await asyncio.sleep(0.01)
+                for event in self.events:
+                    yield event
+                state["running"] -= 1
+
+        class FakeAsyncOpenAI:
+            def __init__(self):
+                self.responses = SimpleNamespace(create=self.create)
+
+            async def create(self, input, **kwargs):
+                return FakeStream(shard_events(input))
+
+        monkeypatch.setattr(research_module, "get_async_openai_client", FakeAsyncOpenAI)
+
+        agent = ResearchAgent(cache=False, corpus=False)
+        events = []
+        result = agent.search("金融科技", num_instruction="20篇", fan_out=True,
+                              on_event=lambda event, data: events.append(event))
+
+        shards = agent._build_shards()
+        titles = [item["title"] for item in extract_news_items(result["content"])]
+
+        assert result["status"] == "success"
+        assert result["shards"] == len(shards)
+        assert state["peak"] == 3
+        assert titles.count("Shared wire story") == 1
+        assert len(titles) == len(shards) + 1
+        assert events.count("shard_completed") == len(shards)
+
+    def test_search_parses_items_while_streaming(self, monkeypatch):
+        """測試串流尚未結束時就逐則解析出新聞"""
+        monkeypatch.setattr(Config, "OPENAI_API_KEY", "sk-test")
+        items = [{"title": f"News {i}", "url": f"https://cafef.vn/{i}"} for i in range(3)]
+        text = "```json\n" + json.dumps({"results": items}) + "\n```"
+        deltas = [text[i:i + 16] for i in range(0, len(text), 16)]
+        timeline = []
+
+        def stream():
+            for index, delta in enumerate(deltas):
+                timeline.append(("delta", index))
+                yield SimpleNamespace(type="response.output_text.delta", delta=delta)
+
+        agent = ResearchAgent(cache=False, corpus=False)
+        monkeypatch.setattr(agent, "client", SimpleNamespace(
+            responses=SimpleNamespace(create=lambda **kwargs: stream())
+        ))
+
+        result = agent.search("金融科技", fan_out=False, on_event=lambda event, data: timeline.append((event, data)))
+
+        parsed = [(index, data) for index, (event, data) in enumerate(timeline) if event == "item_parsed"]
+        assert result["items"] == items
+        assert result["content"] == text
+        assert [data["count"] for _, data in parsed] == [1, 2, 3]
+        # 第一則新聞在最後一個片段到達之前就已送出
+        assert parsed[0][0] < timeline.index(("delta", len(deltas) - 1))
+
+    def test_content_part_done_appends_only_missing_text(self):
+        """測試 content_part.done 只補上 delta 尚未收到的文字，不重複累積"""
+        from agents.research_agent import _StreamState
+
+        agent = ResearchAgent(cache=False, corpus=False)
+        state = _StreamState()
+        first = "```json\n" + json.dumps({"results": [{"title": "News", "url": "https://cafef.vn/1"}]}) + "\n```"
+
+        for index in range(0, 20, 5):
+            agent._handle_event(SimpleNamespace(type="response.output_text.delta", delta=first[index:index + 5]), state, None)
+        agent._handle_event(SimpleNamespace(type="response.content_part.done",
+                                            part=SimpleNamespace(text=first, annotations=[])), state, None)
+        # 沒有 delta 的內容片段以完整文字加入
+        agent._handle_event(SimpleNamespace(type="response.content_part.done",
+                                            part=SimpleNamespace(text="\n補充說明", annotations=[])), state, None)
+
+        assert state.content == first + "\n補充說明"
+        assert state.length == len(state.content)
+        assert [item["title"] for item in state.items] == ["News"]
+
+    def test_search_stops_once_target_reached(self, monkeypatch):
+        """測試取得足夠的有效新聞後即關閉串流，並以有效新聞重組結果"""
+        monkeypatch.setattr(Config, "OPENAI_API_KEY", "sk-test")
+        monkeypatch.setattr(Config, "SEARCH_EARLY_STOP", True)
+        today = datetime.now().strftime("%Y-%m-%d")
+        items = [
+            {"title": "Valid 1", "url": "https://e.vnexpress.net/1", "date": today},
+            {"title": "Untrusted", "url": "https://example.com/2", "date": today},
+            {"title": "Too old", "url": "https://cafef.vn/3", "date": "2020-01-01"},
+            {"title": "Valid 2", "url": "https://cafef.vn/4", "date": today},
+            {"title": "Never read", "url": "https://cafef.vn/5", "date": today},
+        ]
+        text = "```json\n" + json.dumps({"results": items}) + "\n```"
+        consumed = []
+
+        class FakeStream:
+            closed = False
+
+            def __iter__(self):
+                yield SimpleNamespace(type="response.output_text.annotation.added", annotation={
+                    "type": "url_citation", "title": "Valid 1 (VnExpress)", "url": "https://e.vnexpress.net/1",
+                })
+                for index in range(0, len(text), 8):
+                    consumed.append(index)
+                    yield SimpleNamespace(type="response.output_text.delta", delta=text[index:index + 8])
+
+            def close(self):
+                FakeStream.closed = True
+
+        agent = ResearchAgent(cache=False, corpus=False)
+        monkeypatch.setattr(agent, "client", SimpleNamespace(
+            responses=SimpleNamespace(create=lambda **kwargs: FakeStream())
+        ))
+        events = []
+
+        result = agent.search("金融科技", time_instruction="最近 7 天內", num_instruction="2篇",
+                              fan_out=False, on_event=lambda event, data: events.append(event))
+
+        assert FakeStream.closed
+        assert len(consumed) < len(range(0, len(text), 8))
+        assert result["stopped_early"] is True
+        assert [item["title"] for item in result["items"]] == ["Valid 1", "Valid 2"]
+        assert extract_news_items(result["content"]) == result["items"]
+        # 串流在 content_part.done 之前關閉：逐一收到的引用保留，其餘以新聞網址補上
+        assert [(source["title"], source["url"]) for source in result["sources"]] == [
+            ("Valid 1 (VnExpress)", "https://e.vnexpress.net/1"),
+            ("Valid 2", "https://cafef.vn/4"),
+        ]
+        assert "search_target_reached" in events and "citation_found" in events
+
+    def test_search_answered_from_corpus(self, monkeypatch):
+        """測試同一主題在新鮮期內以較窄的時間範圍再次查詢時，由語料庫回答而不進行網路搜尋"""
+        from utils.corpus import ArticleCorpus
+
+        monkeypatch.setattr(Config, "OPENAI_API_KEY", "sk-test")
+        today = datetime.now().strftime("%Y-%m-%d")
+        items = [{"title": f"News {i}", "url": f"https://e.vnexpress.net/{i}", "date": today} for i in range(6)]
+        text = "```json\n" + json.dumps({"results": items}) + "\n```"
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs)
+            return iter([SimpleNamespace(type="response.output_text.delta", delta=text)])
+
+        agent = ResearchAgent(cache=False, corpus=ArticleCorpus(":memory:"))
+        monkeypatch.setattr(agent, "client", SimpleNamespace(responses=SimpleNamespace(create=create)))
+        events = []
+
+        agent.search("越南電子支付", "最近 7 天內", "5-10篇", fan_out=False)
+        result = agent.search("越南電子支付", "最近 3 天內", "5篇", fan_out=False,
+                              on_event=lambda event, data: events.append(event))
+
+        assert len(calls) == 1
+        assert result["corpus"] is True
+        assert result["web_search_count"] == 0
+        assert [item["title"] for item in result["items"]] == [f"News {i}" for i in range(5)]
+        assert result["items"][0]["country"] == "Vietnam"
+        assert extract_news_items(result["content"]) == result["items"]
+        assert events == ["search_corpus_hit"]
+        # 數量下限超過語料庫內的新聞時仍需網路搜尋
+        agent.search("越南電子支付", "最近 3 天內", "8-10篇", fan_out=False)
+        assert len(calls) == 2
+
+    def test_cache_and_corpus_can_be_disabled(self, monkeypatch):
+        """測試傳入 False 時，即使 Config 啟用也不建立快取與語料庫"""
+        monkeypatch.setattr(Config, "SEARCH_CACHE_ENABLED", True)
+        monkeypatch.setattr(Config, "CORPUS_ENABLED", True)
+
+        agent = ResearchAgent(cache=False, corpus=False)
+
+        assert agent.cache is None
+        assert agent.corpus is None
+
+    def test_refine_merges_near_duplicates(self, monkeypatch):
+        """測試搜尋後處理合併近似重複的新聞並重組搜尋結果文字"""
+        monkeypatch.setattr(Config, "DEDUPE_ENABLED", True)
+        items = [
+            {"title": "Vietnam central bank cuts policy rate by 50 basis points", "url": "https://cafef.vn/1"},
+            {"title": "Vietnam's central bank cuts policy rate by 50 basis points", "url": "https://vietnambiz.vn/2"},
+            {"title": "Thai baht weakens", "url": "https://bangkokpost.com/3"},
+        ]
+        results = {"status": "success", "query": "央行", "content": "", "items": items}
+        agent = ResearchAgent(cache=False)
+
+        refined = agent.refine(results)
+
+        assert refined["duplicates_merged"] == 1
+        assert [item["url"] for item in refined["items"]] == ["https://cafef.vn/1", "https://bangkokpost.com/3"]
+        assert extract_news_items(refined["content"]) == refined["items"]
+        assert results["items"] is items and len(items) == 3
+
+    @pytest.mark.parametrize("policy, expected", [
+        ("drop", ["https://e.vnexpress.net/1?id=7"]),
+        ("flag", ["https://e.vnexpress.net/1?id=7", "https://example.com/2"]),
+    ])
+    def test_refine_verifies_sources(self, monkeypatch, policy, expected):
+        """測試搜尋後處理保留原始網址、另存正規化網址、附上來源資訊，並移除或標記非可信來源"""
+        monkeypatch.setattr(Config, "DOMAIN_POLICY", policy)
+        items = [
+            {"title": "Vietnam exports rise", "source": "VnExpress International",
+             "url": "https://www.e.vnexpress.net/1/?utm_source=x&id=7"},
+            {"title": "Unrelated blog post", "source": "Blog", "url": "https://example.com/2"},
+        ]
+        results = {"status": "success", "query": "越南出口", "content": "", "items": items}
+
+        refined = ResearchAgent(cache=False).refine(results)
+
+        assert [item["canonical_url"] for item in refined["items"]] == expected
+        assert [item["url"] for item in refined["items"]] == [item["url"] for item in items[:len(expected)]]
+        assert refined["items"][0]["source"] == "VNExpress"
+        assert refined["items"][0]["region"] == "Vietnam"
+        assert refined.get("untrusted_dropped") == (1 if policy == "drop" else None)
+        if policy == "flag":
+            assert refined["items"][1]["trusted"] is False
+
+    def test_refine_ranks_to_requested_count(self, monkeypatch):
+        """測試搜尋後處理依搜尋條件排序，只保留數量指令上限內的新聞"""
+        monkeypatch.setattr(Config, "RANK_ENABLED", True)
+        today = datetime.now().strftime("%Y-%m-%d")
+        items = [
+            {"title": "Old Vietnam payments story", "url": "https://cafef.vn/1", "date": "2020-01-01"},
+            {"title": "Vietnam payments grow", "url": "https://vnexpress.net/2", "date": today},
+            {"title": "Thai baht weakens", "url": "https://bangkokpost.com/3", "date": today},
+        ]
+        results = {"status": "success", "query": "Vietnam payments", "content": "", "items": items}
+        criteria = {"keywords": "Vietnam payments", "time_instruction": "最近 7 天內",
+                    "num_instruction": "1-2篇", "language": "English"}
+
+        refined = ResearchAgent(cache=False).refine(results, criteria)
+
+        assert [item["url"] for item in refined["items"]] == ["https://vnexpress.net/2", "https://bangkokpost.com/3"]
+        assert refined["ranked_out"] == 1
+        assert extract_news_items(refined["content"]) == refined["items"]
+
+    def test_combined_search_returns_parsed_request(self, monkeypatch, tmp_path):
+        """測試合併搜尋在同一串流中取得解析結果，並以兩組鍵值寫入快取"""
+        from utils.cache import PersistentTTLCache
+
+        monkeypatch.setattr(Config, "OPENAI_API_KEY", "sk-test")
+        parsed = {"keywords": "越南電子支付", "time_instruction": "最近 3 天內", "num_instruction": "10篇",
+                  "language": "Chinese"}
+        items = [{"title": f"News {i}", "url": f"https://cafef.vn/{i}"} for i in range(2)]
+        text = "```json\n" + json.dumps({"parsed": parsed, "results": items}, ensure_ascii=False) + "\n```"
+        prompts = []
+
+        def create(input, **kwargs):
+            prompts.append(input)
+            for index in range(0, len(text), 16):
+                yield SimpleNamespace(type="response.output_text.delta", delta=text[index:index + 16])
+
+        cache = PersistentTTLCache(tmp_path / "cache.db", "search", ttl_seconds=60)
+        agent = ResearchAgent(cache=cache, corpus=False)
+        monkeypatch.setattr(agent, "client", SimpleNamespace(responses=SimpleNamespace(create=create)))
+        events = []
+
+        result = agent.search_combined("幫我找越南電子支付的新聞", explicit={"language": "Vietnamese"},
+                                       on_event=lambda event, data: events.append((event, data)))
+
+        names = [event for event, _ in events]
+        assert result["status"] == "success"
+        assert result["combined"] is True
+        assert result["parsed"] == {**parsed, "language": "Vietnamese"}
+        assert result["items"] == items
+        assert "Vietnamese" in prompts[0]
+        assert names.index("request_parsed") < names.index("item_parsed")
+        # 解析後的搜尋參數也能命中快取
+        assert agent.search("越南電子支付", "最近 3 天內", "10篇", "Vietnamese")["cached"] is True
+        assert agent.search_combined("幫我找越南電子支付的新聞", explicit={"language": "Vietnamese"})["cached"] is True
+        assert len(prompts) == 1
+
+
+class TestModelBackends:
+    """測試錄製/重播模型後端"""
+
+    def test_record_then_replay_search(self, monkeypatch, tmp_path):
+        """測試錄製的串流可在沒有 API Key 的情況下重播出相同結果"""
+        cassette_path = tmp_path / "search.jsonl"
+        items = [{"title": "Recorded", "url": "https://cafef.vn/1"}]
+        text = "```json\n" + json.dumps({"results": items}) + "\n```"
+
+        monkeypatch.setattr(Config, "OPENAI_API_KEY", "sk-test")
+        recorder = ResearchAgent(cache=False, corpus=False, backend=RecordingBackend(Cassette(cassette_path)))
+        monkeypatch.setattr(recorder, "client", SimpleNamespace(responses=SimpleNamespace(
+            create=lambda **kwargs: iter([SimpleNamespace(type="response.output_text.delta", delta=text)])
+        )))
+        recorded = recorder.search("金融科技", fan_out=False)
+
+        monkeypatch.setattr(Config, "OPENAI_API_KEY", None)
+        player = ResearchAgent(cache=False, corpus=False, backend=ReplayBackend(Cassette(cassette_path), speed=0))
+        replayed = player.search("金融科技", fan_out=False)
+
+        assert replayed["status"] == "success"
+        assert replayed["items"] == recorded["items"] == items
+        assert replayed["content"] == recorded["content"]
+        assert player._client is None
+
+    def test_replay_run_and_miss(self, tmp_path):
+        """測試 Agent.run 的錄製與重播，以及缺少紀錄時的錯誤"""
+        cassette = Cassette(tmp_path / "runs.jsonl")
+        key = cassette_key("agent", "分析師", "測試")
+        RecordingBackend(cassette).run(key, lambda: SimpleNamespace(content="# 報告"))
+
+        backend = ReplayBackend(Cassette(tmp_path / "runs.jsonl"), speed=0)
+
+        assert backend.run(key, lambda: pytest.fail("重播時不應呼叫模型")).content == "# 報告"
+        with pytest.raises(CassetteMissError):
+            backend.run(cassette_key("agent", "分析師", "其他"), lambda: None)
+
+
+class TestSharedClients:
+    """測試共用 OpenAI 客戶端"""
+
+    def test_clients_are_shared(self, monkeypatch):
+        """測試所有呼叫取得同一個連線池，背景 loop 在多次呼叫間保持不變"""
+        monkeypatch.setattr(Config, "OPENAI_API_KEY", "sk-test")
+        clients.close_clients()
+        try:
+            assert clients.get_openai_client() is clients.get_openai_client()
+            assert clients.get_openai_client()._client is clients.get_http_client()
+            assert ResearchAgent(cache=False).client is clients.get_openai_client()
+
+            async def current_loop():
+                return asyncio.get_running_loop(), clients.get_async_openai_client()
+
+            first_loop, first_client = clients.run_async(current_loop())
+            second_loop, second_client = clients.run_async(current_loop())
+            assert first_loop is second_loop
+            assert first_client is second_client
+        finally:
+            clients.close_clients()
+
+
+    def test_http2_fallback_warns_once(self, monkeypatch, caplog):
+        """測試未安裝 h2 時退回 HTTP/1.1，且只記錄一次警告"""
+        monkeypatch.setattr(Config, "OPENAI_HTTP2", True)
+        monkeypatch.setitem(sys.modules, "h2", None)
+        monkeypatch.setattr(clients, "_http2_fallback_logged", False)
+
+        with caplog.at_level("WARNING", logger=clients.__name__):
+            assert clients._http2_enabled() is False
+            assert clients._http2_enabled() is False
+
+        assert len([record for record in caplog.records if record.levelname == "WARNING"]) == 1
 
 class TestAnalystAgent:
     """測試 Analyst Agent"""
@@ -57,6 +432,140 @@ class TestAnalystAgent:
         assert isinstance(report, str)
         assert len(report) > 0
 
+    def test_structured_output_renders_report(self):
+        """測試 JSON 分析結果經驗證後於本地產生 Markdown 與 Excel 資料列"""
+        analysis = {
+            "summary": "越南電子支付持續成長。",
+            "items": [{
+                "title": "越南央行推動無現金支付",
+                "source": "VnExpress",
+                "url": "https://e.vnexpress.net/1",
+                "date": "2025-10-20",
+                "country": "越南",
+                "summary": "越南央行公布新措施。",
+                "key_points": ["交易量成長", "監管趨嚴"],
+            }],
+            "insights": ["電子錢包競爭加劇"],
+        }
+        content = "```json\n" + json.dumps(analysis, ensure_ascii=False) + "\n```"
+        agent = AnalystAgent(backend=SimpleNamespace(run=lambda key, run: SimpleNamespace(content=content)))
+
+        markdown_report, rows = agent.analyze({"query": "越南電子支付", "content": "搜尋結果"})
+
+        assert "### 1. 越南央行推動無現金支付" in markdown_report
+        assert "- **來源**：[VnExpress](https://e.vnexpress.net/1)" in markdown_report
+        assert "1. 電子錢包競爭加劇" in markdown_report
+        assert rows == [{
+            "新聞標題（中文）": "越南央行推動無現金支付",
+            "來源國家": "越南",
+            "關鍵字": "越南電子支付",
+            "來源網站連結": "https://e.vnexpress.net/1",
+            "發布日期": "2025-10-20",
+            "摘要": "越南央行公布新措施。",
+            "重點分析": "1) 交易量成長\n2) 監管趨嚴",
+            "來源": "VnExpress",
+        }]
+        # 本地輸出的 Markdown 與舊的解析方式一致
+        assert agent._extract_from_markdown(markdown_report, "越南電子支付")[0]["摘要"] == "越南央行公布新措施。"
+
+    def test_markdown_response_falls_back_to_regex(self):
+        """測試模型未回傳 JSON 時仍可從 Markdown 提取新聞"""
+        markdown_report = (
+            "## 新聞詳情\n\n### 1. 新加坡金融科技\n"
+            "- **來源**：[Business Times](https://businesstimes.com.sg/a)\n"
+            "- **日期**：2025-10-20\n- **摘要**：摘要內容\n- **重點分析**：1) 重點\n"
+        )
+        agent = AnalystAgent(backend=SimpleNamespace(run=lambda key, run: SimpleNamespace(content=markdown_report)))
+
+        report, rows = agent.analyze({"query": "金融科技", "content": ""})
+
+        assert report == markdown_report
+        assert rows[0]["來源網站連結"] == "https://businesstimes.com.sg/a"
+        assert rows[0]["發布日期"] == "2025-10-20"
+        assert rows[0]["來源國家"] == "新加坡"
+
+    def test_map_reduce_analyzes_items_in_parallel(self, monkeypatch):
+        """測試 map-reduce 模式逐則並行摘要，並以一次 reduce 呼叫撰寫摘要與洞察"""
+        import threading
+        import time as time_module
+        from agents.backends import LiveBackend
+
+        monkeypatch.setattr(Config, "ANALYST_MAP_CONCURRENCY", 4)
+        items = [{"title": f"News {i}", "url": f"https://cafef.vn/{i}", "source": "CafeF", "date": "2025-10-20"}
+                 for i in range(8)]
+        state = {"running": 0, "peak": 0, "reduce_prompts": []}
+        lock = threading.Lock()
+
+        def fake_agent(name, description, instructions, output_schema):
+            def run(prompt):
+                if output_schema.__name__ == "ReportOverview":
+                    state["reduce_prompts"].append(prompt)
+                    return SimpleNamespace(content={"summary": "彙總", "insights": ["洞察"]})
+                if "News 3" in prompt:
+                    raise RuntimeError("rate limited")
+                with lock:
+                    state["running"] += 1
+                    state["peak"] = max(state["peak"], state["running"])
+                time_module.sleep(0.02)
+                with lock:
+                    state["running"] -= 1
+                item = json.loads(prompt.split("新聞：")[1].split("輸出要求")[0])
+                return SimpleNamespace(content={
+                    **item, "title": "譯 " + item["title"], "url": "https://rewritten.example/",
+                    "country": "越南", "summary": "摘要", "key_points": ["重點"],
+                })
+            return SimpleNamespace(name=name, run=run)
+
+        monkeypatch.setattr(AnalystAgent, "_create_agent", staticmethod(fake_agent))
+        agent = AnalystAgent(backend=LiveBackend(), cache=False)
+
+        markdown_report, rows = agent.analyze({"query": "越南", "content": "", "items": items}, mode="map_reduce")
+
+        assert state["peak"] == 4
+        assert len(state["reduce_prompts"]) == 1
+        assert [row["來源網站連結"] for row in rows] == [item["url"] for item in items]
+        assert rows[0]["新聞標題（中文）"] == "譯 News 0"
+        # 單則失敗時保留原始內容
+        assert rows[3]["新聞標題（中文）"] == "News 3"
+        assert "## 報告摘要\n彙總" in markdown_report
+        assert "1. 洞察" in markdown_report
+
+    def test_article_cache_skips_analyzed_items(self, monkeypatch, tmp_path):
+        """測試已分析過的新聞（相同網址與內容）不再送交模型"""
+        from agents.backends import LiveBackend
+        from utils.cache import PersistentTTLCache
+
+        analyzed = []
+
+        def fake_agent(name, description, instructions, output_schema):
+            def run(prompt):
+                if output_schema.__name__ == "ReportOverview":
+                    return SimpleNamespace(content={"summary": "彙總", "insights": []})
+                item = json.loads(prompt.split("新聞：")[1].split("輸出要求")[0])
+                analyzed.append(item["url"])
+                return SimpleNamespace(content={**item, "title": "譯 " + item["title"], "source": "Bangkok Post",
+                                                "date": "2025-10-20", "country": "泰國", "summary": "摘要",
+                                                "key_points": ["重點"]})
+            return SimpleNamespace(name=name, run=run)
+
+        monkeypatch.setattr(AnalystAgent, "_create_agent", staticmethod(fake_agent))
+        cache = PersistentTTLCache(tmp_path / "cache.db", "articles", ttl_seconds=60)
+        agent = AnalystAgent(backend=LiveBackend(), cache=cache)
+
+        first = [{"title": "A", "url": "https://www.bangkokpost.com/a?utm_source=x", "summary": "s"},
+                 {"title": "B", "url": "https://www.bangkokpost.com/b", "summary": "s"}]
+        agent.analyze({"query": "泰國", "content": "", "items": first}, mode="map_reduce")
+
+        # 同一篇新聞（追蹤參數不同）命中快取；內容改變的新聞重新分析
+        second = [{"title": "A", "url": "https://bangkokpost.com/a", "summary": "s"},
+                  {"title": "B", "url": "https://www.bangkokpost.com/b", "summary": "updated"}]
+        _, rows = agent.analyze({"query": "泰國", "content": "", "items": second}, mode="single")
+
+        assert sorted(analyzed[:2]) == [first[0]["url"], first[1]["url"]]
+        assert analyzed[2:] == [second[1]["url"]]
+        assert [row["新聞標題（中文）"] for row in rows] == ["譯 A", "譯 B"]
+        assert rows[0]["來源網站連結"] == first[0]["url"]
+
 
 class TestReportGeneratorAgent:
     """測試 Report Generator Agent"""
@@ -85,6 +594,113 @@ class TestReportGeneratorAgent:
         
         # 清理測試文件
         pdf_path.unlink()
+    
+    def test_font_discovery_is_cached_on_disk(self, monkeypatch, tmp_path):
+        """測試字體只在第一次尋找時逐一嘗試，之後直接載入快取的路徑並略過無法載入的字體"""
+        from agents import fonts
+        
+        bad, good = tmp_path / "bad.ttc", tmp_path / "good.ttf"
+        bad.write_bytes(b"bad")
+        good.write_bytes(b"good")
+        loaded = []
+        
+        def fake_font(name, path):
+            loaded.append(Path(path).name)
+            if path == str(bad):
+                raise ValueError("unsupported font")
+            return SimpleNamespace(name=name)
+        
+        monkeypatch.setattr(fonts, "FONT_CANDIDATES", [str(tmp_path / "missing.ttc"), str(bad), str(good)])
+        monkeypatch.setattr(fonts, "TTFont", fake_font)
+        monkeypatch.setattr(fonts.pdfmetrics, "registerFont", lambda font: None)
+        monkeypatch.setattr(fonts, "_fontconfig_paths", lambda: [])
+        monkeypatch.setattr(Config, "PDF_FONT_PATH", "")
+        cache_path = tmp_path / "font_cache.json"
+        
+        try:
+            fonts.reset_font_registration()
+            assert fonts.register_cjk_font(cache_path) == fonts.FONT_NAME
+            assert fonts.register_cjk_font(cache_path) == fonts.FONT_NAME
+            assert loaded == ["bad.ttc", "good.ttf"]
+            
+            # 新程序：直接載入快取的字體
+            fonts.reset_font_registration()
+            loaded.clear()
+            assert fonts.register_cjk_font(cache_path) == fonts.FONT_NAME
+            assert loaded == ["good.ttf"]
+            assert json.loads(cache_path.read_text())["path"] == str(good)
+        finally:
+            fonts.reset_font_registration()
+    
+    def test_render_service_uses_worker_processes(self, tmp_path):
+        """測試程序池渲染結構化報告為位元組，以及 Markdown 報告寫入檔案"""
+        from agents.pdf_renderer import PDFRenderService
+        
+        service = PDFRenderService(processes=2)
+        try:
+            pids = {future.result(60) for future in service.warm()}
+            report = {"summary": "摘要", "insights": ["洞察"], "items": [{
+                "title": "新加坡金融科技", "source": "Fintech Singapore", "url": "https://fintechnews.sg/1",
+                "date": "2025-10-20", "country": "新加坡", "summary": "摘要", "key_points": ["重點"],
+            }]}
+            
+            data = service.render(report, query="金融科技")
+            path = service.render("# 測試報告\n\n內容", tmp_path / "report.pdf")
+        finally:
+            service.shutdown()
+        
+        assert os.getpid() not in pids
+        assert data.startswith(b"%PDF")
+        assert path == tmp_path / "report.pdf" and path.read_bytes().startswith(b"%PDF")
+
+    def test_markdown_story_merges_paragraphs_and_lists(self):
+        """測試 Markdown 轉換：多行段落合併、清單使用項目符號、連結輸出為連結註解、空行不產生 Spacer"""
+        from reportlab.platypus import Paragraph, Spacer
+
+        agent = ReportGeneratorAgent(renderer=False)
+        story = agent._parse_markdown_to_story(
+            "# 報告\n\n\n\n第一行 **粗體**\n第二行 & *斜體* snake_case\n\n"
+            "- **來源**：[Bloomberg](https://bloomberg.com/a_b)\n- 巢狀\n    - 子項目\n\n"
+            "1. 第一\n2. 第二\n"
+        )
+        paragraphs = [flowable for flowable in story if isinstance(flowable, Paragraph)]
+
+        assert [paragraph.text for paragraph in paragraphs[:2]] == [
+            "報告", "第一行 <b>粗體</b><br/>第二行 &amp; <i>斜體</i> snake_case"
+        ]
+        assert [paragraph.bulletText for paragraph in paragraphs[2:]] == ["•", "•", "–", "1.", "2."]
+        assert paragraphs[2].text == (
+            '<b>來源</b>：Bloomberg (<link href="https://bloomberg.com/a_b" color="blue">'
+            'https://bloomberg.com/a_b</link>)'
+        )
+        # 只有清單之後各一個 Spacer
+        assert sum(isinstance(flowable, Spacer) for flowable in story) == 2
+
+    def test_generate_excel_streams_generator_rows(self, tmp_path):
+        """測試 Excel 由產生器逐列寫入：一律輸出所有欄位（缺少的欄位為空白）、套用標題與連結樣式、移除控制字元"""
+        from openpyxl import load_workbook
+        
+        def rows():
+            for index in range(3):
+                yield {"新聞標題（中文）": f"標題 {index}", "來源網站連結": f"https://cafef.vn/{index}",
+                       "發布日期": "2025-10-20", "摘要": "摘要\x07內容", "關鍵字": "不輸出"}
+        
+        agent = ReportGeneratorAgent(renderer=False)
+        agent.reports_dir = tmp_path
+        path = agent.generate_excel(rows(), "news")
+        worksheet = load_workbook(path)["新聞報告"]
+        
+        assert path == tmp_path / "news.xlsx"
+        assert [cell.value for cell in worksheet[1]] == [
+            "新聞標題（中文）", "來源國家", "來源網站連結", "發布日期", "摘要", "重點分析"
+        ]
+        assert [cell.value for cell in worksheet[4]] == [
+            "標題 2", None, "https://cafef.vn/2", "2025-10-20", "摘要內容", None
+        ]
+        assert worksheet[1][0].font.b and worksheet[1][0].style == "excel_header"
+        assert worksheet[2][2].font.color.rgb == "000000FF" and worksheet[2][2].alignment.wrap_text
+        assert worksheet.column_dimensions["B"].width == 15
+        assert worksheet.column_dimensions["C"].width == 60
 
 
 class TestEmailAgent:
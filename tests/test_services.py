@@ -0,0 +1,255 @@
+"""
+測試服務層（任務執行器、任務儲存等）
+"""
+import asyncio
+import threading
+import time
+import pytest
+import sys
+from pathlib import Path
+
+# 添加專案根目錄到路徑
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.executor import TaskExecutor
+from app.services.progress import TaskProgress, TaskStatus
+from app.services.task_store import MemoryTaskStore, SQLiteTaskStore
+from app.services.events import EventBroker, format_sse
+from app.services.singleflight import SingleFlight, request_key
+
+
+class TestTaskExecutor:
+    """測試任務執行器"""
+
+    def test_workers_bound_concurrency(self):
+        """測試同時執行的任務數不超過 worker 數量"""
+        executor = TaskExecutor(num_workers=2, queue_size=10, stage_pool_sizes={"work": 4})
+        state = {"running": 0, "peak": 0, "done": 0}
+
+        def blocking_step():
+            time.sleep(0.05)
+            return threading.current_thread().name
+
+        async def handler(index):
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            thread_name = await executor.run_in_stage("work", blocking_step)
+            assert thread_name.startswith("stage-work")
+            state["running"] -= 1
+            state["done"] += 1
+
+        async def scenario():
+            for index in range(6):
+                await executor.submit(handler, index)
+            await executor._queue.join()
+            await executor.shutdown()
+
+        asyncio.run(scenario())
+
+        assert state["done"] == 6
+        assert state["peak"] == 2
+
+    def test_event_loop_stays_responsive(self):
+        """測試阻塞階段執行時 event loop 仍可回應"""
+        executor = TaskExecutor(num_workers=1, queue_size=1, stage_pool_sizes={"work": 1})
+
+        async def handler():
+            await executor.run_in_stage("work", time.sleep, 0.3)
+
+        async def scenario():
+            await executor.submit(handler)
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            latency = time.perf_counter() - started
+            await executor._queue.join()
+            await executor.shutdown()
+            return latency
+
+        assert asyncio.run(scenario()) < 0.2
+
+    def test_queue_full(self):
+        """測試佇列已滿時拒絕新任務"""
+        executor = TaskExecutor(num_workers=1, queue_size=1)
+
+        async def handler():
+            await asyncio.sleep(0.1)
+
+        async def scenario():
+            await executor.submit(handler)
+            await asyncio.sleep(0)  # 讓 worker 取走第一個任務
+            await executor.submit(handler)
+            with pytest.raises(asyncio.QueueFull):
+                await executor.submit(handler)
+            await executor.shutdown()
+
+        asyncio.run(scenario())
+
+
+class TestTaskStore:
+    """測試任務儲存"""
+
+    def test_sqlite_survives_restart(self, tmp_path):
+        """測試任務狀態在重新建立管理器後仍存在"""
+        db_path = tmp_path / "tasks.db"
+        manager = TaskProgress(store=SQLiteTaskStore(db_path))
+        task_id = manager.create_task("新加坡金融科技", "user@example.com")
+        manager.set_progress(task_id, 40, "searching", "✅ 新聞搜尋完成")
+        manager.set_succeeded(task_id, pdf_path="a.pdf", xlsx_path="a.xlsx")
+
+        restarted = TaskProgress(store=SQLiteTaskStore(db_path, cache_size=1))
+        task = restarted.get_task(task_id)
+
+        assert task["status"] == TaskStatus.SUCCEEDED
+        assert task["progress"] == 100
+        assert task["current_step"] == "searching"
+        assert task["artifacts"] == {"pdf_path": "a.pdf", "xlsx_path": "a.xlsx"}
+
+    def test_restart_fails_interrupted_tasks(self, tmp_path):
+        """測試重新啟動後，上次未完成的任務被標記為失敗，已結束的任務不受影響"""
+        db_path = tmp_path / "tasks.db"
+        manager = TaskProgress(store=SQLiteTaskStore(db_path))
+        queued = manager.create_task("排隊中", "a@example.com")
+        running = manager.create_task("執行中", "b@example.com")
+        finished = manager.create_task("已完成", "c@example.com")
+        manager.set_running(running)
+        manager.set_succeeded(finished, pdf_path="a.pdf")
+
+        restarted = TaskProgress(store=SQLiteTaskStore(db_path))
+
+        assert restarted.fail_interrupted() == 2
+        for task_id in (queued, running):
+            task = restarted.get_task(task_id)
+            assert task["status"] == TaskStatus.FAILED
+            assert "重新啟動" in task["error"]
+        assert restarted.get_task(finished)["status"] == TaskStatus.SUCCEEDED
+        assert restarted.fail_interrupted() == 0
+
+    def test_returned_task_is_a_copy(self):
+        """測試取得的任務不會被外部修改影響"""
+        manager = TaskProgress(store=SQLiteTaskStore(":memory:"))
+        task_id = manager.create_task("測試", "user@example.com")
+
+        manager.get_task(task_id)["artifacts"]["pdf_path"] = "hacked.pdf"
+
+        assert manager.get_task(task_id)["artifacts"]["pdf_path"] is None
+
+    @pytest.mark.parametrize("store_factory", [MemoryTaskStore, lambda: SQLiteTaskStore(":memory:")])
+    def test_evict_finished_tasks(self, store_factory):
+        """測試只淘汰過期且已結束的任務"""
+        manager = TaskProgress(store=store_factory(), ttl_seconds=60)
+        finished = manager.create_task("已完成", "a@example.com")
+        running = manager.create_task("執行中", "b@example.com")
+        manager.set_failed(finished, "錯誤")
+        manager.set_running(running)
+        stale = "2000-01-01T00:00:00"
+        manager.store.update(finished, {"updated_at": stale})
+        manager.store.update(running, {"updated_at": stale})
+
+        assert manager.evict_expired() == 1
+        assert manager.get_task(finished) is None
+        assert manager.get_task(running) is not None
+
+    def test_concurrent_updates(self):
+        """測試多執行緒同時更新"""
+        manager = TaskProgress(store=SQLiteTaskStore(":memory:", cache_size=4))
+        task_ids = [manager.create_task(f"主題 {i}", "user@example.com") for i in range(8)]
+
+        def work(task_id):
+            for progress in range(1, 51):
+                manager.set_progress(task_id, progress)
+
+        threads = [threading.Thread(target=work, args=(task_id,)) for task_id in task_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert all(manager.get_task(task_id)["progress"] == 50 for task_id in task_ids)
+
+
+class TestEventBroker:
+    """測試任務事件推播"""
+
+    def test_progress_published_from_worker_thread(self):
+        """測試 worker 執行緒的進度更新會送達訂閱者"""
+        broker = EventBroker()
+        manager = TaskProgress(store=MemoryTaskStore(), broker=broker)
+        task_id = manager.create_task("測試", "user@example.com")
+
+        async def scenario():
+            subscription = broker.subscribe(task_id)
+            worker = threading.Thread(
+                target=lambda: manager.set_progress(task_id, 40, "searching", "✅ 新聞搜尋完成")
+            )
+            worker.start()
+            message = await subscription.get(timeout=1)
+            worker.join()
+            broker.unsubscribe(task_id, subscription)
+            return message
+
+        message = asyncio.run(scenario())
+
+        assert message["event"] == "progress"
+        assert message["data"]["progress"] == 40
+        assert message["data"]["step_message"] == "✅ 新聞搜尋完成"
+        assert not broker.has_subscribers(task_id)
+
+    def test_slow_subscriber_keeps_latest_events(self):
+        """測試訂閱者佇列滿時丟棄最舊事件"""
+        broker = EventBroker(queue_size=2)
+
+        async def scenario():
+            subscription = broker.subscribe("task")
+            for count in range(5):
+                broker.publish("task", "characters_received", {"characters": count})
+            await asyncio.sleep(0)
+            return [(await subscription.get(timeout=1))["data"]["characters"] for _ in range(2)]
+
+        assert asyncio.run(scenario()) == [3, 4]
+
+    def test_format_sse(self):
+        """測試 SSE 格式"""
+        text = format_sse({"id": 7, "event": "citation_found", "data": {"title": "新聞"}})
+        assert text == 'id: 7\nevent: citation_found\ndata: {"title": "新聞"}\n\n'
+
+
+class TestSingleFlight:
+    """測試相同請求合併"""
+
+    def test_request_key_normalization(self):
+        """測試正規化後相同的請求產生相同鍵值"""
+        key = request_key("新加坡金融科技", "English", "最近 7 天內", "5-10篇")
+
+        assert request_key("  新加坡金融科技！", "english", "最近7天內", "5-10 篇") == key
+        assert request_key("泰國金融科技", "English", "最近 7 天內", "5-10篇") != key
+        assert request_key("新加坡金融科技", "Chinese", "最近 7 天內", "5-10篇") != key
+
+    def test_request_key_includes_explicit_fields(self):
+        """測試明確指定的欄位不同時不合併（即使欄位值與預設值相同）"""
+        prompt = "最近一個月的越南金融新聞"
+        default = request_key(prompt, "English", "最近 7 天內", "5-10篇")
+        explicit = request_key(prompt, "English", "最近 7 天內", "5-10篇", ["time_range"])
+
+        assert explicit != default
+        assert request_key(prompt, "English", "最近7天內", "5-10篇", ("time_range",)) == explicit
+        assert request_key(prompt, "English", "最近 7 天內", "5-10篇", ["language", "time_range"]) == \
+            request_key(prompt, "English", "最近 7 天內", "5-10篇", ["time_range", "language"])
+
+    def test_join_and_close(self):
+        """測試後到的請求加入既有流程，關閉後重新建立流程"""
+        flights = SingleFlight()
+
+        flight, is_leader = flights.join("key", "task-1")
+        same_flight, follower_is_leader = flights.join("key", "task-2")
+
+        assert is_leader and not follower_is_leader
+        assert same_flight is flight
+        assert flights.close(flight) == ["task-1", "task-2"]
+        assert len(flights) == 0
+
+        new_flight, new_is_leader = flights.join("key", "task-3")
+        assert new_is_leader and new_flight is not flight
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
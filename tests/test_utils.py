@@ -0,0 +1,493 @@
+"""
+測試工具模組（快取、解析器等）
+"""
+import pytest
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加專案根目錄到路徑
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.cache import PersistentTTLCache
+from utils.corpus import ArticleCorpus
+from utils.dedupe import MinHashDeduper, dedupe_news_items
+from utils.instructions import parse_count_range, parse_target_count, parse_time_window
+from utils.news_items import (
+    IncrementalNewsParser, extract_news_items, extract_object_field, merge_news_items, render_news_content
+)
+from utils.prompt_parser import PromptParser, parse_prompt_rules
+from utils.ranking import estimate_tokens, rank_news_items, score_news_items
+from utils.tagger import AhoCorasick, EntityTagger, default_tagger, primary_countries
+from utils.throttle import RateLimitedLog
+from utils.urls import DomainIndex, canonicalize_url
+
+
+class TestPersistentTTLCache:
+    """測試持久化 TTL 快取"""
+
+    def test_hit_miss_and_persistence(self, tmp_path):
+        """測試命中統計與重啟後保留"""
+        db_path = tmp_path / "cache.db"
+        cache = PersistentTTLCache(db_path, "search", ttl_seconds=60)
+        key = PersistentTTLCache.make_key("新加坡金融科技", "最近7天內", "5-10篇", "english")
+
+        assert cache.get(key) is None
+        cache.set(key, {"status": "success", "content": "新聞"})
+        assert cache.get(key) == {"status": "success", "content": "新聞"}
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        cache.close()
+
+        reopened = PersistentTTLCache(db_path, "search", ttl_seconds=60)
+        assert reopened.get(key) == {"status": "success", "content": "新聞"}
+
+    def test_ttl_expiry(self):
+        """測試過期項目視為未命中"""
+        cache = PersistentTTLCache(":memory:", "search", ttl_seconds=0.05)
+        cache.set("key", [1, 2, 3])
+        time.sleep(0.1)
+
+        assert cache.get("key") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        """測試超過上限時淘汰最久未使用的項目"""
+        cache = PersistentTTLCache(":memory:", "search", ttl_seconds=60, max_entries=2)
+        cache.set("a", 1)
+        time.sleep(0.01)
+        cache.set("b", 2)
+        time.sleep(0.01)
+        cache.get("a")
+        time.sleep(0.01)
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_namespaces_are_isolated(self, tmp_path):
+        """測試不同命名空間互不影響"""
+        db_path = tmp_path / "cache.db"
+        search = PersistentTTLCache(db_path, "search", ttl_seconds=60)
+        articles = PersistentTTLCache(db_path, "articles", ttl_seconds=60)
+        search.set("key", "search")
+
+        assert articles.get("key") is None
+        articles.clear()
+        assert search.get("key") == "search"
+
+
+class TestNewsItems:
+    """測試網址正規化與新聞項目工具"""
+
+    def test_canonicalize_url(self):
+        """測試去除追蹤參數、片段與 www"""
+        url = "HTTPS://www.BangkokPost.com:443/business/123/?utm_source=x&b=2&a=1&fbclid=y#top"
+        assert canonicalize_url(url) == "https://bangkokpost.com/business/123?a=1&b=2"
+
+    def test_domain_index_matches_suffixes(self):
+        """測試反向網域索引比對子網域並取最長的網域"""
+        index = DomainIndex({"nikkei.com": "Nikkei", "asia.nikkei.com": "Nikkei Asia", "cafef.vn": "Cafef"})
+
+        assert index.match_url("https://asia.nikkei.com/Business/1") == "Nikkei Asia"
+        assert index.match_url("https://www.nikkei.com/article/2") == "Nikkei"
+        assert index.match_url("https://m.cafef.vn/3") == "Cafef"
+        assert index.match_url("https://notcafef.vn/4") is None
+        assert index.match_url("https://cafef.vn.example.com/5") is None
+        assert index.match_url("not a url") is None
+        assert len(index) == 3
+        assert "https://e.vnexpress.net/6" in DomainIndex(["vnexpress.net"])
+
+    @pytest.mark.parametrize("instruction, expected", [
+        ("5-10篇", (5, 10)),
+        ("約15篇", (12, 18)),
+        ("10 articles", (10, 10)),
+        ("二十篇", (20, 20)),
+        ("一些", None),
+    ])
+    def test_parse_count_range(self, instruction, expected):
+        """測試數量指令解析"""
+        assert parse_count_range(instruction) == expected
+
+    @pytest.mark.parametrize("instruction, expected", [
+        ("5-10篇", 10),
+        ("約15篇", 15),
+        ("一些", None),
+    ])
+    def test_parse_target_count(self, instruction, expected):
+        """測試目標數量解析"""
+        assert parse_target_count(instruction) == expected
+
+    @pytest.mark.parametrize("instruction, expected", [
+        ("最近 7 天內", 7),
+        ("過去兩週", 14),
+        ("最近一個月", 30),
+        ("past 24 hours", 1),
+        ("一週內", 7),
+        ("within the last 3 days", 3),
+        ("不限", None),
+        ("2025年", None),
+        ("2025年10月5日之後", None),
+        ("10月5日", None),
+        ("today", None),
+    ])
+    def test_parse_time_window(self, instruction, expected):
+        """測試時間範圍解析為天數"""
+        assert parse_time_window(instruction) == expected
+
+    def test_merge_dedupes_and_interleaves(self):
+        """測試合併時依網址去重並輪流取各組"""
+        vietnam = [
+            {"title": "A", "url": "https://cafef.vn/a?utm_source=x"},
+            {"title": "B", "url": "https://cafef.vn/b"},
+        ]
+        regional = [
+            {"title": "A copy", "url": "https://www.cafef.vn/a"},
+            {"title": "C", "url": "https://techinasia.com/c"},
+        ]
+
+        merged = merge_news_items([vietnam, regional])
+
+        assert [item["title"] for item in merged] == ["A", "B", "C"]
+        assert [item["title"] for item in merge_news_items([vietnam, regional], limit=2)] == ["A", "B"]
+
+    def test_render_round_trip(self):
+        """測試輸出的搜尋結果文字可再解析回新聞項目"""
+        items = [{"title": "新聞", "url": "https://vnexpress.net/x", "date": "2025-10-20"}]
+        assert extract_news_items(render_news_content("越南", items)) == items
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 1000])
+    def test_incremental_parser(self, chunk_size):
+        """測試串流增量解析：物件一閉合即返回，不受切段位置影響"""
+        items = [
+            {"title": "含 } 與 \\\" 的標題", "url": "https://cafef.vn/a", "tags": ["a", "b"]},
+            {"title": "B", "url": "https://techinasia.com/b", "meta": {"rank": 1}},
+        ]
+        text = "說明文字 {不是 JSON}\n" + render_news_content("越南", items) + "\n結尾 {\"x\": 1}"
+
+        parser = IncrementalNewsParser()
+        parsed_at = []
+        for start in range(0, len(text), chunk_size):
+            for item in parser.feed(text[start:start + chunk_size]):
+                parsed_at.append((item["title"], start))
+
+        assert parser.items == items
+        assert parser.finished
+        # 第一則在第二則之前就已解析完成
+        assert chunk_size == 1000 or parsed_at[0][1] < text.index('"B"')
+
+    def test_extract_object_field(self):
+        """測試在串流尚未結束時取出完整的 parsed 物件"""
+        text = '```json\n{"parsed": {"keywords": "含 } 的主題", "language": "Thai"}, "results": [{"title": "A'
+
+        assert extract_object_field(text, "parsed") == {"keywords": "含 } 的主題", "language": "Thai"}
+        assert extract_object_field(text[:text.index('"language"')], "parsed") is None
+        assert extract_object_field(text, "missing") is None
+
+
+class TestPromptParser:
+    """測試規則需求解析"""
+
+    @pytest.mark.parametrize("prompt, expected", [
+        ("新加坡金融科技發展趨勢", ("新加坡金融科技發展趨勢", None, None, None)),
+        ("最近一週越南電動車新聞，約15篇，英文新聞", ("越南電動車", "最近 7 天內", "約15篇", "English")),
+        ("幫我找最近3天泰國央行利率的相關新聞 5-10篇", ("泰國央行利率", "最近 3 天內", "5-10篇", None)),
+        ("Singapore fintech news in the past 3 days, 10 articles, in English",
+         ("Singapore fintech", "最近 3 天內", "10篇", "English")),
+    ])
+    def test_rules(self, prompt, expected):
+        """測試常見中英文寫法"""
+        parsed = parse_prompt_rules(prompt)
+        assert (parsed["keywords"], parsed["time_instruction"], parsed["num_instruction"], parsed["language"]) == expected
+
+    @pytest.mark.parametrize("prompt, expected", [
+        ("印尼文化產業投資", ("印尼文化產業投資", None)),
+        ("泰文化觀光", ("泰文化觀光", None)),
+        ("以泰文撰寫泰國觀光新聞", ("泰國觀光", "Thai")),
+        ("印尼語 金融科技", ("金融科技", "Indonesian")),
+    ])
+    def test_language_requires_language_context(self, prompt, expected):
+        """測試語言名稱只在語言語境中成立（「文化」等較長詞語不被截斷）"""
+        parsed = parse_prompt_rules(prompt)
+        assert (parsed["keywords"], parsed["language"]) == expected
+
+    @pytest.mark.parametrize("prompt", [
+        "馬來西亞半導體 但不要包含 新加坡",
+        "越南股市 英文 中文",
+        "2024年新加坡房地產",
+    ])
+    def test_ambiguous_prompts_need_llm(self, prompt):
+        """測試含糊的需求交給 LLM"""
+        assert parse_prompt_rules(prompt) is None
+
+    def test_explicit_fields_and_llm_fallback(self):
+        """測試請求欄位優先，LLM 只在含糊時呼叫且結果會被快取"""
+        calls = []
+
+        def llm_parse(prompt):
+            calls.append(prompt)
+            return {"keywords": "馬來西亞半導體", "time_instruction": "最近7天內", "language": "English"}
+
+        parser = PromptParser(llm_parse)
+
+        parsed, source = parser.parse("最近一週越南電動車，英文新聞", {"language": "Vietnamese"})
+        assert source == "rules" and calls == []
+        assert parsed["language"] == "Vietnamese"
+        assert parsed["time_instruction"] == "最近 7 天內"
+        assert parsed["num_instruction"] == "5-10篇"
+
+        ambiguous = "馬來西亞半導體 但不要包含 新加坡"
+        assert parser.parse(ambiguous)[1] == "llm"
+        parsed, source = parser.parse(ambiguous, {"num_instruction": "3篇"})
+        assert source == "cache" and len(calls) == 1
+        assert parsed["num_instruction"] == "3篇"
+
+    def test_llm_failure_is_not_cached(self):
+        """測試 LLM 失敗時回退到原始輸入，且不快取失敗結果"""
+        def llm_parse(prompt):
+            raise ValueError("boom")
+
+        parser = PromptParser(llm_parse)
+        prompt = "越南和泰國的電動車比較"
+
+        parsed, source = parser.parse(prompt)
+
+        assert source == "fallback"
+        assert parsed["keywords"] == prompt
+        assert parser.parse(prompt)[1] == "fallback"
+
+
+class TestArticleCorpus:
+    """測試本地新聞語料庫"""
+
+    def _item(self, title, url, days_ago=0, **extra):
+        published = (datetime.now() - timedelta(days=days_ago)).strftime("%Y-%m-%d")
+        return {"title": title, "url": url, "date": published, "summary": "", **extra}
+
+    def test_lookup_requires_fresh_covering_search(self):
+        """測試只有新鮮且涵蓋時間範圍的搜尋才能由語料庫回答"""
+        corpus = ArticleCorpus(":memory:", freshness_seconds=60)
+        corpus.add("越南 電子支付", "English", 7, [
+            self._item("New", "https://vnexpress.net/new"),
+            self._item("Old", "https://cafef.vn/old", days_ago=5),
+            self._item("No date", "https://cafef.vn/x", date=""),
+        ])
+
+        assert len(corpus) == 2
+        assert [item["title"] for item in corpus.lookup("越南  電子支付", "English", 3, limit=10)] == ["New"]
+        assert corpus.lookup("越南 電子支付", "English", 30, limit=10) is None
+        assert corpus.lookup("越南 電子支付", "Thai", 3, limit=10) is None
+
+        # 超過新鮮期
+        corpus.freshness_seconds = -1
+        assert corpus.lookup("越南 電子支付", "English", 3, limit=10) is None
+
+    def test_upsert_by_canonical_url(self):
+        """測試同一則新聞依正規化網址更新，不重複寫入"""
+        corpus = ArticleCorpus(":memory:")
+        corpus.add("a", "English", 7, [
+            self._item("Vietnam e-wallet growth", "https://www.vnexpress.net/a?utm_source=x",
+                       summary="MoMo 電子錢包成長", country="Vietnam"),
+            self._item("Thai bank rates", "https://bangkokpost.com/b", country="Thailand"),
+        ])
+        corpus.add("b", "English", 7, [self._item("Vietnam e-wallet growth slows", "https://vnexpress.net/a")])
+
+        assert len(corpus) == 2
+        assert [item["title"] for item in corpus.iter_articles(country="Vietnam")] == []
+        assert sorted(item["title"] for item in corpus.iter_articles()) == [
+            "Thai bank rates", "Vietnam e-wallet growth slows"
+        ]
+
+    def test_iter_articles_pages_newest_first(self):
+        """測試逐批讀取：依日期由新到舊、同一天的新聞跨批次不重複也不遺漏"""
+        corpus = ArticleCorpus(":memory:")
+        corpus.add("a", "English", 7, [
+            self._item(f"News {index}", f"https://vnexpress.net/{index}", days_ago=index // 3,
+                       country="Vietnam" if index % 2 else "Thailand")
+            for index in range(7)
+        ])
+
+        titles = [item["title"] for item in corpus.iter_articles(batch_size=2)]
+        assert sorted(titles) == sorted(f"News {index}" for index in range(7))
+        assert titles[:3] == ["News 2", "News 1", "News 0"] and titles[-1] == "News 6"
+        assert [item["title"] for item in corpus.iter_articles(country="Vietnam", batch_size=1)] == [
+            "News 1", "News 5", "News 3"
+        ]
+
+
+
+class TestDedupe:
+    """測試近似重複新聞的合併"""
+
+    def test_near_duplicates_are_merged_with_sources(self):
+        """測試不同來源略為改寫的同一則新聞合併為一則，並保留所有來源"""
+        items = [
+            {"title": "Vietnam central bank cuts policy rate by 50 basis points", "source": "Cafef",
+             "summary": "The State Bank of Vietnam cut its refinancing rate on Monday to support growth.",
+             "url": "https://cafef.vn/1"},
+            {"title": "Thai baht weakens as exports slow", "source": "Bangkok Post",
+             "summary": "The baht fell against the dollar after weaker export data.",
+             "url": "https://bangkokpost.com/2"},
+            {"title": "Vietnam's central bank cuts policy rate by 50 bps", "source": "Vietnambiz",
+             "summary": "The State Bank of Vietnam cut its refinancing rate on Monday, to support growth.",
+             "url": "https://vietnambiz.vn/3"},
+            {"title": "越南央行宣布調降政策利率五十個基點以支撐經濟成長", "source": "VietJo", "url": "https://viet-jo.com/4"},
+            {"title": "越南央行宣布調降政策利率五十個基點，以支撐經濟成長", "source": "柬中時報", "url": "https://cc-times.com/5"},
+            {"title": "Reposted", "source": "Cafef", "url": "https://www.cafef.vn/1?utm_source=x"},
+        ]
+
+        deduped = dedupe_news_items(items)
+
+        assert [item["url"] for item in deduped] == [
+            "https://cafef.vn/1", "https://bangkokpost.com/2", "https://viet-jo.com/4"
+        ]
+        assert [source["source"] for source in deduped[0]["sources"]] == ["Cafef", "Vietnambiz", "Cafef"]
+        assert [source["source"] for source in deduped[2]["sources"]] == ["VietJo", "柬中時報"]
+        assert "sources" not in deduped[1]
+        assert "sources" not in items[0]
+
+    def test_distinct_items_are_kept_at_scale(self):
+        """測試大量不相關的新聞不會被誤判為重複，只合併真正的重複"""
+        import random
+        import string
+
+        rng = random.Random(0)
+        words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+        items = [{"title": " ".join(rng.sample(words, 8)), "summary": " ".join(rng.sample(words, 25)),
+                  "url": f"https://example.com/{i}"} for i in range(2000)]
+        copies = [dict(item, url=item["url"] + "-copy", title=item["title"] + " update") for item in items[:100]]
+
+        deduped = dedupe_news_items(items + copies)
+
+        assert len(deduped) == 2000
+        assert sum("sources" in item for item in deduped) == 100
+
+    def test_signature_estimates_jaccard(self):
+        """測試 MinHash 簽章的相似度估計"""
+        deduper = MinHashDeduper(num_perm=128, bands=32)
+        text = "Singapore fintech funding rebounds in the third quarter"
+
+        assert deduper.similarity(deduper.signature(text), deduper.signature(text)) == 1.0
+        assert deduper.similarity(deduper.signature(text), deduper.signature("泰國央行維持利率不變")) < 0.1
+        assert deduper.signature("  ") is None
+
+
+
+class TestRanking:
+    """測試分析前的新聞排序"""
+
+    def test_scores_recency_keywords_and_language(self):
+        """測試新近程度、關鍵字重疊與語言相符的新聞分數較高"""
+        today = datetime(2025, 3, 10).date()
+        items = [
+            {"title": "Singapore fintech funding rebounds", "date": "2025-03-09"},
+            {"title": "Singapore fintech funding rebounds", "date": "2025-03-04"},
+            {"title": "Thai baht weakens", "date": "2025-03-09"},
+            {"title": "新加坡金融科技融資回升", "date": "2025-03-09"},
+            {"title": "Singapore fintech funding rebounds", "date": "2024-12-01"},
+        ]
+
+        scores = score_news_items(items, "Singapore fintech", window_days=7, language="English", today=today)
+
+        assert scores[0] > scores[1] > scores[4]
+        assert scores[0] > scores[2]
+        assert scores[0] > scores[3]
+
+    def test_rank_keeps_diverse_top_items_within_budget(self):
+        """測試挑選時兼顧來源多樣性，並遵守數量上限與 token 預算"""
+        today = datetime(2025, 3, 10).date()
+        items = [
+            {"title": f"Vietnam fintech news {i}", "url": f"https://cafef.vn/{i}", "date": "2025-03-09"}
+            for i in range(3)
+        ] + [{"title": "Vietnam fintech update", "url": "https://vnexpress.net/9", "date": "2025-03-07"}]
+
+        ranked = rank_news_items(items, "Vietnam fintech", window_days=7, max_items=2, today=today)
+        assert [item["url"] for item in ranked] == ["https://cafef.vn/0", "https://vnexpress.net/9"]
+
+        budget = int(estimate_tokens(items[:2]).sum())
+        ranked = rank_news_items(items, "Vietnam fintech", window_days=7, token_budget=budget,
+                                 diversity_penalty=0, today=today)
+        assert [item["url"] for item in ranked] == ["https://cafef.vn/0", "https://cafef.vn/1"]
+
+        assert len(rank_news_items(items, token_budget=1)) == 1
+        assert rank_news_items([]) == []
+
+
+
+class TestEntityTagger:
+    """測試國家與實體標註"""
+
+    def test_aho_corasick_finds_overlapping_matches(self):
+        """測試自動機找出所有（含重疊）比對"""
+        automaton = AhoCorasick(["he", "she", "his", "hers"])
+        matches = sorted((start, end, automaton.patterns[index]) for start, end, index in automaton.finditer("ushers"))
+        assert matches == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+    def test_tags_batch_with_counts(self):
+        """測試整批標註返回各國提及次數，取最長名稱並檢查字詞邊界與縮寫大小寫"""
+        tagger = default_tagger()
+        counts = tagger.tag_batch([
+            "Bank Negara Malaysia holds rates as Maybank rallies in Kuala Lumpur",
+            "DBS and Gojek expand: 新加坡星展與雅加達合作",
+            "The mas said the set of rules was ready for Thailand",
+            "越南央行宣布降息，河內與胡志明市股市上漲",
+            "Global markets rally",
+        ])
+
+        assert counts[0] == {"馬來西亞": 3}
+        assert counts[1] == {"新加坡": 2, "印尼": 2}
+        assert counts[2] == {"泰國": 1}
+        assert counts[3] == {"越南": 3}
+        assert not counts[4]
+        assert tagger.entities("Vietnamese lender Vietcombank") == [("Vietnamese", "越南"), ("Vietcombank", "越南")]
+
+    def test_primary_countries(self):
+        """測試依提及次數決定所屬國家"""
+        tagger = EntityTagger({"新加坡": ["Singapore", "SGX"], "越南": ["Vietnam"]})
+
+        assert primary_countries(tagger.tag("Singapore SGX and Singapore, plus Vietnam")) == "新加坡"
+        assert primary_countries(tagger.tag("Singapore and Vietnam")) == "新加坡、越南"
+        assert primary_countries(tagger.tag("nothing here")) == "東南亞"
+
+    def test_ambiguous_aliases_are_not_tagged(self):
+        """測試常見詞語、語言形容詞與其他意思常見的縮寫不被標為國家"""
+        tagger = default_tagger()
+        counts = tagger.tag_batch([
+            "本季財報內容包羅萬象",
+            "山東泗水縣與台南西港區的農業新聞",
+            "A Thai-language and Lao-language translation service",
+            "The BOT toll road project in India",
+        ])
+
+        assert counts == [{}, {}, {}, {}]
+
+
+class TestRateLimitedLog:
+    """測試限流的進度輸出"""
+
+    def test_throttles_per_kind_and_flushes_last_message(self):
+        """測試同類訊息在間隔內只輸出一次，結束時補上最後一則"""
+        now = [0.0]
+        lines = []
+        log = RateLimitedLog(interval=1.0, sink=lines.append, clock=lambda: now[0])
+
+        for count in range(1, 6):
+            log("item", f"item {count}")
+        log("citation", "citation 1")
+        now[0] = 1.5
+        log("item", "item 6")
+        log("item", "item 7")
+        log.flush()
+
+        assert lines == [
+            "item 1",
+            "citation 1",
+            "item 6（另有 4 則相同類型的訊息未顯示）",
+            "item 7",
+        ]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,158 @@
+"""
+持久化 TTL 快取
+以 SQLite 儲存 JSON 值，重啟後仍保留；
+支援新鮮度 TTL、依最近存取時間的 LRU 淘汰與命中率統計
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+
+class PersistentTTLCache:
+    """SQLite 持久化快取（同一個資料庫檔可由多個 namespace 共用）"""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache_entries (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            PRIMARY KEY (namespace, key)
+        );
+        CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache_entries(namespace, accessed_at);
+    """
+
+    def __init__(
+        self,
+        db_path: Union[str, Path],
+        namespace: str,
+        ttl_seconds: float,
+        max_entries: int = 1000
+    ):
+        """
+        初始化快取
+
+        Args:
+            db_path: 資料庫檔案路徑（":memory:" 表示不落地）
+            namespace: 快取命名空間
+            ttl_seconds: 新鮮度（秒），超過即視為未命中
+            max_entries: 最多保留的項目數，超過時淘汰最久未使用者
+        """
+        self.db_path = str(db_path)
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self._SCHEMA)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """由任意可序列化的參數產生快取鍵值"""
+        raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        讀取快取
+
+        Returns:
+            Optional[Any]: 快取值；不存在或已過期則返回 None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._delete(key)
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        """寫入快取（值需可序列化為 JSON）"""
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO cache_entries (namespace, key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET "
+                "value = excluded.value, created_at = excluded.created_at, accessed_at = excluded.accessed_at",
+                (self.namespace, key, payload, now, now)
+            )
+            self._evict_overflow()
+
+    def delete(self, key: str):
+        """刪除快取項目"""
+        with self._lock:
+            self._delete(key)
+
+    def clear(self):
+        """清空此命名空間"""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中率統計"""
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        """關閉資料庫連線"""
+        with self._lock:
+            self._conn.close()
+
+    def _size(self) -> int:
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def _delete(self, key: str):
+        self._conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+        )
+
+    def _evict_overflow(self):
+        """淘汰超出上限的最久未使用項目（呼叫端需持有鎖）"""
+        overflow = self._size() - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE rowid IN ("
+                "SELECT rowid FROM cache_entries WHERE namespace = ? "
+                "ORDER BY accessed_at LIMIT ?)",
+                (self.namespace, overflow)
+            )
@@ -0,0 +1,263 @@
+"""
+本地新聞語料庫
+每次搜尋取得的新聞都正規化後寫入 SQLite（以日期、網域、國家建立索引），
+同一主題在新鮮期內再次查詢、且時間範圍已被先前的搜尋涵蓋時，可直接由語料庫回答
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from utils.helpers import normalize_text
+from utils.news_items import canonical_item_url, item_identity
+from utils.urls import url_host
+
+
+class ArticleCorpus:
+    """SQLite 新聞語料庫"""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS articles (
+            id INTEGER PRIMARY KEY,
+            identity TEXT NOT NULL UNIQUE,
+            url TEXT NOT NULL,
+            title TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            source TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            language TEXT NOT NULL,
+            country TEXT NOT NULL,
+            date TEXT NOT NULL,
+            item TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_articles_date ON articles(date);
+        CREATE INDEX IF NOT EXISTS idx_articles_domain ON articles(domain, date);
+        CREATE INDEX IF NOT EXISTS idx_articles_country ON articles(country, date);
+
+        -- 搜尋紀錄：主題在某時間點搜尋過、涵蓋的時間範圍
+        CREATE TABLE IF NOT EXISTS searches (
+            topic TEXT NOT NULL,
+            language TEXT NOT NULL,
+            window_start TEXT NOT NULL,
+            searched_at REAL NOT NULL,
+            PRIMARY KEY (topic, language, window_start)
+        );
+        CREATE INDEX IF NOT EXISTS idx_searches_topic ON searches(topic, language, searched_at);
+
+        -- 主題與新聞的對應
+        CREATE TABLE IF NOT EXISTS topic_articles (
+            topic TEXT NOT NULL,
+            language TEXT NOT NULL,
+            article_id INTEGER NOT NULL REFERENCES articles(id) ON DELETE CASCADE,
+            PRIMARY KEY (topic, language, article_id)
+        );
+
+        -- 舊版的 FTS5 全文索引已不再使用，移除以免每次寫入都更新索引
+        DROP TRIGGER IF EXISTS articles_ai;
+        DROP TRIGGER IF EXISTS articles_ad;
+        DROP TRIGGER IF EXISTS articles_au;
+        DROP TABLE IF EXISTS articles_fts;
+    """
+
+    def __init__(self, db_path: Union[str, Path], freshness_seconds: float = 6 * 3600):
+        """
+        初始化語料庫
+
+        Args:
+            db_path: 資料庫檔案路徑（":memory:" 表示不落地）
+            freshness_seconds: 搜尋紀錄的新鮮期（秒），超過後同一主題需重新搜尋
+        """
+        self.db_path = str(db_path)
+        self.freshness_seconds = freshness_seconds
+        self._lock = threading.Lock()
+
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self._SCHEMA)
+
+    def add(
+        self,
+        topic: str,
+        language: str,
+        window_days: Optional[int],
+        items: Iterable[Dict[str, Any]]
+    ) -> int:
+        """
+        寫入一次搜尋的結果（新聞以正規化網址去重，已存在者更新內容）
+
+        Args:
+            topic: 搜尋主題
+            language: 新聞語言
+            window_days: 該次搜尋涵蓋的天數（無法解析時不記錄涵蓋範圍）
+            items: 新聞項目（title、summary、url、date、source，可含 country）
+
+        Returns:
+            int: 寫入的新聞數量
+        """
+        now = time.time()
+        topic = normalize_text(topic)
+        rows = [row for row in (self._to_row(item, language, now) for item in items) if row is not None]
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    article_id = self._conn.execute(
+                        "INSERT INTO articles (identity, url, title, summary, source, domain, language, country, "
+                        "date, item, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(identity) DO UPDATE SET url = excluded.url, title = excluded.title, "
+                        "summary = excluded.summary, source = excluded.source, country = excluded.country, "
+                        "date = excluded.date, item = excluded.item, updated_at = excluded.updated_at "
+                        "RETURNING id",
+                        row
+                    ).fetchone()[0]
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO topic_articles (topic, language, article_id) VALUES (?, ?, ?)",
+                        (topic, language, article_id)
+                    )
+
+                if window_days:
+                    window_start = (date.today() - timedelta(days=window_days)).isoformat()
+                    self._conn.execute(
+                        "INSERT INTO searches (topic, language, window_start, searched_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(topic, language, window_start) DO UPDATE SET searched_at = excluded.searched_at",
+                        (topic, language, window_start, now)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return len(rows)
+
+    def covered(self, topic: str, language: str, window_days: int) -> bool:
+        """新鮮期內是否已搜尋過此主題，且搜尋的時間範圍涵蓋最近 window_days 天"""
+        since = (date.today() - timedelta(days=window_days)).isoformat()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM searches WHERE topic = ? AND language = ? AND searched_at >= ? AND window_start <= ? "
+                "LIMIT 1",
+                (normalize_text(topic), language, time.time() - self.freshness_seconds, since)
+            ).fetchone()
+        return row is not None
+
+    def lookup(self, topic: str, language: str, window_days: int, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        由語料庫回答查詢
+
+        Args:
+            topic: 搜尋主題
+            language: 新聞語言
+            window_days: 時間範圍（天）
+            limit: 最多返回的新聞數
+
+        Returns:
+            Optional[List[Dict]]: 時間範圍內的新聞（新到舊）；未被新鮮的搜尋涵蓋時返回 None
+        """
+        if not self.covered(topic, language, window_days):
+            return None
+
+        since = (date.today() - timedelta(days=window_days)).isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT a.item FROM topic_articles t JOIN articles a ON a.id = t.article_id "
+                "WHERE t.topic = ? AND t.language = ? AND a.date >= ? ORDER BY a.date DESC, a.id LIMIT ?",
+                (normalize_text(topic), language, since, limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def iter_articles(
+        self,
+        since: Optional[str] = None,
+        country: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        依發布日期由新到舊逐批讀取語料庫中的新聞（匯出大量歷史新聞時使用，記憶體只保留一批）
+
+        每批以上一批最後一筆的 (date, id) 接續查詢，批次之間不持有鎖，不影響其他執行緒的寫入
+
+        Args:
+            since: 只返回此日期（YYYY-MM-DD）之後的新聞
+            country: 限定國家
+            batch_size: 每批讀取的新聞數
+
+        Yields:
+            Dict: 新聞項目
+        """
+        sql = "SELECT date, id, item FROM articles WHERE 1 = 1"
+        params: List[Any] = []
+        if since:
+            sql += " AND date >= ?"
+            params.append(since)
+        if country:
+            sql += " AND country = ?"
+            params.append(country)
+
+        cursor: Optional[tuple] = None
+        while True:
+            page_sql, page_params = sql, list(params)
+            if cursor is not None:
+                page_sql += " AND (date < ? OR (date = ? AND id < ?))"
+                page_params += [cursor[0], cursor[0], cursor[1]]
+            page_sql += " ORDER BY date DESC, id DESC LIMIT ?"
+            page_params.append(batch_size)
+
+            with self._lock:
+                rows = self._conn.execute(page_sql, page_params).fetchall()
+            for _, _, item in rows:
+                yield json.loads(item)
+            if len(rows) < batch_size:
+                return
+            cursor = rows[-1][:2]
+
+    def prune(self, older_than_days: int) -> int:
+        """刪除發布日期早於指定天數的新聞與過期的搜尋紀錄，返回刪除的新聞數"""
+        cutoff = (date.today() - timedelta(days=older_than_days)).isoformat()
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM articles WHERE date < ?", (cutoff,)).rowcount
+            self._conn.execute("DELETE FROM searches WHERE searched_at < ?", (time.time() - self.freshness_seconds,))
+        return deleted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def close(self):
+        """關閉資料庫連線"""
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_row(item: Dict[str, Any], language: str, now: float) -> Optional[tuple]:
+        """正規化新聞項目為資料列（沒有網址或日期的新聞無法判斷時間範圍，不寫入）"""
+        url = canonical_item_url(item)
+        try:
+            published = datetime.strptime(str(item.get("date", ""))[:10], "%Y-%m-%d").date().isoformat()
+        except ValueError:
+            return None
+        if not url:
+            return None
+
+        return (
+            item_identity(item),
+            url,
+            item.get("title", ""),
+            item.get("summary", ""),
+            item.get("source", ""),
+            url_host(url) or "",
+            item.get("language") or language,
+            item.get("country", ""),
+            published,
+            json.dumps(item, ensure_ascii=False),
+            now,
+        )
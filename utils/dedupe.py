@@ -0,0 +1,217 @@
+"""
+新聞近似重複偵測
+同一則通訊社新聞常由多個來源以略為不同的文字刊出。以標題與摘要的字元 shingle 計算 MinHash 簽章，
+經 LSH 分桶找出候選配對，再以 union-find 將近似重複的新聞合併為一則代表新聞（保留所有來源）
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .helpers import normalize_text
+from .news_items import item_identity
+
+# multiply-shift 雜湊：(a * h + b) >> 32（a 為奇數，uint64 運算溢位時自然回繞），輸出 32 位元
+_SHIFT = np.uint64(32)
+
+
+class _UnionFind:
+    """並查集（路徑壓縮 + 依大小合併）"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, x: int) -> int:
+        root = x
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+
+
+class MinHashDeduper:
+    """MinHash + LSH 近似重複偵測"""
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, threshold: float = 0.6, shingle_size: int = 3, seed: int = 1):
+        """
+        Args:
+            num_perm: MinHash 雜湊函數數量（需可被 bands 整除）
+            bands: LSH 分段數；每段 num_perm / bands 列，段數越多越容易成為候選
+            threshold: 估計的 Jaccard 相似度達此值才視為重複
+            shingle_size: 字元 shingle 長度（對中文與拼音文字皆適用）
+            seed: 雜湊參數的亂數種子（固定以取得可重現的結果）
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm 必須可被 bands 整除")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        self._a = (rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1))[:, None]
+        self._b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)[:, None]
+
+    def _shingles(self, text: str) -> np.ndarray:
+        """文字的字元 shingle 雜湊（重複的 shingle 不影響最小值，不需去重）"""
+        codes = np.frombuffer(normalize_text(text).replace(" ", "").encode("utf-32-le"), dtype=np.uint32)
+        if not codes.size:
+            return codes.astype(np.uint64)
+
+        # 以向量運算組合連續 shingle_size 個字元的 Unicode 碼位，再以 splitmix64 打散
+        size = min(self.shingle_size, codes.size)
+        grams = np.zeros(codes.size - size + 1, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for offset in range(size):
+                grams = grams * np.uint64(0x110000) + codes[offset:offset + grams.size]
+            grams ^= grams >> np.uint64(30)
+            grams *= np.uint64(0xBF58476D1CE4E5B9)
+            grams ^= grams >> np.uint64(27)
+            grams *= np.uint64(0x94D049BB133111EB)
+            grams ^= grams >> np.uint64(31)
+        return grams
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        MinHash 簽章
+
+        Returns:
+            Optional[np.ndarray]: 長度 num_perm 的簽章；文字為空時返回 None
+        """
+        signatures = self.signatures([text])
+        return signatures[0] if signatures[0] is not None else None
+
+    def signatures(self, texts: Sequence[str], batch_shingles: int = 1 << 16) -> List[Optional[np.ndarray]]:
+        """
+        批次計算 MinHash 簽章（多筆文字的 shingle 串接後一次運算，以 reduceat 取各段最小值）
+
+        Args:
+            texts: 文字
+            batch_shingles: 每批最多的 shingle 數（限制中間陣列的記憶體用量）
+
+        Returns:
+            List[Optional[np.ndarray]]: 各文字的簽章；文字為空時為 None
+        """
+        shingles = [self._shingles(text) for text in texts]
+        signatures: List[Optional[np.ndarray]] = [None] * len(texts)
+
+        batch: List[int] = []
+        pending = 0
+        for index, hashes in enumerate(shingles):
+            if not hashes.size:
+                continue
+            batch.append(index)
+            pending += hashes.size
+            if pending >= batch_shingles:
+                self._sign_batch(shingles, batch, signatures)
+                batch, pending = [], 0
+        if batch:
+            self._sign_batch(shingles, batch, signatures)
+        return signatures
+
+    def _sign_batch(self, shingles: List[np.ndarray], batch: List[int], signatures: List[Optional[np.ndarray]]):
+        hashes = np.concatenate([shingles[index] for index in batch])
+        offsets = np.cumsum([0] + [shingles[index].size for index in batch[:-1]])
+        # 以 num_perm 組雜湊函數模擬隨機排列，每段取最小值
+        with np.errstate(over="ignore"):
+            permuted = (self._a * hashes[None, :] + self._b) >> _SHIFT
+        minima = np.minimum.reduceat(permuted, offsets, axis=1)
+        for column, index in enumerate(batch):
+            signatures[index] = minima[:, column]
+
+    def clusters(self, texts: Sequence[str], keys: Optional[Sequence[str]] = None) -> List[List[int]]:
+        """
+        將文字分群
+
+        Args:
+            texts: 要比對的文字
+            keys: 可選的識別鍵（例如正規化網址），鍵相同者直接視為重複
+
+        Returns:
+            List[List[int]]: 各群組的索引（依群組中最小的索引排序，群組內遞增）
+        """
+        union = _UnionFind(len(texts))
+        signatures = self.signatures(texts)
+
+        if keys is not None:
+            first: Dict[str, int] = {}
+            for index, key in enumerate(keys):
+                if key in first:
+                    union.union(first[key], index)
+                else:
+                    first[key] = index
+
+        # LSH：任一段簽章完全相同即為候選配對，再以完整簽章估計的相似度確認
+        for band in range(self.bands):
+            start = band * self.rows
+            buckets: Dict[bytes, List[int]] = {}
+            for index, signature in enumerate(signatures):
+                if signature is None:
+                    continue
+                bucket = buckets.setdefault(signature[start:start + self.rows].tobytes(), [])
+                for other in bucket:
+                    if union.find(other) != union.find(index) and \
+                            self.similarity(signatures[other], signature) >= self.threshold:
+                        union.union(other, index)
+                bucket.append(index)
+
+        groups: Dict[int, List[int]] = {}
+        for index in range(len(texts)):
+            groups.setdefault(union.find(index), []).append(index)
+        return sorted(groups.values(), key=lambda group: group[0])
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        """由兩個簽章估計 Jaccard 相似度"""
+        return float(np.count_nonzero(a == b)) / len(a)
+
+
+def dedupe_news_items(
+    items: List[Dict[str, Any]],
+    threshold: float = 0.6,
+    deduper: Optional[MinHashDeduper] = None
+) -> List[Dict[str, Any]]:
+    """
+    合併近似重複的新聞
+
+    每群保留最先出現的一則作為代表，並在 "sources" 中列出群內所有新聞的來源與網址
+
+    Args:
+        items: 新聞項目
+        threshold: 視為重複的估計 Jaccard 相似度
+        deduper: 可選的 MinHashDeduper（預設依 threshold 建立）
+
+    Returns:
+        List[Dict]: 去重後的新聞項目（維持原本的順序）
+    """
+    if len(items) < 2:
+        return list(items)
+
+    deduper = deduper or MinHashDeduper(threshold=threshold)
+    texts = [f"{item.get('title', '')} {item.get('summary', '')}" for item in items]
+    groups = deduper.clusters(texts, keys=[item_identity(item) for item in items])
+
+    deduped = []
+    for group in groups:
+        representative = dict(items[group[0]])
+        if len(group) > 1:
+            sources = []
+            for index in group:
+                entry = {"source": items[index].get("source", ""), "url": items[index].get("url", "")}
+                if entry not in sources:
+                    sources.append(entry)
+            representative["sources"] = sources
+        deduped.append(representative)
+    return deduped
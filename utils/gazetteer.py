@@ -0,0 +1,99 @@
+"""
+東南亞地名與機構詞典
+各國（繁體中文國名）對應的國名、別名、主要城市、證券交易所、央行與大型企業，供 EntityTagger 標註新聞所屬國家
+
+全為大寫英文字母的縮寫（例如 "MAS"、"SET"）只比對大小寫完全相同的文字，其餘名稱不分大小寫；
+常見詞語中的字（「包羅萬象」的萬象、中國的泗水縣、台南的西港）、語言形容詞（Thai、Lao）
+與其他意思常見的縮寫（BOT）容易誤標，不列入詞典
+"""
+
+ASEAN_GAZETTEER = {
+    "新加坡": [
+        # 國名與別名
+        "Singapore", "Singaporean", "新加坡", "星洲", "狮城", "獅城",
+        # 地區
+        "Jurong", "Changi", "Sentosa", "Marina Bay", "Tampines", "Woodlands",
+        # 交易所與指數
+        "Singapore Exchange", "SGX", "Straits Times Index", "海峽時報指數", "海峡时报指数", "新加坡交易所",
+        # 央行與主管機關
+        "Monetary Authority of Singapore", "MAS", "新加坡金融管理局", "新加坡金管局",
+        # 企業
+        "DBS", "OCBC", "UOB", "Temasek", "淡馬錫", "淡马锡", "GIC", "Singtel", "Sea Limited", "Shopee",
+        "CapitaLand", "凱德", "Wilmar", "豐益", "Keppel", "吉寶", "Sembcorp", "Grab Holdings",
+        "Singapore Airlines", "新加坡航空", "星展銀行", "華僑銀行", "大華銀行",
+    ],
+    "馬來西亞": [
+        "Malaysia", "Malaysian", "馬來西亞", "马来西亚", "大馬", "大马",
+        "Kuala Lumpur", "吉隆坡", "Penang", "檳城", "槟城", "Johor", "柔佛", "Putrajaya", "布城", "Cyberjaya",
+        "Selangor", "雪蘭莪", "Sabah", "Sarawak", "Malacca", "Melaka", "馬六甲",
+        "Bursa Malaysia", "馬來西亞交易所", "馬股",
+        "Bank Negara Malaysia", "Bank Negara", "BNM", "馬來西亞國家銀行",
+        "Maybank", "馬來亞銀行", "CIMB", "聯昌", "Public Bank", "大眾銀行", "RHB", "Hong Leong",
+        "Petronas", "Axiata", "Tenaga Nasional", "Genting", "雲頂", "云顶", "Khazanah",
+        "AirAsia", "亞航", "亚航", "Touch 'n Go", "Sime Darby",
+    ],
+    "泰國": [
+        "Thailand", "泰國", "泰国", "ประเทศไทย", "ไทย",
+        "Bangkok", "曼谷", "กรุงเทพ", "Chiang Mai", "清邁", "Phuket", "普吉", "Pattaya", "芭達雅",
+        "Stock Exchange of Thailand", "SET Index", "泰國證券交易所", "泰股",
+        "Bank of Thailand", "泰國央行", "泰国央行", "ธนาคารแห่งประเทศไทย",
+        "Kasikornbank", "KBank", "開泰銀行", "Siam Commercial Bank", "SCBX", "暹羅商業銀行",
+        "Bangkok Bank", "盤谷銀行", "Krungthai", "Krungsri", "PTT", "泰國國家石油", "CP Group",
+        "Charoen Pokphand", "正大集團", "正大集团", "Central Group", "尚泰集團", "True Corporation",
+        "Thai Airways", "泰航", "泰銖", "泰铢", "baht",
+    ],
+    "印尼": [
+        "Indonesia", "Indonesian", "印尼", "印度尼西亞", "印度尼西亚",
+        "Jakarta", "雅加達", "雅加达", "Surabaya", "Bandung", "萬隆", "Bali", "峇里", "巴厘",
+        "Nusantara", "Medan", "棉蘭",
+        "Indonesia Stock Exchange", "IDX", "印尼證券交易所", "Jakarta Composite",
+        "Bank Indonesia", "印尼央行", "Otoritas Jasa Keuangan", "OJK",
+        "Bank Central Asia", "BCA", "Bank Mandiri", "Bank Rakyat Indonesia", "BNI",
+        "GoTo", "Gojek", "Tokopedia", "Bukalapak", "Traveloka", "Telkom Indonesia", "Pertamina",
+        "Astra International", "Danantara", "印尼盾", "rupiah",
+    ],
+    "越南": [
+        "Vietnam", "Viet Nam", "Việt Nam", "Vietnamese", "越南",
+        "Hanoi", "Hà Nội", "河內", "河内", "Ho Chi Minh City", "TP.HCM", "Hồ Chí Minh", "胡志明市", "Saigon",
+        "Sài Gòn", "西貢", "Da Nang", "Đà Nẵng", "峴港", "岘港", "Hai Phong", "Hải Phòng",
+        "Ho Chi Minh Stock Exchange", "HOSE", "Hanoi Stock Exchange", "HNX", "VN-Index", "VN30",
+        "State Bank of Vietnam", "SBV", "Ngân hàng Nhà nước", "越南國家銀行", "越南国家银行", "越南央行",
+        "Vietcombank", "VietinBank", "BIDV", "Techcombank", "VPBank", "MB Bank", "Agribank",
+        "Vingroup", "VinFast", "Vinhomes", "Viettel", "FPT", "Vinamilk", "Masan", "Hòa Phát", "Hoa Phat",
+        "MoMo", "ZaloPay", "VNPay", "Petrovietnam", "越南盾", "đồng",
+    ],
+    "菲律賓": [
+        "Philippines", "Philippine", "Filipino", "菲律賓", "菲律宾",
+        "Manila", "馬尼拉", "马尼拉", "Makati", "Cebu", "宿霧", "Davao", "Quezon City", "Taguig", "BGC",
+        "Philippine Stock Exchange", "PSEi", "菲律賓證券交易所",
+        "Bangko Sentral ng Pilipinas", "Bangko Sentral", "BSP", "菲律賓央行", "菲律宾央行",
+        "BDO Unibank", "Metrobank", "Bank of the Philippine Islands", "BPI", "Landbank",
+        "Ayala", "SM Investments", "SM Prime", "JG Summit", "Jollibee", "San Miguel", "PLDT", "Globe Telecom",
+        "GCash", "Mynt", "PayMaya", "菲律賓披索",
+    ],
+    "柬埔寨": [
+        "Cambodia", "Cambodian", "Khmer", "柬埔寨", "高棉",
+        "Phnom Penh", "金邊", "金边", "Siem Reap", "暹粒", "Sihanoukville", "西哈努克",
+        "Cambodia Securities Exchange", "CSX", "柬埔寨證券交易所",
+        "National Bank of Cambodia", "柬埔寨國家銀行", "柬埔寨央行",
+        "ACLEDA", "ABA Bank", "Wing Bank", "Bakong", "Prince Group", "太子集團", "riel", "瑞爾",
+    ],
+    "緬甸": [
+        "Myanmar", "Burma", "Burmese", "緬甸", "缅甸",
+        "Yangon", "Rangoon", "仰光", "Naypyidaw", "Nay Pyi Taw", "奈比多", "Mandalay", "曼德勒",
+        "Yangon Stock Exchange", "YSX", "Central Bank of Myanmar", "緬甸央行",
+        "KBZ Bank", "Kanbawza", "AYA Bank", "Wave Money", "kyat", "緬元",
+    ],
+    "寮國": [
+        "Laos", "Lao PDR", "寮國", "老撾", "老挝",
+        "Vientiane", "永珍", "Luang Prabang", "瑯勃拉邦", "琅勃拉邦",
+        "Lao Securities Exchange", "LSX", "Bank of the Lao PDR", "寮國央行",
+        "BCEL", "Laos-China Railway", "中老鐵路", "中老铁路", "kip", "基普",
+    ],
+    "汶萊": [
+        "Brunei", "Bruneian", "汶萊", "文萊", "文莱",
+        "Bandar Seri Begawan", "斯里巴加灣", "Brunei Darussalam",
+        "Autoriti Monetari Brunei Darussalam", "AMBD", "汶萊金融管理局",
+        "Bank Islam Brunei Darussalam", "BIBD", "Baiduri Bank", "Hengyi Industries",
+    ],
+}
@@ -3,8 +3,12 @@
 """
 from typing import List, Dict, Any
 import re
+import unicodedata
 from datetime import datetime
 
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[\s\W_]+|[\s\W_]+$")
+
 
 def validate_email(email: str) -> bool:
     """
@@ -94,6 +98,23 @@ def clean_markdown(markdown_text: str) -> str:
     return '\n'.join(cleaned_lines)
 
 
+def normalize_text(text: str) -> str:
+    """
+    正規化文字（用於快取與合併的鍵值）
+    
+    全半形統一、忽略大小寫、合併空白、去除頭尾標點
+    
+    Args:
+        text: 原始文字
+        
+    Returns:
+        str: 正規化後的文字
+    """
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = _WHITESPACE.sub(" ", text)
+    return _EDGE_PUNCTUATION.sub("", text)
+
+
 def extract_urls(text: str) -> List[str]:
     """
     從文字中提取 URL
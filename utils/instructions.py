@@ -0,0 +1,150 @@
+"""
+搜尋指令解析工具
+將「5-10篇」、「約15篇」、「最近 7 天內」等自然語言指令轉成數值
+"""
+import math
+import re
+import unicodedata
+from typing import Optional, Tuple
+
+# 中文數字
+_CHINESE_DIGITS = {"零": 0, "一": 1, "二": 2, "兩": 2, "三": 3, "四": 4, "五": 5,
+                   "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+
+_RANGE = re.compile(r"(\d+)\s*(?:-|~|到|至|–|—)\s*(\d+)")
+_NUMBER = re.compile(r"\d+")
+_CHINESE_NUMBER = re.compile(r"([零一二兩三四五六七八九十]+)\s*(?:篇|則|條|个|個|份)")
+
+# 時間範圍只認相對寫法（最近/過去/近/前 N 天、N 天內、past/last/within N days），
+# 不把「2025年」、「10月5日」、"today" 等日期或字詞中的單位當成時間範圍
+_TIME_AMOUNT = r"(\d{1,3}|[零一二兩三四五六七八九十]+)"
+_TIME_UNIT = r"(小時|天|日|週|周|星期|禮拜|月|年)"
+_TIME_WINDOWS = [
+    re.compile(rf"(?:最近|過去|近|前)\s*{_TIME_AMOUNT}?\s*(?:個)?\s*{_TIME_UNIT}"),
+    re.compile(rf"{_TIME_AMOUNT}\s*(?:個)?\s*{_TIME_UNIT}\s*(?:內|以內|之內|來)"),
+    re.compile(
+        r"\b(?:past|last|within)\s+(?:the\s+)?(?:past\s+|last\s+)?(\d{1,3})?\s*"
+        r"(hours?|days?|weeks?|months?|years?)\b",
+        re.IGNORECASE
+    ),
+]
+
+# 時間單位對應的天數
+_UNIT_DAYS = {
+    "小時": 1 / 24, "hour": 1 / 24,
+    "天": 1, "日": 1, "day": 1,
+    "週": 7, "周": 7, "星期": 7, "禮拜": 7, "week": 7,
+    "月": 30, "month": 30,
+    "年": 365, "year": 365,
+}
+
+_APPROXIMATE_WORDS = ("約", "大約", "左右", "around", "about", "approximately", "~")
+
+# 只給大約數量時的上下浮動
+_APPROXIMATE_SPREAD = 0.2
+
+
+def chinese_to_int(text: str) -> Optional[int]:
+    """
+    將簡單的中文數字轉為整數（支援 0-99，例如「十五」、「二十」）
+
+    Returns:
+        Optional[int]: 無法解析時返回 None
+    """
+    if not text or any(char not in _CHINESE_DIGITS for char in text):
+        return None
+    if "十" not in text:
+        return _CHINESE_DIGITS[text] if len(text) == 1 else None
+
+    tens, _, ones = text.partition("十")
+    tens_value = _CHINESE_DIGITS[tens] if tens else 1
+    ones_value = _CHINESE_DIGITS[ones] if ones else 0
+    if len(tens) > 1 or len(ones) > 1:
+        return None
+    return tens_value * 10 + ones_value
+
+
+def parse_count_range(num_instruction: str) -> Optional[Tuple[int, int]]:
+    """
+    解析新聞數量指令
+
+    例如：「5-10篇」→ (5, 10)、「約15篇」→ (12, 18)、「10 articles」→ (10, 10)
+
+    Args:
+        num_instruction: 數量指令
+
+    Returns:
+        Optional[Tuple[int, int]]: (最少, 最多)；無法解析時返回 None
+    """
+    text = unicodedata.normalize("NFKC", num_instruction or "")
+
+    match = _RANGE.search(text)
+    if match:
+        low, high = sorted((int(match.group(1)), int(match.group(2))))
+        return low, high
+
+    value = _single_count(text)
+    if not value:
+        return None
+
+    if any(word in text.lower() for word in _APPROXIMATE_WORDS):
+        spread = max(1, round(value * _APPROXIMATE_SPREAD))
+        return max(1, value - spread), value + spread
+    return value, value
+
+
+def parse_target_count(num_instruction: str) -> Optional[int]:
+    """
+    解析搜尋時要達成的目標數量
+
+    範圍取上限、大約數量取其本身，例如：「5-10篇」→ 10、「約15篇」→ 15
+
+    Returns:
+        Optional[int]: 目標數量；無法解析時返回 None
+    """
+    text = unicodedata.normalize("NFKC", num_instruction or "")
+
+    match = _RANGE.search(text)
+    if match:
+        return max(int(match.group(1)), int(match.group(2))) or None
+    return _single_count(text)
+
+
+def parse_time_window(time_instruction: str) -> Optional[int]:
+    """
+    解析時間範圍指令為天數（不足一天以一天計）
+
+    例如：「最近 7 天內」→ 7、「過去兩週」→ 14、「最近一個月」→ 30、「past 24 hours」→ 1；
+    只認相對的時間寫法，「2025年」、「10月5日」等絕對日期不視為時間範圍
+
+    Returns:
+        Optional[int]: 天數；無法解析時返回 None
+    """
+    text = unicodedata.normalize("NFKC", time_instruction or "")
+    match = next(filter(None, (pattern.search(text) for pattern in _TIME_WINDOWS)), None)
+    if not match:
+        return None
+
+    amount = match.group(1)
+    if amount is None:
+        value = 1
+    elif amount.isdigit():
+        value = int(amount)
+    else:
+        value = chinese_to_int(amount)
+    if not value:
+        return None
+
+    unit = match.group(2).lower()
+    if unit.endswith("s") and unit[:-1] in _UNIT_DAYS:
+        unit = unit[:-1]
+    return max(1, math.ceil(value * _UNIT_DAYS[unit]))
+
+
+def _single_count(text: str) -> Optional[int]:
+    """取出指令中的單一數量（阿拉伯數字或帶單位的中文數字）"""
+    match = _NUMBER.search(text)
+    if match:
+        return int(match.group()) or None
+    match = _CHINESE_NUMBER.search(text)
+    return chinese_to_int(match.group(1)) if match else None
@@ -0,0 +1,259 @@
+"""
+新聞項目工具
+在搜尋結果文字與結構化新聞項目（title, summary, source, url, date, language）之間轉換
+"""
+import json
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from .helpers import normalize_text
+from .urls import canonicalize_url
+
+_JSON_BLOCK = re.compile(r"```json\s*(\{.*?\})\s*```", re.DOTALL)
+
+
+def extract_news_items(content: str) -> List[Dict[str, Any]]:
+    """
+    從搜尋結果文字中取出 results 陣列
+
+    優先解析 ```json 代碼塊，其次嘗試整段文字中最外層的 JSON 物件
+
+    Args:
+        content: Research Agent 回傳的文字
+
+    Returns:
+        List[Dict]: 新聞項目；解析失敗時返回空列表
+    """
+    candidates = [match.group(1) for match in _JSON_BLOCK.finditer(content or "")]
+    start, end = (content or "").find("{"), (content or "").rfind("}")
+    if start != -1 and end > start:
+        candidates.append(content[start:end + 1])
+
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict) and isinstance(data.get("results"), list):
+            return [item for item in data["results"] if isinstance(item, dict)]
+
+    return []
+
+
+def extract_object_field(content: str, field: str) -> Optional[Dict[str, Any]]:
+    """
+    取出文字中第一個 "field": {...} 物件（只要該物件完整即可，其後的文字可以不完整）
+
+    Args:
+        content: 搜尋結果文字（可能是仍在串流中的片段）
+        field: 欄位名稱
+
+    Returns:
+        Optional[Dict]: 物件內容；不存在、尚未完整或無法解析時返回 None
+    """
+    match = re.search(r'"' + re.escape(field) + r'"\s*:\s*\{', content or "")
+    if not match:
+        return None
+
+    start = match.end() - 1
+    depth, in_string, escaped = 0, False, False
+    for index in range(start, len(content)):
+        char = content[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                try:
+                    value = json.loads(content[start:index + 1])
+                except ValueError:
+                    return None
+                return value if isinstance(value, dict) else None
+    return None
+
+
+def render_news_content(query: str, items: List[Dict[str, Any]], search_date: Optional[str] = None) -> str:
+    """
+    將新聞項目輸出成與 Research Agent 相同格式的 ```json 代碼塊
+
+    Args:
+        query: 搜尋主題
+        items: 新聞項目
+        search_date: 搜尋日期，預設為今天
+
+    Returns:
+        str: 可交給 Analyst Agent 的搜尋結果文字
+    """
+    payload = {
+        "search_query": query,
+        "search_date": search_date or datetime.now().strftime("%Y-%m-%d"),
+        "results": items,
+    }
+    return "```json\n" + json.dumps(payload, ensure_ascii=False, indent=2) + "\n```"
+
+
+def canonical_item_url(item: Dict[str, Any]) -> str:
+    """新聞項目的正規化網址（已驗證來源的新聞使用 "canonical_url"，否則由 "url" 計算）"""
+    return item.get("canonical_url") or canonicalize_url(item.get("url", ""))
+
+
+def item_identity(item: Dict[str, Any]) -> str:
+    """新聞項目的識別鍵：正規化網址，沒有網址時使用正規化標題"""
+    url = canonical_item_url(item)
+    return url or "title:" + normalize_text(item.get("title", ""))
+
+
+def merge_news_items(groups: Iterable[List[Dict[str, Any]]], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    合併多組新聞項目並去除重複（依正規化網址或標題）
+
+    各組輪流取一則，讓不同來源群組平均分布在前段
+
+    Args:
+        groups: 多組新聞項目
+        limit: 最多保留的數量
+
+    Returns:
+        List[Dict]: 合併後的新聞項目
+    """
+    queues = [list(group) for group in groups]
+    merged: List[Dict[str, Any]] = []
+    seen = set()
+
+    index = 0
+    while any(index < len(queue) for queue in queues):
+        for queue in queues:
+            if index >= len(queue):
+                continue
+            item = queue[index]
+            identity = item_identity(item)
+            if identity in seen:
+                continue
+            seen.add(identity)
+            merged.append(item)
+            if limit is not None and len(merged) >= limit:
+                return merged
+        index += 1
+
+    return merged
+
+
+class IncrementalNewsParser:
+    """
+    串流中的增量 JSON 解析器
+
+    逐段餵入 Research Agent 的串流文字，"results" 陣列中的每個物件
+    一結束（大括號閉合）就立即解析並返回，不需等待整段回應完成
+    """
+
+    _RESULTS_KEY = re.compile(r'"results"\s*:\s*\[')
+
+    def __init__(self):
+        self.items: List[Dict[str, Any]] = []
+        self._buffer = ""
+        self._pos = 0
+        self._in_results = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start: Optional[int] = None
+
+    @property
+    def started(self) -> bool:
+        """是否已讀到 "results" 陣列的開頭（其前的欄位皆已完整）"""
+        return self._in_results
+
+    @property
+    def finished(self) -> bool:
+        """results 陣列是否已結束"""
+        return self._finished
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        餵入一段串流文字
+
+        Args:
+            text: 新收到的文字片段
+
+        Returns:
+            List[Dict]: 此片段中新完成的新聞項目
+        """
+        if self._finished or not text:
+            return []
+
+        self._buffer += text
+        if not self._in_results:
+            match = self._RESULTS_KEY.search(self._buffer)
+            if not match:
+                # 保留結尾幾個字元，避免鍵名被切在兩個片段之間
+                self._buffer = self._buffer[-32:]
+                return []
+            self._in_results = True
+            self._pos = match.end()
+
+        completed = self._scan()
+
+        # 已解析的部分不再需要，只保留進行中的物件
+        if self._object_start is None:
+            self._buffer, self._pos = "", 0
+        else:
+            self._buffer = self._buffer[self._object_start:]
+            self._pos -= self._object_start
+            self._object_start = 0
+
+        return completed
+
+    def _scan(self) -> List[Dict[str, Any]]:
+        completed = []
+        buffer = self._buffer
+
+        for index in range(self._pos, len(buffer)):
+            char = buffer[index]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._object_start = index
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # results 陣列結束
+                    self._finished = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    item = self._decode(buffer[self._object_start:index + 1])
+                    self._object_start = None
+                    if item is not None:
+                        self.items.append(item)
+                        completed.append(item)
+
+        self._pos = len(buffer)
+        return completed
+
+    @staticmethod
+    def _decode(raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            return None
+        return item if isinstance(item, dict) else None
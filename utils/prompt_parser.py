@@ -0,0 +1,348 @@
+"""
+需求解析工具
+以規則解析常見的中英文需求寫法（「最近一週」、「約15篇」、「英文新聞」、"past 3 days"），
+只有在輸入含糊時才交給 LLM，並以 LRU 快取解析結果
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .helpers import normalize_text
+from .instructions import chinese_to_int
+
+DEFAULT_TIME_INSTRUCTION = "最近7天內"
+DEFAULT_NUM_INSTRUCTION = "5-10篇"
+DEFAULT_LANGUAGE = "English"
+
+_NUM = r"(\d+|[零一二兩三四五六七八九十]+)"
+_EN_NUM = r"(\d+|an?|one|two|three|four|five|six|seven|eight|nine|ten|twelve)"
+_EN_NUMBERS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+               "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12}
+
+# 時間單位（小時以 0 天表示，另行處理）
+_TIME_UNITS = {
+    "小時": 0, "hour": 0,
+    "天": 1, "日": 1, "day": 1,
+    "週": 7, "周": 7, "星期": 7, "禮拜": 7, "week": 7,
+    "月": 30, "month": 30,
+    "年": 365, "year": 365,
+}
+
+_TIME_PATTERNS = [
+    re.compile(rf"(?:最近|過去|近|前)\s*{_NUM}\s*個?\s*(小時|天|日|週|周|星期|禮拜|月|年)\s*(?:內|以內|之內|來)?"),
+    re.compile(rf"{_NUM}\s*個?\s*(小時|天|日|週|周|星期|禮拜|月|年)\s*(?:內|以內|之內)"),
+    re.compile(rf"\b(?:in\s+|within\s+)?(?:the\s+)?(?:past|last)\s+{_EN_NUM}?\s*(hour|day|week|month|year)s?\b",
+               re.IGNORECASE),
+]
+
+_NAMED_TIMES = [
+    (re.compile(r"今天|今日|\btoday\b", re.IGNORECASE), 1),
+    (re.compile(r"本週|本周|這週|這周|這一週|\bthis\s+week\b", re.IGNORECASE), 7),
+    (re.compile(r"本月|這個月|\bthis\s+month\b", re.IGNORECASE), 30),
+    (re.compile(r"今年|\bthis\s+year\b", re.IGNORECASE), 365),
+]
+
+_UNIT = r"(?:篇|則|條|份)"
+_COUNT_PATTERNS = [
+    ("range", re.compile(rf"{_NUM}\s*(?:-|~|～|到|至)\s*{_NUM}\s*(?:{_UNIT}|個?新聞)")),
+    ("range", re.compile(r"\b(\d+)\s*(?:-|~|to)\s*(\d+)\s+(?:news\s+)?(?:articles|stories|news)\b", re.IGNORECASE)),
+    ("approx", re.compile(rf"(?:約|大約|大概)\s*{_NUM}\s*(?:{_UNIT}|個?新聞)")),
+    ("approx", re.compile(r"\b(?:around|about|approximately)\s+(\d+)\s+(?:news\s+)?(?:articles|stories|news)\b",
+                          re.IGNORECASE)),
+    ("exact", re.compile(rf"{_NUM}\s*(?:{_UNIT}|個?新聞)")),
+    ("exact", re.compile(r"\b(?:top\s+)?(\d+)\s+(?:news\s+)?(?:articles|stories|news)\b", re.IGNORECASE)),
+    ("exact", re.compile(r"\btop\s+(\d+)\b", re.IGNORECASE)),
+]
+
+
+def _language_words(words: str) -> re.Pattern:
+    """
+    中文語言名稱只在語言語境中成立：接在「用/以」之後、後面接新聞/報導/來源/撰寫，或單獨成詞
+    （「印尼文化」、「泰文化」中的語言名稱是較長詞語的一部分，不視為語言）
+    """
+    return re.compile(
+        rf"(?:用|以)(?:{words})(?!化)(?:撰寫)?"
+        rf"|(?:{words})(?=的?(?:新聞|報導|報告|來源|撰寫))"
+        rf"|(?<![一-鿿])(?:{words})(?![一-鿿])"
+    )
+
+
+_LANGUAGE_PATTERNS = [
+    (_language_words("英文|英語"), "English"),
+    (_language_words("繁體中文|簡體中文|中文|華文|華語"), "Chinese"),
+    (_language_words("越南文|越南語|越文"), "Vietnamese"),
+    (_language_words("泰文|泰語"), "Thai"),
+    (_language_words("馬來文|馬來語"), "Malay"),
+    (_language_words("印尼文|印尼語|印度尼西亞語"), "Indonesian"),
+    (re.compile(r"\b(?:in\s+)(English|Chinese|Vietnamese|Thai|Malay|Indonesian)\b", re.IGNORECASE), None),
+    (re.compile(r"\b(English|Chinese|Vietnamese|Thai|Malay|Indonesian)[\s-](?:language|sources)\b",
+                re.IGNORECASE), None),
+]
+
+# 需要理解語意（排除、比較、數量限制）的寫法交給 LLM
+_AMBIGUOUS = re.compile(
+    r"不要|不包含|不含|排除|除了|以外|至少|以上|以下|至多|最多|不超過|還是|或者|比較"
+    r"|\b(?:not|except|excluding|without|at\s+least|at\s+most|more\s+than|less\s+than|or|versus|vs)\b"
+    r"|\d",
+    re.IGNORECASE
+)
+
+_LEADING_FILLER = re.compile(
+    r"^(?:請|麻煩)?(?:幫我|幫忙|替我|給我)?(?:搜尋|搜索|查詢|查找|找一下|找|整理|蒐集|收集|提供)?(?:一下)?"
+    r"(?:最新的|最新|最近的|近期的|近期)?(?:關於|有關)?"
+)
+_TRAILING_FILLER = re.compile(r"(?:的)?(?:相關)?(?:最新)?(?:新聞|報導|消息|文章|資訊)?(?:來源)?$")
+_EN_LEADING_FILLER = re.compile(
+    r"^(?:please\s+)?(?:find|search(?:\s+for)?|get|show\s+me|give\s+me|look\s+up)?\s*(?:the\s+)?"
+    r"(?:latest|recent)?\s*(?:news|articles|stories)?\s*(?:about|on|regarding)?\s+",
+    re.IGNORECASE
+)
+_EN_TRAILING_FILLER = re.compile(r"\s+(?:news|articles|stories)$", re.IGNORECASE)
+_EDGE_CHARS = " \t\n,，、。.;；:：!！?？()（）[]【】「」\"'的和與及"
+
+# 規則解析出的關鍵字超過此長度時，多半是完整句子，交給 LLM
+_MAX_KEYWORD_CHARS = 24
+_MAX_KEYWORD_WORDS = 8
+
+
+def _to_int(text: str) -> Optional[int]:
+    text = text.lower()
+    if text.isdigit():
+        return int(text)
+    if text in _EN_NUMBERS:
+        return _EN_NUMBERS[text]
+    return chinese_to_int(text)
+
+
+def _match_time(text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """找出所有時間範圍寫法，返回 (正規化後的指令, 位置)"""
+    found, spans = [], []
+    for pattern in _TIME_PATTERNS:
+        for match in pattern.finditer(text):
+            amount = _to_int(match.group(1)) if match.group(1) else 1
+            if not amount:
+                continue
+            unit = match.group(2).lower()
+            days = _TIME_UNITS[unit]
+            if days == 0:
+                found.append(f"最近 {amount} 小時內" if amount < 24 else f"最近 {-(-amount // 24)} 天內")
+            else:
+                found.append(f"最近 {amount * days} 天內")
+            spans.append(match.span())
+        text = pattern.sub(lambda m: " " * len(m.group()), text)
+
+    for pattern, days in _NAMED_TIMES:
+        for match in pattern.finditer(text):
+            found.append(f"最近 {days} 天內")
+            spans.append(match.span())
+    return found, spans
+
+
+def _match_count(text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """找出所有數量寫法，返回 (正規化後的指令, 位置)"""
+    found, spans = [], []
+    for kind, pattern in _COUNT_PATTERNS:
+        for match in pattern.finditer(text):
+            values = [_to_int(group) for group in match.groups()]
+            if not all(values):
+                continue
+            if kind == "range":
+                low, high = sorted(values)
+                found.append(f"{low}-{high}篇")
+            elif kind == "approx":
+                found.append(f"約{values[0]}篇")
+            else:
+                found.append(f"{values[0]}篇")
+            spans.append(match.span())
+        # 已匹配的部分不再交給後面較寬鬆的規則
+        text = pattern.sub(lambda m: " " * len(m.group()), text)
+    return found, spans
+
+
+def _match_language(text: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """找出所有語言寫法，返回 (語言, 位置)"""
+    found, spans = [], []
+    for pattern, language in _LANGUAGE_PATTERNS:
+        for match in pattern.finditer(text):
+            found.append(language or match.group(1).capitalize())
+            spans.append(match.span())
+    return found, spans
+
+
+def _strip_spans(text: str, spans: List[Tuple[int, int]]) -> str:
+    chars = list(text)
+    for start, end in spans:
+        for index in range(start, end):
+            chars[index] = " "
+    return "".join(chars)
+
+
+def _clean_keywords(text: str) -> str:
+    """去除請求用語與前後的標點，留下搜尋主題"""
+    text = re.sub(r"\s+", " ", text).strip(_EDGE_CHARS)
+    previous = None
+    while text and text != previous:
+        previous = text
+        text = _LEADING_FILLER.sub("", text).strip(_EDGE_CHARS)
+        text = _TRAILING_FILLER.sub("", text).strip(_EDGE_CHARS)
+        text = _EN_LEADING_FILLER.sub("", text + " ").strip(_EDGE_CHARS)
+        text = _EN_TRAILING_FILLER.sub("", text).strip(_EDGE_CHARS)
+    return re.sub(r"\s+", " ", text)
+
+
+def _is_ambiguous_keywords(keywords: str) -> bool:
+    if not keywords or _AMBIGUOUS.search(keywords):
+        return True
+    if re.search(r"[A-Za-z]", keywords) and not re.search(r"[一-鿿]", keywords):
+        return len(keywords.split()) > _MAX_KEYWORD_WORDS
+    return len(keywords) > _MAX_KEYWORD_CHARS
+
+
+def _parse_rules(text: str) -> Optional[Tuple[str, Optional[str], Optional[str], Optional[str]]]:
+    times, time_spans = _match_time(text)
+    counts, count_spans = _match_count(_strip_spans(text, time_spans))
+    languages, language_spans = _match_language(text)
+
+    # 同一欄位出現互相矛盾的寫法
+    if len(set(times)) > 1 or len(set(counts)) > 1 or len(set(languages)) > 1:
+        return None
+
+    keywords = _clean_keywords(_strip_spans(text, time_spans + count_spans + language_spans))
+    if _is_ambiguous_keywords(keywords):
+        return None
+
+    return (
+        keywords,
+        times[0] if times else None,
+        counts[0] if counts else None,
+        languages[0] if languages else None,
+    )
+
+
+def parse_prompt_rules(user_prompt: str) -> Optional[Dict[str, Optional[str]]]:
+    """
+    以規則解析使用者需求
+
+    Args:
+        user_prompt: 使用者輸入的搜尋需求
+
+    Returns:
+        Optional[Dict]: keywords、time_instruction、num_instruction、language（未提及的欄位為 None）；
+            輸入含糊（排除條件、互相矛盾、長句等）時返回 None，應交給 LLM 解析
+    """
+    text = unicodedata.normalize("NFKC", user_prompt or "").strip()
+    parsed = _parse_rules(text)
+    if parsed is None:
+        return None
+    keywords, time_instruction, num_instruction, language = parsed
+    return {
+        "keywords": keywords,
+        "time_instruction": time_instruction,
+        "num_instruction": num_instruction,
+        "language": language,
+    }
+
+
+class PromptParser:
+    """需求解析器：請求欄位優先、其次規則解析，含糊時才呼叫 LLM；解析結果以 LRU 快取"""
+
+    FIELDS = ("time_instruction", "num_instruction", "language")
+
+    def __init__(self, llm_parse: Callable[[str], Dict[str, str]], cache_size: int = 256):
+        """
+        Args:
+            llm_parse: LLM 解析函數，接收使用者需求、返回解析結果字典（失敗時拋出例外）
+            cache_size: 快取的解析結果數量
+        """
+        self.llm_parse = llm_parse
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def parse(
+        self,
+        user_prompt: str,
+        explicit: Optional[Dict[str, str]] = None
+    ) -> Tuple[Dict[str, str], str]:
+        """
+        解析使用者需求
+
+        Args:
+            user_prompt: 使用者輸入的搜尋需求
+            explicit: 請求中明確指定的欄位（time_instruction / num_instruction / language），優先於解析結果
+
+        Returns:
+            Tuple[Dict, str]: (解析結果, 來源)；來源為 "cache"、"rules"、"llm" 或 "fallback"（LLM 失敗）
+        """
+        fast = self.parse_fast(user_prompt, explicit)
+        if fast is not None:
+            return fast
+
+        try:
+            parsed = self.llm_parse(user_prompt)
+        except Exception as e:
+            print(f"⚠️ LLM 需求解析失敗: {str(e)}")
+            return self.merge(user_prompt, {}, explicit), "fallback"
+
+        self.remember(user_prompt, parsed)
+        return self.merge(user_prompt, parsed, explicit), "llm"
+
+    def parse_fast(
+        self,
+        user_prompt: str,
+        explicit: Optional[Dict[str, str]] = None
+    ) -> Optional[Tuple[Dict[str, str], str]]:
+        """
+        只使用快取與規則解析（不呼叫 LLM）
+
+        Returns:
+            Optional[Tuple[Dict, str]]: (解析結果, "cache" 或 "rules")；需要 LLM 時返回 None
+        """
+        key = normalize_text(user_prompt)
+        parsed = self._get(key)
+        if parsed is not None:
+            return self.merge(user_prompt, parsed, explicit), "cache"
+
+        parsed = parse_prompt_rules(user_prompt)
+        if parsed is None:
+            return None
+
+        self._put(key, parsed)
+        return self.merge(user_prompt, parsed, explicit), "rules"
+
+    def remember(self, user_prompt: str, parsed: Dict[str, Optional[str]]):
+        """記錄由其他途徑（例如合併搜尋）取得的解析結果"""
+        self._put(normalize_text(user_prompt), parsed)
+
+    @staticmethod
+    def merge(
+        user_prompt: str,
+        parsed: Dict[str, Optional[str]],
+        explicit: Optional[Dict[str, str]] = None
+    ) -> Dict[str, str]:
+        """依「請求欄位 > 解析結果 > 預設值」的順序組成最終的搜尋參數"""
+        explicit = {field: value for field, value in (explicit or {}).items() if value}
+        return {
+            "keywords": parsed.get("keywords") or user_prompt,
+            "time_instruction": explicit.get("time_instruction") or parsed.get("time_instruction")
+                or DEFAULT_TIME_INSTRUCTION,
+            "num_instruction": explicit.get("num_instruction") or parsed.get("num_instruction")
+                or DEFAULT_NUM_INSTRUCTION,
+            "language": explicit.get("language") or parsed.get("language") or DEFAULT_LANGUAGE,
+        }
+
+    def _get(self, key: str) -> Optional[Dict[str, Optional[str]]]:
+        with self._lock:
+            parsed = self._cache.get(key)
+            if parsed is not None:
+                self._cache.move_to_end(key)
+            return parsed
+
+    def _put(self, key: str, parsed: Dict[str, Optional[str]]):
+        with self._lock:
+            self._cache[key] = dict(parsed)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,220 @@
+"""
+新聞排序
+分析之前以向量運算為整批新聞評分（發布日期在時間範圍內的新近程度、與搜尋主題的關鍵字重疊、
+文字是否為指定語言），再依分數挑選；同一來源已入選的新聞會降低分數以維持來源多樣性，
+直到達到數量上限或分析提示詞的 token 預算
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .helpers import normalize_text
+from .urls import url_host
+
+# 各項分數的權重
+DEFAULT_WEIGHTS = {"recency": 0.4, "keywords": 0.35, "language": 0.25}
+
+# 同一來源每多入選一則，分數扣除的值
+DEFAULT_DIVERSITY_PENALTY = 0.15
+
+# 新聞語言對應的文字系統
+LANGUAGE_SCRIPTS = {
+    "English": "latin",
+    "Malay": "latin",
+    "Indonesian": "latin",
+    "Vietnamese": "vietnamese",
+    "Chinese": "cjk",
+    "Thai": "thai",
+}
+
+# 拉丁字母文字約 4 個字元一個 token，中文與泰文約 1 個字元一個 token
+_LATIN_CHARS_PER_TOKEN = 4
+
+
+def _char_counts(texts: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    批次計算各文字中各文字系統的字元數（所有文字串接後一次分類，再以累加和切回各段）
+
+    Returns:
+        Dict[str, np.ndarray]: "latin"、"vietnamese"、"cjk"、"thai"、"total" 各自長度為 len(texts) 的計數
+    """
+    encoded = [text.encode("utf-32-le") for text in texts]
+    codes = np.frombuffer(b"".join(encoded), dtype=np.uint32)
+    ends = np.cumsum([len(chunk) // 4 for chunk in encoded])
+    starts = ends - np.array([len(chunk) // 4 for chunk in encoded], dtype=ends.dtype)
+
+    lower = codes | np.uint32(0x20)
+    masks = {
+        "latin": (lower >= ord("a")) & (lower <= ord("z")),
+        # 越南文特有的字母：ă â đ ê ô ơ ư 與 Latin Extended Additional 的聲調字母
+        "vietnamese": np.isin(codes, [0x0102, 0x0103, 0x0110, 0x0111, 0x01A0, 0x01A1, 0x01AF, 0x01B0])
+        | ((codes >= 0x1EA0) & (codes <= 0x1EF9)),
+        "cjk": ((codes >= 0x4E00) & (codes <= 0x9FFF)) | ((codes >= 0x3400) & (codes <= 0x4DBF)),
+        "thai": (codes >= 0x0E00) & (codes <= 0x0E7F),
+    }
+
+    counts = {}
+    for name, mask in masks.items():
+        cumulative = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+        counts[name] = cumulative[ends] - cumulative[starts]
+    counts["total"] = ends - starts
+    return counts
+
+
+def _query_terms(query: str) -> List[str]:
+    """搜尋主題的關鍵詞（以空白分詞；不以空白分詞的中文、泰文拆成相鄰兩字）"""
+    terms = []
+    for word in normalize_text(query).split():
+        if len(word) > 2 and any(0x0E00 <= ord(char) <= 0x0E7F or 0x3400 <= ord(char) <= 0x9FFF for char in word):
+            terms.extend(word[index:index + 2] for index in range(len(word) - 1))
+        else:
+            terms.append(word)
+    return list(dict.fromkeys(term for term in terms if term))
+
+
+def _ages(items: Sequence[Dict[str, Any]], today: date) -> np.ndarray:
+    """各新聞距今的天數（日期無法解析時為 NaN）"""
+    ages = np.full(len(items), np.nan)
+    for index, item in enumerate(items):
+        try:
+            published = datetime.strptime(str(item.get("date", ""))[:10], "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        ages[index] = (today - published).days
+    return ages
+
+
+def estimate_tokens(items: Sequence[Dict[str, Any]]) -> np.ndarray:
+    """估計各新聞放入分析提示詞時的 token 數"""
+    counts = _char_counts([json.dumps(item, ensure_ascii=False) for item in items])
+    wide = counts["cjk"] + counts["thai"]
+    return wide + np.ceil((counts["total"] - wide) / _LATIN_CHARS_PER_TOKEN).astype(np.int64)
+
+
+def score_news_items(
+    items: Sequence[Dict[str, Any]],
+    query: str = "",
+    window_days: Optional[int] = None,
+    language: Optional[str] = None,
+    weights: Optional[Dict[str, float]] = None,
+    today: Optional[date] = None
+) -> np.ndarray:
+    """
+    為新聞評分（0-1，不含來源多樣性）
+
+    Args:
+        items: 新聞項目
+        query: 搜尋主題
+        window_days: 時間範圍（天）；範圍外或日期無法解析的新聞新近程度為 0
+        language: 指定的新聞語言（例如 "English"、"Chinese"）；未指定時語言分數一律為 1
+        weights: 各項分數的權重，預設為 DEFAULT_WEIGHTS
+        today: 計算新近程度的基準日，預設為今天
+
+    Returns:
+        np.ndarray: 各新聞的分數
+    """
+    weights = weights or DEFAULT_WEIGHTS
+    if not items:
+        return np.zeros(0)
+
+    # 新近程度：時間範圍內依日期線性遞減；沒有範圍時以 7 天為尺度遞減
+    ages = _ages(items, today or date.today())
+    with np.errstate(invalid="ignore"):
+        if window_days:
+            recency = np.clip(1 - ages / (window_days + 1), 0, 1)
+            recency[(ages < -1) | (ages > window_days)] = 0
+        else:
+            recency = 1 / (1 + np.maximum(ages, 0) / 7)
+    recency = np.nan_to_num(recency, nan=0.0)
+
+    # 關鍵字重疊：標題與摘要中出現的主題關鍵詞比例
+    texts = [normalize_text(f"{item.get('title', '')} {item.get('summary', '')}") for item in items]
+    terms = _query_terms(query)
+    if terms:
+        hits = np.array([[term in text for term in terms] for text in texts], dtype=bool)
+        keywords = hits.mean(axis=1)
+    else:
+        keywords = np.zeros(len(items))
+
+    # 語言：標題與摘要中屬於指定語言文字系統的字元比例
+    script = LANGUAGE_SCRIPTS.get(language or "")
+    if script is None:
+        language_score = np.ones(len(items))
+    else:
+        counts = _char_counts(texts)
+        letters = counts["latin"] + counts["vietnamese"] + counts["cjk"] + counts["thai"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if script == "vietnamese":
+                # 越南文中帶聲調的字母約占一成以上
+                share = np.minimum(1, counts["vietnamese"] / letters / 0.1)
+            elif script == "latin":
+                share = (counts["latin"] + counts["vietnamese"]) / letters
+            else:
+                share = counts[script] / letters
+        language_score = np.nan_to_num(share, nan=0.5)
+
+    return (weights.get("recency", 0) * recency + weights.get("keywords", 0) * keywords
+            + weights.get("language", 0) * language_score)
+
+
+def rank_news_items(
+    items: Sequence[Dict[str, Any]],
+    query: str = "",
+    window_days: Optional[int] = None,
+    language: Optional[str] = None,
+    max_items: Optional[int] = None,
+    token_budget: Optional[int] = None,
+    diversity_penalty: float = DEFAULT_DIVERSITY_PENALTY,
+    weights: Optional[Dict[str, float]] = None,
+    today: Optional[date] = None
+) -> List[Dict[str, Any]]:
+    """
+    依分數挑選新聞
+
+    每次選出調整後分數最高的新聞（分數扣除 diversity_penalty × 同來源已入選的數量），
+    放不進剩餘 token 預算的新聞略過，直到達到 max_items 或沒有候選
+
+    Args:
+        items: 新聞項目
+        query: 搜尋主題
+        window_days: 時間範圍（天）
+        language: 指定的新聞語言
+        max_items: 最多保留的新聞數
+        token_budget: 保留新聞的估計 token 總數上限（至少保留一則）
+        diversity_penalty: 同一來源每多入選一則扣除的分數
+        weights: 各項分數的權重
+        today: 計算新近程度的基準日
+
+    Returns:
+        List[Dict]: 入選的新聞（依入選順序，即調整後分數由高到低）
+    """
+    if not items:
+        return []
+
+    scores = score_news_items(items, query, window_days, language, weights, today)
+    tokens = estimate_tokens(items) if token_budget else np.zeros(len(items), dtype=np.int64)
+
+    sources: Dict[str, int] = {}
+    source_ids = np.array([
+        sources.setdefault(url_host(item.get("url", "")) or normalize_text(item.get("source", "")), len(sources))
+        for item in items
+    ])
+    picked = np.zeros(len(sources))
+    available = np.ones(len(items), dtype=bool)
+
+    limit = min(max_items or len(items), len(items))
+    remaining = token_budget or 0
+    selected: List[int] = []
+    while len(selected) < limit and available.any():
+        adjusted = np.where(available, scores - diversity_penalty * picked[source_ids], -np.inf)
+        best = int(np.argmax(adjusted))
+        available[best] = False
+        if token_budget and selected and tokens[best] > remaining:
+            continue
+        selected.append(best)
+        remaining -= tokens[best]
+        picked[source_ids[best]] += 1
+
+    return [items[index] for index in selected]
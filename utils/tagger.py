@@ -0,0 +1,199 @@
+"""
+國家與實體標註
+以 Aho-Corasick 自動機一次比對詞典中所有名稱（城市、交易所、央行、企業等），
+整批新聞串接後只需掃描一次，返回每則新聞提及的各國家與次數
+"""
+from bisect import bisect_right
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from .gazetteer import ASEAN_GAZETTEER
+
+# 批次標註時分隔各段文字（不會出現在名稱中，比對不會跨段）
+_SEPARATOR = "\x00"
+
+
+def _is_word_char(char: str) -> bool:
+    """以空白分詞的文字的字母或數字（中文、泰文等不以空白分詞的文字不算，名稱前後緊接這些文字時仍可比對）"""
+    return char.isalnum() and char < "⺀" and not "\u0e00" <= char <= "\u0e7f"
+
+
+class AhoCorasick:
+    """Aho-Corasick 多模式字串比對自動機"""
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        Args:
+            patterns: 要比對的字串（比對結果以加入順序的索引表示）
+        """
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        for pattern in patterns:
+            self._insert(pattern)
+        self._build()
+
+    def _insert(self, pattern: str):
+        if not pattern:
+            raise ValueError("比對字串不可為空")
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] += (len(self.patterns),)
+        self.patterns.append(pattern)
+
+    def _build(self):
+        """以廣度優先建立失敗連結，並合併失敗連結上的輸出"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def finditer(self, text: str) -> Iterable[Tuple[int, int, int]]:
+        """
+        找出文字中所有（可重疊的）比對
+
+        Yields:
+            Tuple[int, int, int]: (起始位置, 結束位置, 比對字串的索引)
+        """
+        goto, fail, output, patterns = self._goto, self._fail, self._output, self.patterns
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield end - len(patterns[index]), end, index
+
+
+class EntityTagger:
+    """依詞典標註文字提及的國家"""
+
+    def __init__(self, gazetteer: Optional[Mapping[str, Iterable[str]]] = None):
+        """
+        Args:
+            gazetteer: 國家 → 名稱（全為大寫英文字母的縮寫區分大小寫，其餘不分），預設為 ASEAN_GAZETTEER
+        """
+        self._labels: List[str] = []
+        # 縮寫只接受列出的大小寫形式；None 表示不分大小寫
+        self._exact: List[Optional[Set[str]]] = []
+        patterns: Dict[str, int] = {}
+
+        for label, names in (gazetteer or ASEAN_GAZETTEER).items():
+            for name in names:
+                key = name.lower()
+                acronym = name.isascii() and name.isalpha() and name.isupper()
+                if key not in patterns:
+                    patterns[key] = len(self._labels)
+                    self._labels.append(label)
+                    self._exact.append(set())
+                exact = self._exact[patterns[key]]
+                if exact is not None:
+                    self._exact[patterns[key]] = exact | {name} if acronym else None
+
+        self._automaton = AhoCorasick(patterns)
+
+    def entities(self, text: str) -> List[Tuple[str, str]]:
+        """
+        標註單一文字
+
+        Returns:
+            List[Tuple[str, str]]: 依出現順序的 (原文名稱, 國家)
+        """
+        return [(text[start:end], self._labels[index]) for start, end, index in self._matches(text)]
+
+    def tag(self, text: str) -> Counter:
+        """標註單一文字提及的國家與次數"""
+        return self.tag_batch([text])[0]
+
+    def tag_batch(self, texts: Sequence[str]) -> List[Counter]:
+        """
+        整批標註（串接後只掃描一次）
+
+        Args:
+            texts: 文字
+
+        Returns:
+            List[Counter]: 各文字提及的國家 → 次數
+        """
+        starts = []
+        position = 0
+        for text in texts:
+            starts.append(position)
+            position += len(text) + 1
+
+        counts = [Counter() for _ in texts]
+        for start, _, index in self._matches(_SEPARATOR.join(texts)):
+            counts[bisect_right(starts, start) - 1][self._labels[index]] += 1
+        return counts
+
+    def _matches(self, text: str) -> List[Tuple[int, int, int]]:
+        """
+        不重疊的比對：同一位置取最長的名稱（例如 "Bank Negara Malaysia" 只算一次），
+        拼音文字的名稱需位於字詞邊界，縮寫需大小寫相同
+        """
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # 少數字元轉小寫後長度會改變，逐字轉換以維持位置對應
+            lowered = "".join(char.lower()[:1] or char for char in text)
+
+        candidates = []
+        for start, end, index in self._automaton.finditer(lowered):
+            if start and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+                continue
+            if end < len(text) and _is_word_char(text[end]) and _is_word_char(text[end - 1]):
+                continue
+            exact = self._exact[index]
+            if exact is not None and text[start:end] not in exact:
+                continue
+            candidates.append((start, end, index))
+
+        matches = []
+        covered = 0
+        for start, end, index in sorted(candidates, key=lambda match: (match[0], -match[1])):
+            if start >= covered:
+                matches.append((start, end, index))
+                covered = end
+        return matches
+
+
+@lru_cache(maxsize=1)
+def default_tagger() -> EntityTagger:
+    """以 ASEAN_GAZETTEER 建立的共用標註器"""
+    return EntityTagger()
+
+
+def primary_countries(counts: Counter, default: str = "東南亞", ratio: float = 0.5, limit: int = 3) -> str:
+    """
+    由提及次數決定新聞所屬國家
+
+    Args:
+        counts: 國家 → 次數
+        default: 沒有提及任何國家時的值
+        ratio: 次數達最多者的此比例才一併列出
+        limit: 最多列出的國家數
+
+    Returns:
+        str: 國家（多個時以「、」連接，依次數排序）
+    """
+    ranked = counts.most_common()
+    if not ranked:
+        return default
+    top = ranked[0][1]
+    return "、".join(label for label, count in ranked[:limit] if count >= top * ratio)
@@ -0,0 +1,53 @@
+"""
+限流的進度輸出
+串流中每個事件都輸出進度會讓終端機 I/O 成為熱點；同一類訊息在間隔內只輸出一次，
+略過的數量在下一次輸出時附上
+"""
+import time
+from typing import Callable, Dict, Tuple
+
+
+class RateLimitedLog:
+    """依訊息類別限流的輸出"""
+
+    def __init__(
+        self,
+        interval: float = 1.0,
+        sink: Callable[[str], None] = print,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            interval: 同一類別兩次輸出的最短間隔（秒）；0 表示不限流
+            sink: 實際輸出訊息的函數
+            clock: 時間來源（測試時可替換）
+        """
+        self.interval = interval
+        self.sink = sink
+        self.clock = clock
+        # 類別 → (上次輸出的時間, 之後略過的數量, 最後一則略過的訊息)
+        self._state: Dict[str, Tuple[float, int, str]] = {}
+
+    def __call__(self, kind: str, message: str):
+        """
+        輸出一則訊息（同類別在間隔內的訊息只記錄數量）
+
+        Args:
+            kind: 訊息類別（例如 "item"、"citation"）
+            message: 訊息內容
+        """
+        now = self.clock()
+        last, skipped, _ = self._state.get(kind, (None, 0, ""))
+        if last is not None and now - last < self.interval:
+            self._state[kind] = (last, skipped + 1, message)
+            return
+
+        self._state[kind] = (now, 0, "")
+        self.sink(f"{message}（另有 {skipped} 則相同類型的訊息未顯示）" if skipped else message)
+
+    def flush(self):
+        """輸出各類別最後一則被略過的訊息（串流結束時呼叫，讓最終進度一定會顯示）"""
+        for kind, (last, skipped, message) in list(self._state.items()):
+            if skipped:
+                self._state[kind] = (last, 0, "")
+                self.sink(f"{message}（另有 {skipped - 1} 則相同類型的訊息未顯示）" if skipped > 1 else message)
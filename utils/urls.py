@@ -0,0 +1,147 @@
+"""
+URL 工具
+正規化新聞網址，去除追蹤參數，讓相同文章得到相同的網址；以反向網域索引判斷網址是否屬於指定網域
+"""
+from typing import Any, Dict, Iterable, Mapping, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 常見的追蹤參數（完整名稱）
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "referrer", "source", "cmpid", "ocid", "ncid", "sr_share",
+    "share", "spm", "_ga", "_gl",
+})
+
+# 常見的追蹤參數（前綴）
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_", "hsa_", "at_")
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    正規化網址
+
+    - scheme 與主機名稱轉小寫，移除 "www." 與預設埠號
+    - 移除片段（#...）與追蹤參數，其餘查詢參數排序
+    - 移除路徑結尾的斜線
+
+    Args:
+        url: 原始網址
+
+    Returns:
+        str: 正規化後的網址；無法解析時返回去除空白的原始字串
+    """
+    url = (url or "").strip()
+    if not url:
+        return ""
+
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+
+    if not parts.netloc:
+        return url
+
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower().rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+
+    netloc = host
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        netloc = f"{host}:{parts.port}"
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(key)
+    ))
+
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def url_host(url: str) -> Optional[str]:
+    """取得網址的主機名稱（小寫，不含 "www."）"""
+    try:
+        host = urlsplit((url or "").strip()).hostname
+    except ValueError:
+        return None
+    if not host:
+        return None
+    host = host.lower().rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+
+class DomainIndex:
+    """
+    反向網域後綴索引
+
+    網域依標籤反轉後存入字典樹（"e.vnexpress.net" → net → vnexpress → e），
+    查詢時由主機名稱最後一個標籤往前走，時間與主機名稱長度成正比，與網域數量無關
+    """
+
+    _VALUE = object()
+
+    def __init__(self, domains: Union[Mapping[str, Any], Iterable[str]] = ()):
+        """
+        Args:
+            domains: 網域；傳入對應表時，值為查詢命中時返回的資料（例如來源名稱與地區）
+        """
+        self._root: Dict[Any, Any] = {}
+        self._size = 0
+        entries = domains.items() if isinstance(domains, Mapping) else ((domain, domain) for domain in domains)
+        for domain, value in entries:
+            self.add(domain, value)
+
+    def add(self, domain: str, value: Any = None):
+        """加入網域（值預設為網域本身）"""
+        domain = domain.strip().lower().rstrip(".")
+        if domain.startswith("www."):
+            domain = domain[4:]
+        if not domain:
+            return
+
+        node = self._root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        if self._VALUE not in node:
+            self._size += 1
+        node[self._VALUE] = domain if value is None else value
+
+    def match(self, host: str) -> Optional[Any]:
+        """
+        查詢主機名稱所屬的網域（含子網域；有多個網域符合時取最長者）
+
+        Args:
+            host: 主機名稱（小寫，不含 "www."，可由 url_host() 取得）
+
+        Returns:
+            Optional[Any]: 符合網域的值；不屬於任何網域時返回 None
+        """
+        node = self._root
+        found = None
+        for label in reversed((host or "").split(".")):
+            node = node.get(label)
+            if node is None:
+                break
+            found = node.get(self._VALUE, found)
+        return found
+
+    def match_url(self, url: str) -> Optional[Any]:
+        """查詢網址的主機所屬的網域"""
+        host = url_host(url)
+        return self.match(host) if host else None
+
+    def __contains__(self, url: str) -> bool:
+        return self.match_url(url) is not None
+
+    def __len__(self) -> int:
+        return self._size
+
+
+def _is_tracking_param(key: str) -> bool:
+    key = key.lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
@@ -3,6 +3,7 @@
 End-to-End 流程：搜尋 -> 分析 -> 生成報告 -> 發送郵件
 """
 from agents import ResearchAgent, AnalystAgent, ReportGeneratorAgent, EmailAgent
+from agents.clients import get_http_client
 from typing import Dict, Any, Optional
 from pathlib import Path
 import json
@@ -11,91 +12,71 @@ from datetime import datetime
 from agno.agent import Agent
 from agno.models.openai import OpenAIChat
 from config import Config
+from utils.prompt_parser import PromptParser
 
 
 class SEANewsWorkflow:
     """東南亞金融新聞工作流程"""
     
     def _parse_prompt(self, user_prompt: str) -> dict:
-        """使用 LLM 解析用戶 prompt，提取關鍵字、時間指令和數量指令。"""
-        try:
-            self._update_progress(None, "prompt_parsing", "🧠 正在解析您的需求...")
-            
-            # 使用 Agent 包裝的 OpenAIChat
-            parser_agent = Agent(
-                name="需求解析專家",
-                model=OpenAIChat(
-                    id=Config.OPENAI_MODEL,
-                    api_key=Config.OPENAI_API_KEY
-                ),
-                description="專門解析使用者需求的專家",
-                instructions=[
-                    "你是一個任務解析專家",
-                    "從使用者的需求中提取關鍵資訊",
-                    "你必須只回傳純 JSON 格式，不要有任何其他文字或解釋",
-                    "不要使用 markdown 代碼塊，直接回傳 JSON 物件"
-                ],
-                markdown=False
-            )
-            
-            prompt = f"""
-            請從以下使用者需求中，提取出四個關鍵資訊：
-            1. 'keywords': 核心的搜尋主題
-            2. 'time_instruction': 時間範圍指令（如果沒有指定，預設為'最近7天內'）
-            3. 'num_instruction': 需要的新聞數量（如果沒有指定，預設為'5-10篇'）
-            4. 'language': 新聞來源的語言（如果沒有指定，預設為'English'。支援：'English', 'Chinese', 'Vietnamese', 'Thai', 'Malay', 'Indonesian'）
-
-            使用者需求：{user_prompt}
-            
-            只回傳 JSON 格式，範例：
-            {{"keywords": "主題", "time_instruction": "時間", "num_instruction": "數量", "language": "English"}}
-            """
-            
-            response = parser_agent.run(prompt)
-            
-            if response and response.content:
-                content = response.content.strip()
-                
-                # 嘗試提取 JSON（處理可能的 markdown 代碼塊）
-                if '```json' in content:
-                    # 提取 ```json ... ``` 之間的內容
-                    import re
-                    json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
-                    if json_match:
-                        content = json_match.group(1)
-                elif '```' in content:
-                    # 提取 ``` ... ``` 之間的內容
-                    import re
-                    json_match = re.search(r'```\s*(.*?)\s*```', content, re.DOTALL)
-                    if json_match:
-                        content = json_match.group(1)
-                
-                # 解析 JSON
-                parsed_data = json.loads(content)
-                keywords = parsed_data.get("keywords", user_prompt)
-                time_instruction = parsed_data.get("time_instruction", "最近7天內")
-                num_instruction = parsed_data.get("num_instruction", "5-10篇")
-                language = parsed_data.get("language", "English")
-                
-                self._update_progress(None, "prompt_parsing", f"✅ 需求解析完成：主題='{keywords}', 時間='{time_instruction}', 數量='{num_instruction}', 語言='{language}'")
-                
-                return {
-                    "keywords": keywords,
-                    "time_instruction": time_instruction,
-                    "num_instruction": num_instruction,
-                    "language": language
-                }
+        """解析用戶 prompt，提取關鍵字、時間指令和數量指令（常見寫法以規則解析，含糊時才呼叫 LLM）。"""
+        self._update_progress(None, "prompt_parsing", "🧠 正在解析您的需求...")
+        
+        parsed, source = self.prompt_parser.parse(user_prompt)
+        
+        if source == "fallback":
+            self._update_progress(None, "prompt_parsing", "⚠️ 需求解析失敗，將使用原始輸入進行搜尋")
+        else:
+            self._update_progress(None, "prompt_parsing", f"✅ 需求解析完成：主題='{parsed['keywords']}', 時間='{parsed['time_instruction']}', 數量='{parsed['num_instruction']}', 語言='{parsed['language']}'")
+        
+        return parsed
+    
+    def _parse_prompt_with_llm(self, user_prompt: str) -> dict:
+        """使用 LLM 解析用戶 prompt（失敗時拋出例外）"""
+        # 使用 Agent 包裝的 OpenAIChat
+        parser_agent = Agent(
+            name="需求解析專家",
+            model=OpenAIChat(
+                id=Config.OPENAI_MODEL,
+                api_key=Config.OPENAI_API_KEY,
+                http_client=get_http_client()  # 共用連線池
+            ),
+            description="專門解析使用者需求的專家",
+            instructions=[
+                "你是一個任務解析專家",
+                "從使用者的需求中提取關鍵資訊",
+                "你必須只回傳純 JSON 格式，不要有任何其他文字或解釋",
+                "不要使用 markdown 代碼塊，直接回傳 JSON 物件"
+            ],
+            markdown=False
+        )
+        
+        prompt = f"""
+        請從以下使用者需求中，提取出四個關鍵資訊：
+        1. 'keywords': 核心的搜尋主題
+        2. 'time_instruction': 時間範圍指令（如果沒有指定，預設為'最近7天內'）
+        3. 'num_instruction': 需要的新聞數量（如果沒有指定，預設為'5-10篇'）
+        4. 'language': 新聞來源的語言（如果沒有指定，預設為'English'。支援：'English', 'Chinese', 'Vietnamese', 'Thai', 'Malay', 'Indonesian'）
 
-        except Exception as e:
-            self._update_progress(None, "prompt_parsing", f"⚠️ 需求解析失敗，將使用原始輸入進行搜尋。錯誤: {str(e)}")
+        使用者需求：{user_prompt}
         
-        # 如果解析失敗，回退到原始輸入
-        return {
-            "keywords": user_prompt,
-            "time_instruction": "最近7天內",
-            "num_instruction": "5-10篇",
-            "language": "English"
-        }
+        只回傳 JSON 格式，範例：
+        {{"keywords": "主題", "time_instruction": "時間", "num_instruction": "數量", "language": "English"}}
+        """
+        
+        response = parser_agent.run(prompt)
+        
+        if not response or not response.content:
+            raise Exception("LLM 未返回內容")
+        
+        content = response.content.strip()
+        
+        # 嘗試提取 JSON（處理可能的 markdown 代碼塊）
+        json_match = re.search(r'```(?:json)?\s*(.*?)\s*```', content, re.DOTALL)
+        if json_match:
+            content = json_match.group(1)
+        
+        return json.loads(content)
 
     def __init__(self):
         """初始化工作流程和所有 Agents"""
@@ -105,6 +86,7 @@ class SEANewsWorkflow:
         self.analyst_agent = AnalystAgent()
         self.report_agent = ReportGeneratorAgent()
         self.email_agent = EmailAgent()
+        self.prompt_parser = PromptParser(self._parse_prompt_with_llm, cache_size=Config.PROMPT_CACHE_SIZE)
         
         print("✅ 所有 Agents 初始化完成")
     
@@ -151,6 +133,8 @@ class SEANewsWorkflow:
             if search_results.get("status") == "error":
                 raise Exception(f"搜尋失敗: {search_results.get('error')}")
             
+            search_results = self.research_agent.refine(search_results, parsed_prompt)
+            
             result["steps"]["search"] = {
                 "status": "completed",
                 "timestamp": datetime.now().isoformat()